@@ -0,0 +1,93 @@
+"""
+Benchmark the AncestryIndex of data/data_gathering/api_calls/ancestry_index.py used
+by category_encoding, on the random P31/P279 graph of check_wikidata_resolver
+served by a local HTTP server:
+
+- the index built from WikidataResolver.ancestors must agree with a breadth-first
+  search from each item, for every target class;
+- building it must need no more requests once the graph file holds the items'
+  ancestors, whatever the target classes;
+- multi-hot columns for many rows are timed against searching the graph per row.
+
+Run from the project root:
+    python benchmarks/bench_ancestry_index.py [n_rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+from ancestry_index import AncestryIndex  # noqa: E402
+from check_wikidata_resolver import random_graph, reference, serve  # noqa: E402
+from mediawiki_client import MediaWikiClient  # noqa: E402
+from wikidata_resolver import WikidataResolver  # noqa: E402
+
+TARGETS = ["Q5", "Q16521", "Q1001", "Q2003", "Q3007"]
+MAX_DEPTH = 5
+
+
+def main(n_rows=1_000_000):
+    titles, parents = random_graph(5000)
+    server, url = serve(titles, parents, [])
+    graph_file = os.path.join(tempfile.mkdtemp(), "wikidata_graph.sqlite")
+    try:
+        client = MediaWikiClient(api_url=url, backoff=0)
+        resolver = WikidataResolver(client, graph_file, wikidata_url=url)
+        qids = [qid for qid in resolver.qids(list(titles)).values() if qid]
+        graph = resolver.ancestors(qids, MAX_DEPTH)
+        requests_made = client.requests_made
+        print(f"{len(qids)} items, {len(graph)} entities, {requests_made} requests")
+
+        start = time.perf_counter()
+        index = AncestryIndex.build(graph, TARGETS, MAX_DEPTH, items=qids)
+        built = time.perf_counter() - start
+        print(f"Index of {len(TARGETS)} classes built in {built:.2f}s")
+        for target in TARGETS:
+            expected = reference(qids, parents, target, MAX_DEPTH)
+            assert all(index.descends_from(q, target) == expected[q] for q in qids)
+
+        # Other classes from the same graph file, without requests
+        resolver.ancestors(qids, MAX_DEPTH)
+        assert client.requests_made == requests_made, "ancestors fetched again"
+        resolver.close()
+
+        index_file = os.path.join(os.path.dirname(graph_file), "index.json")
+        index.save(index_file)
+        index = AncestryIndex.load(index_file)
+    finally:
+        server.shutdown()
+
+    rng = random.Random(0)
+    rows = [rng.choice(qids + [None]) for _ in range(n_rows)]
+    start = time.perf_counter()
+    encoded = index.encode(rows)
+    indexed = time.perf_counter() - start
+
+    # Per-row search of the graph, timed on a sample of the rows
+    sample = rows[:2000]
+    start = time.perf_counter()
+    per_row = np.array(
+        [
+            [bool(q) and reference([q], parents, t, MAX_DEPTH)[q] for t in TARGETS]
+            for q in sample
+        ],
+        dtype=np.uint8,
+    )
+    searched = (time.perf_counter() - start) * n_rows / len(sample)
+    assert (encoded[: len(sample)] == per_row).all()
+    print(
+        f"{n_rows} rows x {len(TARGETS)} classes: index {indexed:.2f}s, "
+        f"per-row search ~{searched:.1f}s ({searched / indexed:.0f}x)"
+    )
+    print("Parity OK: the index matches breadth-first search on every item")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,138 @@
+"""
+Throughput and accuracy of CascadeService, for a range of confidence bands of its
+first stage, against a ScoringService scoring every edit with the full model, on
+data/test_imbalanced.csv.
+
+As in bench_scoring_service.py, the ensemble of the notebook is replaced by a soft
+VotingClassifier of scikit-learn models. Every edit is scored by a cascade and a
+service fitted without it (5-fold cross-validation); the first band, which leaves
+every edit to the service, must give the service's predictions.
+
+For each band: the share of edits decided by the first stage, the number of
+vandalism edits it lets through as benign (skipped), the edits per second
+scored one at a time and in batches of 64, the agreement with the full model's
+predictions, and the accuracy, precision and recall against the labels.
+
+Run from the project root:
+    python benchmarks/bench_cascade.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench_scoring_service import DATA, fit_pipeline  # noqa: E402
+from feature_engineer import CascadeService, ScoringService, preprocessor  # noqa: E402
+
+# (low, high) bands of the first stage; (0, 1) decides nothing, (0.1, 0.3) is the
+# default of CascadeService
+BANDS = [
+    (0.0, 1.0),
+    (0.01, 1.0),
+    (0.02, 1.0),
+    (0.05, 1.0),
+    (0.1, 1.0),
+    (0.2, 1.0),
+    (0.05, 0.5),
+    (0.1, 0.3),
+]
+BATCH_SIZES = [1, 64]
+REPEATS = 3  # the fastest of REPEATS runs is kept
+
+
+def score_all(cascade, records, batch_size):
+    """Results and seconds of scoring records in batches of batch_size."""
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(records), batch_size):
+        end = i + batch_size
+        batch = records[i:end]
+        results.extend(
+            [cascade.score(batch[0])] if batch_size == 1 else cascade.score(batch)
+        )
+    return results, time.perf_counter() - start
+
+
+def metrics(predicted, expected, labels):
+    true_positives = np.sum(predicted & labels)
+    return (
+        np.mean(predicted == expected),
+        np.mean(predicted == labels),
+        true_positives / max(predicted.sum(), 1),
+        true_positives / labels.sum(),
+    )
+
+
+def main(n_splits=5):
+    raw = pd.read_csv(DATA)
+    raw = raw[
+        (raw["added_lines"] != "BAD REQUEST") & (raw["deleted_lines"] != "BAD REQUEST")
+    ].reset_index(drop=True)
+    labels = raw["isvandalism"].to_numpy(dtype=bool)
+
+    folds = []
+    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    for train_idx, test_idx in cv.split(raw, labels):
+        train = raw.iloc[train_idx].copy()
+        preprocessor(train)
+        service = ScoringService.from_pipeline(fit_pipeline(train))
+        cascade = CascadeService(service).fit(train, train["isvandalism"])
+        folds.append((cascade, test_idx, raw.iloc[test_idx].to_dict("records")))
+
+    print(f"{len(raw)} edits, {labels.mean():.1%} vandalism, {n_splits} folds")
+    header = f"{'band':>11} {'stage 1':>8} {'skipped':>8}"
+    for batch_size in BATCH_SIZES:
+        header += f" {f'edits/s ({batch_size})':>15}"
+    print(
+        f"{header} {'speedup':>8} {'agreement':>9} {'accuracy':>9} "
+        f"{'precision':>10} {'recall':>7}"
+    )
+    baseline = None
+    for low, high in BANDS:
+        predicted = np.empty(len(raw), dtype=bool)
+        stage = np.empty(len(raw), dtype=np.intp)
+        rates = []
+        for batch_size in BATCH_SIZES:
+            seconds = 0.0
+            for cascade, test_idx, records in folds:
+                cascade.low, cascade.high = low, high
+                runs = [score_all(cascade, records, batch_size) for _ in range(REPEATS)]
+                results = runs[0][0]
+                seconds += min(elapsed for _, elapsed in runs)
+                predicted[test_idx] = [r["isvandalism"] for r in results]
+                stage[test_idx] = [r["stage"] for r in results]
+            rates.append(len(raw) / seconds)
+        if baseline is None:
+            baseline = (rates, predicted.copy())
+            assert (stage == 2).all()
+            for cascade, test_idx, records in folds:
+                expected = [r["isvandalism"] for r in cascade.service.score(records)]
+                assert np.array_equal(predicted[test_idx], expected)
+        agreement, accuracy, precision, recall = metrics(predicted, baseline[1], labels)
+        skipped = np.sum((stage == 1) & ~predicted & labels)
+        row = f"{f'{low:.2f}-{high:.2f}':>11} {np.mean(stage == 1):>8.1%} {skipped:>8}"
+        row += "".join(f" {rate:>15.0f}" for rate in rates)
+        print(
+            f"{row} {rates[0] / baseline[0][0]:>7.1f}x {agreement:>9.1%} "
+            f"{accuracy:>9.3f} {precision:>10.3f} {recall:>7.3f}"
+        )
+    print("OK: the band deciding nothing gives the full model's predictions")
+
+    cascade, _, records = folds[0]
+    with tempfile.TemporaryDirectory() as path:
+        cascade.save(path)
+        assert CascadeService.load(path).score(records) == cascade.score(records)
+    print("OK: same results after save and load")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark FoldNB, the single-pass fitting of VandalismScorer's n_splits + 1 Naive
+Bayes classifiers, against fitting one MultinomialNB per classifier on its rows (the
+original implementation), for growing n_splits.
+
+Both must give the same classifiers and the same out-of-fold probabilities, also
+after a partial_fit.
+
+Run from the project root:
+    python benchmarks/bench_fold_nb.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench_scorer_transform import scale_up  # noqa: E402
+from feature_engineer import TokenizedEdits, preprocessor  # noqa: E402
+from feature_engineer.fold_nb import FoldNB  # noqa: E402
+from sklearn.feature_extraction.text import CountVectorizer  # noqa: E402
+
+
+def reference_fit(X, labels, folds, n_splits, fit_prior):
+    """One MultinomialNB per fold, on the rows outside it, and one on all rows."""
+    classifiers = []
+    for i in range(n_splits):
+        rows = np.flatnonzero(folds != i)
+        clf = MultinomialNB(fit_prior=fit_prior)
+        classifiers.append(clf.fit(X[rows], labels[rows]))
+    classifiers.append(MultinomialNB(fit_prior=fit_prior).fit(X, labels))
+    return classifiers
+
+
+def reference_proba(classifiers, X, classifier_index):
+    proba = np.empty((X.shape[0], 2))
+    for i in np.unique(classifier_index):
+        rows = np.flatnonzero(classifier_index == i)
+        proba[rows] = classifiers[i].predict_proba(X[rows])
+    return proba
+
+
+def check(classifiers, nb, X, classifier_index):
+    for i, clf in enumerate(classifiers):
+        view = nb.classifier(i)
+        for attribute in ("feature_count_", "class_count_", "feature_log_prob_"):
+            expected = getattr(clf, attribute)
+            assert np.array_equal(getattr(view, attribute), expected), attribute
+        assert np.array_equal(view.class_log_prior_, clf.class_log_prior_)
+    expected = reference_proba(classifiers, X, classifier_index)
+    assert np.array_equal(nb.predict_proba(X, classifier_index), expected)
+
+
+def main(factor=10):
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    preprocessor(df)
+    df = scale_up(df, factor)
+    tokens = TokenizedEdits.from_frame(df.replace(np.nan, ""))
+    added, deleted = tokens.counts(CountVectorizer(), fit=True)
+    X = (added - deleted).maximum(0).tocsr()
+    X.eliminate_zeros()
+    labels = df["isvandalism"].to_numpy()
+    half = X.shape[0] // 2
+    rng = np.random.default_rng(0)
+
+    print(f"{X.shape[0]} edits, {X.shape[1]} words")
+    print(
+        f"{'n_splits':>8} {'fit_prior':>9} {'per-classifier s':>17} {'FoldNB s':>9} "
+        f"{'speedup':>8}"
+    )
+    for n_splits, fit_prior in (
+        (2, False),
+        (4, False),
+        (8, False),
+        (16, False),
+        (4, True),
+    ):
+        cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+        folds = np.empty(half, dtype=np.intp)
+        for i, (_, target_idx) in enumerate(cv.split(X[:half], labels[:half])):
+            folds[target_idx] = i
+
+        start = time.perf_counter()
+        classifiers = reference_fit(X[:half], labels[:half], folds, n_splits, fit_prior)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        nb = FoldNB(n_splits, fit_prior=fit_prior).fit(X[:half], labels[:half], folds)
+        fold_nb_time = time.perf_counter() - start
+
+        classifier_index = rng.integers(n_splits + 1, size=X.shape[0])
+        check(classifiers, nb, X, classifier_index)
+
+        # Second half added incrementally
+        new_folds = rng.integers(n_splits, size=X.shape[0] - half)
+        for i, clf in enumerate(classifiers):
+            kept = new_folds != i  # all of them for the last classifier
+            rows = half + np.flatnonzero(kept)
+            clf.partial_fit(X[rows], labels[rows])
+        nb.partial_fit(X[half:], labels[half:], new_folds)
+        check(classifiers, nb, X, classifier_index)
+
+        print(
+            f"{n_splits:>8} {fit_prior!s:>9} {reference_time:>17.3f} "
+            f"{fold_nb_time:>9.3f} {reference_time / fold_nb_time:>7.1f}x"
+        )
+    print("OK: same classifiers and probabilities, after fit and partial_fit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Cost and output of feature_engineer.instrumentation on preprocessor and
+VandalismScorer fit/transform, and on ScoringService.score.
+
+Disabled, a stage is a function call returning a shared no-op context manager: its
+cost, times the number of stages of a call, is reported against the duration of
+the call. Enabled, the same pipeline is timed without and with memory tracing, and
+must give the same results; the per-stage summary of a MemorySink is printed, and
+the JsonLinesSink and LoggingSink must receive the same records.
+
+Run from the project root:
+    python benchmarks/bench_instrumentation.py
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench_scorer_transform import scale_up  # noqa: E402
+from feature_engineer import (  # noqa: E402
+    ScoringService,
+    VandalismScorer,
+    instrumentation,
+    preprocessor,
+)
+from feature_engineer.scoring_service import FEATURES  # noqa: E402
+
+DATA = os.path.join(project_root, "data", "test_imbalanced.csv")
+
+
+def pipeline(raw):
+    """preprocessor, then fit and transform of the scorer on a split."""
+    df = raw.copy()
+    preprocessor(df)
+    train = df.sample(frac=0.8, random_state=0)
+    test = df.drop(train.index)
+    scorer = VandalismScorer().fit(train, train["isvandalism"])
+    return scorer, scorer.transform(test)["vandalism_score"].to_numpy()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def print_summary(summary):
+    print(f"  {'stage':<28} {'calls':>5} {'seconds':>8} {'rows/s':>11} {'peak MB':>8}")
+    for name, total in summary.items():
+        rate = total["rows_per_second"]
+        peak = total["peak_bytes"]
+        print(
+            f"  {name:<28} {total['calls']:>5} {total['seconds']:>8.3f} "
+            f"{'' if rate is None else f'{rate:.0f}':>11} "
+            f"{'' if peak is None else f'{peak / 2**20:.1f}':>8}"
+        )
+
+
+def main(factor=10):
+    raw = scale_up(pd.read_csv(DATA), factor)
+    instrumentation.disable()
+
+    # Disabled: cost of a stage
+    n = 1_000_000
+    per_stage = (
+        timeit.timeit(
+            "with stage('x', 1): pass",
+            globals={"stage": instrumentation.stage},
+            number=n,
+        )
+        / n
+    )
+    print(f"disabled stage: {per_stage * 1e9:.0f} ns")
+
+    scorer, expected = pipeline(raw)
+    records = raw.head(1).to_dict("records")
+    df = raw.head(2000).copy()
+    preprocessor(df)
+    model = LogisticRegression(max_iter=5000).fit(
+        scorer.transform(df)[FEATURES].to_numpy(dtype=float), df["isvandalism"]
+    )
+    service = ScoringService(scorer, model)
+    sink = instrumentation.MemorySink()
+    with instrumentation.instrumented(sink):
+        service.score(records)
+    n_stages = len(sink.records)
+    seconds = min(timeit.repeat(lambda: service.score(records), number=1, repeat=200))
+    print(
+        f"ScoringService.score, one edit: {seconds * 1000:.3f} ms, {n_stages} stages, "
+        f"disabled overhead {n_stages * per_stage / seconds:.4%}"
+    )
+
+    # Enabled: same results, time and memory per stage
+    _, disabled = timed(pipeline, raw)
+    print(f"\n{len(raw)} edits, preprocessor + fit + transform")
+    print(f"  disabled:          {disabled:.3f} s")
+    for memory in (False, True):
+        sink = instrumentation.MemorySink()
+        with instrumentation.instrumented(sink, memory=memory):
+            (_, scores), seconds = timed(pipeline, raw)
+        assert np.array_equal(scores, expected), "instrumented scores differ"
+        label = "enabled, memory:" if memory else "enabled:"
+        print(f"  {label:<18} {seconds:.3f} s")
+    print_summary(sink.summary())
+
+    # The other sinks receive the same records
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stages.jsonl")
+        with instrumentation.instrumented(instrumentation.JsonLinesSink(path)):
+            pipeline(raw)
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+    logged = []
+    handler = logging.Handler()
+    handler.emit = logged.append
+    logger = logging.getLogger("bench_instrumentation")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    with instrumentation.instrumented(instrumentation.LoggingSink(logger)):
+        pipeline(raw)
+    stages = [record["stage"] for record in sink.records]
+    assert [line["stage"] for line in lines] == stages
+    assert [entry.stage_record["stage"] for entry in logged] == stages
+    print("OK: same results instrumented, same records in every sink")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark the line diff engines of data/data_gathering/api_calls/line_diff.py used
+by summarize_edit_diffs, and check that every engine gives the same added and
+deleted lines as the reference difflib engine.
+
+Parity is checked on random pairs of texts of 190 to 600 lines drawn from small
+vocabularies, so that lines repeat, where the second text inserts, deletes and
+duplicates runs of lines of the first: the ambiguous alignments on which a
+shortcut of the trimmed engine could differ from difflib. The seed is printed so
+that a failure can be reproduced.
+
+The engines are then timed, and checked again, on the revision pairs of a revision
+store filled by summarize_edit_diffs or find_edits (the previous and current
+revisions of each edit), or on synthetic wikitext pairs if no store is given.
+
+Run from the project root:
+    python benchmarks/bench_line_diff.py [revision_store.sqlite or -] [seed]
+"""
+
+import os
+import random
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+from line_diff import DIFF_ENGINES  # noqa: E402
+from revision_store import RevisionStore  # noqa: E402
+
+
+def store_pairs(path):
+    """(previous, current) texts of the edits whose revisions are in the store."""
+    store = RevisionStore(path)
+    revid_pairs = []
+    for _, params, data in store.iter_responses():
+        if params.get("rvlimit") != "2" or "query" not in data:
+            continue
+        for page in data["query"]["pages"].values():
+            revs = page.get("revisions", [])
+            if len(revs) == 2:
+                revid_pairs.append((revs[1]["revid"], revs[0]["revid"]))
+    texts = store.get_texts(revid for pair in revid_pairs for revid in pair)
+    store.close()
+    return [
+        (texts[prev], texts[curr])
+        for prev, curr in revid_pairs
+        if prev in texts and curr in texts
+    ]
+
+
+def article(rng, n_lines):
+    """Wikitext-like lines: prose, blank lines, tables and lists with repeated cells."""
+    words = ["the", "of", "[[link]]", "<ref>cite</ref>", "and", "{{citation}}"]
+    lines = []
+    while len(lines) < n_lines:
+        kind = rng.random()
+        if kind < 0.4:
+            for _ in range(rng.randint(1, 4)):
+                words_in_line = rng.choices(words, k=10) + [str(rng.random())]
+                lines.append(" ".join(words_in_line))
+            lines.append("")
+        elif kind < 0.8:
+            lines.append('{| class="wikitable"')
+            for _ in range(rng.randint(5, 60)):
+                lines.append("|-")
+                lines.append(f"| {rng.randint(1, 50)} || {rng.choice(['Yes', 'No'])}")
+                lines.append(f"| align=center | {rng.randint(1900, 2010)}")
+            lines.append("|}")
+        elif kind < 0.95:
+            lines.extend(f"* [[Item {rng.randint(1, 300)}]]" for _ in range(20))
+        else:
+            lines.extend(["", "----", f"== Section {len(lines)} ==", ""])
+    return lines
+
+
+def edit(rng, lines):
+    """A typical revision of lines: small change, insertion, deletion or vandalism."""
+    lines = list(lines)
+    kind = rng.random()
+    at = rng.randrange(len(lines))
+    if kind < 0.5:
+        lines[at] = lines[at] + " " + rng.choice(["fix", "poop", "[[Link]]"])
+    elif kind < 0.7:
+        lines[at:at] = [f"new line {rng.random()}" for _ in range(rng.randint(1, 10))]
+    elif kind < 0.85:
+        end = at + rng.randint(1, 40)
+        del lines[at:end]
+    elif kind < 0.95:
+        lines[at:at] = article(rng, rng.randint(20, 200))
+    else:
+        lines = lines[: rng.randrange(len(lines))] + ["HAHAHA"]
+    return lines
+
+
+def synthetic_pairs(n_pairs=200, seed=0):
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(n_pairs):
+        prev = article(rng, rng.choice([50, 300, 2000, 10000, 30000]))
+        curr = edit(rng, prev)
+        if rng.random() < 0.2:
+            prev, curr = curr, prev  # revert
+        pairs.append(("\n".join(prev), "\n".join(curr)))
+    return pairs
+
+
+def random_pair(rng):
+    """
+    Two texts of random lines, the second one an edit of the first. Half of the
+    texts hold a block repeating a few lines, as tables do, and half of the edits
+    fall into it.
+    """
+    vocabulary = rng.choice([20, 50, 100, 200, 1000])
+    lines = [f"l{rng.randrange(vocabulary)}" for _ in range(rng.randint(190, 600))]
+    block = (0, len(lines))
+    if rng.random() < 0.5:
+        period = [f"l{rng.randrange(vocabulary)}" for _ in range(rng.randint(2, 4))]
+        at = rng.randrange(len(lines))
+        lines[at:at] = period * rng.randint(3, 15)
+        block = (at, at + len(period) * 3)
+    edited = list(lines)
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.random()
+        at = rng.randrange(*block) if rng.random() < 0.5 else rng.randrange(len(edited))
+        size = rng.randint(1, 10)
+        if kind < 0.25:
+            edited[at:at] = [f"l{rng.randrange(vocabulary)}" for _ in range(size)]
+        elif kind < 0.5:
+            end = at + size
+            del edited[at:end]
+        elif kind < 0.75:
+            start = max(0, at - size)
+            edited[at:at] = edited[start:at]  # after itself: ambiguous alignment
+        else:
+            start = rng.randrange(len(edited))
+            end = start + size
+            edited[at:at] = edited[start:end]
+    if rng.random() < 0.5:
+        lines, edited = edited, lines
+    return "\n".join(lines), "\n".join(edited)
+
+
+def check_parity(n_pairs=3000, seed=None):
+    """Check every engine against difflib on n_pairs random_pairs."""
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    rng = random.Random(seed)
+    for n in range(n_pairs):
+        prev, curr = random_pair(rng)
+        expected = DIFF_ENGINES["difflib"](prev, curr)
+        for name, engine in DIFF_ENGINES.items():
+            assert (
+                engine(prev, curr) == expected
+            ), f"{name} differs from difflib on random pair {n} of seed {seed}"
+    print(f"Parity OK on {n_pairs} random pairs (seed {seed})")
+
+
+def main(store_path=None, seed=None):
+    check_parity(seed=seed)
+    pairs = store_pairs(store_path) if store_path else synthetic_pairs()
+    source = store_path or "synthetic wikitext"
+    n_lines = sum(text.count("\n") + 1 for pair in pairs for text in pair)
+    print(f"{len(pairs)} revision pairs from {source}, {n_lines} lines in total")
+
+    expected = [DIFF_ENGINES["difflib"](prev, curr) for prev, curr in pairs]
+    reference = None
+    for name, engine in DIFF_ENGINES.items():
+        times = []
+        for (prev, curr), output in zip(pairs, expected):
+            start = time.perf_counter()
+            result = engine(prev, curr)
+            times.append(time.perf_counter() - start)
+            assert result == output, f"{name} differs from difflib"
+        total = sum(times)
+        reference = reference or total
+        times.sort()
+        print(
+            f"{name:>8}: {total:7.2f}s total ({reference / total:4.1f}x), "
+            f"median {times[len(times) // 2] * 1000:7.1f} ms, "
+            f"slowest {times[-1] * 1000:7.1f} ms"
+        )
+    print("Parity OK: every engine matches difflib on every pair")
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "-" else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else None,
+    )
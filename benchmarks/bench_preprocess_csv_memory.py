@@ -0,0 +1,78 @@
+"""
+Benchmark peak memory of preprocessing a CSV file: loading it whole and calling
+preprocessor, against streaming it with preprocess_csv. Each run happens in a fresh
+subprocess so that its peak RSS can be measured on its own.
+
+Run from the project root:
+    python benchmarks/bench_preprocess_csv_memory.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+WHOLE_FILE = """
+import pandas as pd
+from feature_engineer import preprocessor
+df = pd.read_csv({input_csv!r})
+preprocessor(df)
+df.to_csv({output_path!r}, index=False)
+"""
+
+STREAMING = """
+from feature_engineer import preprocess_csv
+preprocess_csv({input_csv!r}, {output_path!r}, chunksize={chunksize})
+"""
+
+# Printed by every subprocess once it is done: peak RSS in kilobytes (Linux)
+REPORT_PEAK_RSS = """
+import resource
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak_rss_mb(script):
+    """Run script in a new Python process and return its peak RSS in MB."""
+    result = subprocess.run(
+        [sys.executable, "-c", script + REPORT_PEAK_RSS],
+        cwd=project_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return int(result.stdout.split()[-1]) / 1024
+
+
+def main(factors=(10, 50, 200), chunksize=2_000):
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+
+    print(
+        f"{'rows':>8} {'file MB':>8} {'whole file MB':>14} "
+        f"{f'MB, chunks of {chunksize} rows':>26}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        input_csv = os.path.join(tmp, "edits.csv")
+        output_path = os.path.join(tmp, "preprocessed.csv")
+        for factor in factors:
+            for i in range(factor):
+                df.to_csv(
+                    input_csv, mode="w" if i == 0 else "a", header=i == 0, index=False
+                )
+            file_mb = os.path.getsize(input_csv) / 2**20
+
+            paths = dict(input_csv=input_csv, output_path=output_path)
+            whole_file = peak_rss_mb(WHOLE_FILE.format(**paths))
+            streaming = peak_rss_mb(STREAMING.format(chunksize=chunksize, **paths))
+            print(
+                f"{len(df) * factor:>8} {file_mb:>8.1f} {whole_file:>14.1f} "
+                f"{streaming:>26.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark preprocessor: row-level apply (vectorized=False) against whole-column
+operations (vectorized=True), checking that both modes produce the same columns.
+
+Run from the project root:
+    python benchmarks/bench_preprocessor.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import preprocessor  # noqa: E402
+
+# Values that exercise the corner cases of the row-level functions
+EDGE_CASES = pd.DataFrame(
+    {
+        "comment": ["fix", np.nan, "", "rv"] * 3,
+        "user": [
+            "127.0.0.1",
+            "256.1.1.1",
+            "01.2.3.4",
+            "2001:db8::1",
+            "fe80::1%eth0",
+            "User:Talk",
+            "Ute in DC",
+            np.nan,
+            "::ffff:1.2.3.4",
+            "1.2.3",
+            "0.0.0.0",
+            " 1.2.3.4",
+        ],
+        "user_reg_time": [
+            1228940029,
+            20101103034415,
+            1288755849,
+            1288755850,
+            0,
+            1288668000,
+            9999999999,
+            1228940029,
+            1,
+            1288755849,
+            20101103034415,
+            1000000000,
+        ],
+        "current_timestamp": [1288755849] * 12,
+        "added_lines": [
+            "Hello, world!",
+            np.nan,
+            "",
+            "don't  stop__me\tnow",
+            "İstanbul Ünïcödé — 東京 123",
+            "a b c",
+            "[[link|text]] {{template}}",
+            "x\x1cy\x1fz",
+            "   ",
+            "été",
+            "under_score-dash",
+            "BAD",
+        ],
+        "deleted_lines": ["", "a b c", np.nan, "...", "?!", "1,000.5"] * 2,
+    }
+)
+
+
+def scale_up(df, factor):
+    return pd.concat([df] * factor, ignore_index=True)
+
+
+def check_parity(df):
+    rowwise, vectorized = df.copy(), df.copy()
+    preprocessor(rowwise, vectorized=False)
+    preprocessor(vectorized, vectorized=True)
+    pd.testing.assert_frame_equal(rowwise, vectorized, check_exact=True)
+
+
+def main():
+    check_parity(EDGE_CASES)
+
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    check_parity(df)
+
+    print(f"{'rows':>8} {'row-level s':>12} {'vectorized s':>13} {'speedup':>8}")
+    for factor in (1, 10, 100):
+        data = scale_up(df, factor)
+
+        rowwise = data.copy()
+        start = time.perf_counter()
+        preprocessor(rowwise, vectorized=False)
+        rowwise_time = time.perf_counter() - start
+
+        vectorized = data.copy()
+        start = time.perf_counter()
+        preprocessor(vectorized, vectorized=True)
+        vectorized_time = time.perf_counter() - start
+
+        print(
+            f"{len(data):>8} {rowwise_time:>12.3f} {vectorized_time:>13.3f} "
+            f"{rowwise_time / vectorized_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
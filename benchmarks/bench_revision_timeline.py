@@ -0,0 +1,176 @@
+"""
+Benchmark recent_edit_count_for_csv on synthetic titles and edits served by a local
+HTTP server answering paginated revision queries (500 revisions per page, like the
+API): counting with the per-title RevisionTimelines of revision_timeline.py against
+the previous approach of one paginated walk over the 5-day window of each row.
+
+Every window count of the script must equal a direct count of the synthetic
+revisions, and its 5-day column must equal the per-row walks.
+
+Run from the project root:
+    python benchmarks/bench_revision_timeline.py [n_rows]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+import recent_edit_count_for_csv  # noqa: E402
+from mediawiki_client import MediaWikiClient  # noqa: E402
+from revision_timeline import format_time, parse_time  # noqa: E402
+
+PAGE_SIZE = 500
+YEAR = 365 * 86400
+# The local server needs no rate limit or backoff
+NO_LIMIT = {"max_requests_per_second": 100_000, "backoff": 0}
+START = int(datetime(2010, 1, 1, tzinfo=timezone.utc).timestamp())
+
+
+def synthetic_history(n_titles=300, seed=0):
+    """Sorted revision times of each title, a few titles being much busier."""
+    rng = random.Random(seed)
+    history = {}
+    for k in range(n_titles):
+        n_revisions = int(20 * rng.paretovariate(0.8)) % 60_000
+        history[f"Title_{k}"] = sorted(
+            START + rng.randrange(YEAR) for _ in range(n_revisions + 1)
+        )
+    return history
+
+
+def serve(history):
+    """Start a local server answering prop=revisions queries, newest first."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            times = history.get(params["titles"])
+            if times is None:
+                response = {"query": {"pages": {"-1": {"missing": ""}}}}
+            else:
+                first = bisect_left(times, parse_time(params["rvend"]))
+                last = bisect_right(times, parse_time(params["rvstart"]))
+                window = times[first:last][::-1]
+                offset = int(params.get("rvcontinue", 0))
+                end = offset + PAGE_SIZE
+                revisions = [
+                    {"revid": START + t, "timestamp": format_time(t)}
+                    for t in window[offset:end]
+                ]
+                response = {"query": {"pages": {"1": {"revisions": revisions}}}}
+                if end < len(window):
+                    response["continue"] = {"rvcontinue": str(end)}
+            body = json.dumps(response).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/api.php"
+
+
+def per_row_count(title, edit_time, client):
+    """The previous approach: one paginated walk over the 5 days before the edit."""
+    params = {
+        "action": "query",
+        "format": "json",
+        "prop": "revisions",
+        "titles": title,
+        "rvstart": format_time(edit_time - 1),
+        "rvend": format_time(edit_time - 5 * 86400),
+        "rvlimit": "max",
+        "rvdir": "older",
+        "rvprop": "ids",
+    }
+    total = 0
+    while True:
+        data = client.get(params)
+        pages = list(data["query"]["pages"].values())
+        if not pages or "revisions" not in pages[0]:
+            return total
+        total += len(pages[0]["revisions"])
+        if "continue" not in data:
+            return total
+        params = {**params, "rvcontinue": data["continue"]["rvcontinue"]}
+
+
+def check(counts, windows, titles, history):
+    """Compare each window count of the script with the synthetic revisions."""
+    for column, window in windows.items():
+        edit_times = counts["current_timestamp"]
+        for title, ts, count in zip(titles, edit_times, counts[column]):
+            times = history[title]
+            direct = bisect_right(times, ts - 1) - bisect_left(times, ts - window)
+            assert count == direct, (column, title, ts)
+
+
+def main(n_rows=5000):
+    history = synthetic_history()
+    rng = random.Random(1)
+    titles = rng.choices(
+        list(history), weights=[len(t) for t in history.values()], k=n_rows
+    )
+    edits = pd.DataFrame(
+        {
+            "title": [title.replace("_", " ") for title in titles],
+            "current_timestamp": [rng.choice(history[title]) for title in titles],
+        }
+    )
+    n_revisions = sum(len(times) for times in history.values())
+    print(f"{n_rows} edits of {len(set(titles))} titles ({n_revisions} revisions)")
+
+    server, url = serve(history)
+    workdir = tempfile.mkdtemp()
+    try:
+        client = MediaWikiClient(api_url=url, max_workers=1, **NO_LIMIT)
+        start = time.perf_counter()
+        expected = [
+            per_row_count(title, int(ts), client)
+            for title, ts in zip(titles, edits["current_timestamp"])
+        ]
+        per_row = time.perf_counter() - start, client.requests_made
+
+        recent_edit_count_for_csv.input_csv = os.path.join(workdir, "edits.csv")
+        recent_edit_count_for_csv.output_csv = os.path.join(workdir, "counts.csv")
+        edits.to_csv(recent_edit_count_for_csv.input_csv, index=False)
+        all_windows = recent_edit_count_for_csv.WINDOWS
+        runs = {}
+        for windows in [{"num_edits_5d_before": 5 * 86400}, all_windows]:
+            recent_edit_count_for_csv.WINDOWS = windows
+            client = MediaWikiClient(api_url=url, **NO_LIMIT)
+            start = time.perf_counter()
+            recent_edit_count_for_csv.main(client)
+            runs[", ".join(windows)] = time.perf_counter() - start, client.requests_made
+            counts = pd.read_csv(recent_edit_count_for_csv.output_csv)
+            check(counts, windows, titles, history)
+            assert counts["num_edits_5d_before"].tolist() == expected
+    finally:
+        server.shutdown()
+
+    print(f"Per-row walks (5d): {per_row[1]} requests, {per_row[0]:.2f}s")
+    for columns, (seconds, requests_made) in runs.items():
+        print(f"Timelines ({columns}): {requests_made} requests, {seconds:.2f}s")
+    print("Parity OK: every count matches the revisions and the per-row walks")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,113 @@
+"""
+Benchmark loading a fitted VandalismScorer in scoring workers: a joblib pickle of the
+whole scorer against the flat arrays of VandalismScorer.save, memory-mapped by
+VandalismScorer.load.
+
+The loaded scorers must give the same scores as the fitted one, with a vocabulary
+and with feature hashing. For each format, N worker processes load the scorer and
+score edits; the size on disk, the load time and the private memory each worker
+adds (USS, shared pages of memory maps excluded) are reported.
+
+Run from the project root:
+    python benchmarks/bench_scorer_artifact.py [n_workers]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import psutil
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench_scorer_transform import scale_up  # noqa: E402
+from feature_engineer import VandalismScorer, preprocessor  # noqa: E402
+
+MB = 2**20
+
+
+def size_on_disk(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def load(path):
+    if path.endswith(".joblib"):
+        return joblib.load(path)
+    return VandalismScorer.load(path)
+
+
+def worker(path, X):
+    """Load the scorer saved at path and score X, in a fresh process."""
+    process = psutil.Process()
+    before = process.memory_full_info().uss
+    start = time.perf_counter()
+    scorer = load(path)
+    load_time = time.perf_counter() - start
+    scores = scorer.score_edits(X["added_lines"], X["deleted_lines"], X["EditID"])
+    return load_time, process.memory_full_info().uss - before, scores
+
+
+def main(n_workers=4, factor=20):
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    preprocessor(df)
+    X = scale_up(df, factor)
+    sample = X.sample(500, random_state=0)
+    workdir = tempfile.mkdtemp()
+    context = multiprocessing.get_context("spawn")
+
+    for n_hash_features in (None, 2**18):
+        scorer = VandalismScorer(n_hash_features=n_hash_features)
+        scorer.fit(X, X["isvandalism"])
+        expected = scorer.transform(sample)["vandalism_score"].to_numpy()
+
+        mode = "vocabulary" if n_hash_features is None else "hashing"
+        paths = {
+            "pickle": os.path.join(workdir, f"{mode}.joblib"),
+            "artifact": os.path.join(workdir, mode),
+        }
+        joblib.dump(scorer, paths["pickle"])
+        scorer.save(paths["artifact"])
+
+        loaded = VandalismScorer.load(paths["artifact"])
+        scores = loaded.transform(sample)["vandalism_score"].to_numpy()
+        assert np.array_equal(scores, expected), "loaded scorer gives other scores"
+
+        print(f"{mode}, {len(X)} training edits, {n_workers} workers:")
+        for name, path in paths.items():
+            with context.Pool(n_workers) as pool:
+                results = pool.starmap(worker, [(path, sample)] * n_workers)
+            for _, _, scores in results:
+                assert np.array_equal(scores, expected), f"{name} worker scores"
+            load_time = np.median([r[0] for r in results])
+            private = np.median([r[1] for r in results]) / MB
+            print(
+                f"  {name:>8}: {size_on_disk(path) / MB:7.1f} MB on disk, "
+                f"load {load_time * 1000:8.1f} ms, {private:6.1f} MB private per worker"
+            )
+    print("OK: same scores from the loaded scorers")
+
+    # Saving again replaces the artifact, but never a directory that is not one
+    scorer.save(paths["artifact"])
+    other = os.path.join(workdir, "other")
+    os.makedirs(other)
+    open(os.path.join(other, "notes.txt"), "w").close()
+    try:
+        scorer.save(other)
+        raise AssertionError("a directory that is not an artifact was replaced")
+    except FileExistsError:
+        pass
+    assert os.listdir(other) == ["notes.txt"]
+    print("OK: an artifact is replaced, any other directory is left alone")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,51 @@
+"""
+Benchmark VandalismScorer.fit wall time against n_splits and n_jobs, and check that
+the fitted scorer gives the same scores whatever the number of jobs.
+
+Run from the project root:
+    python benchmarks/bench_scorer_fit.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import VandalismScorer, preprocessor  # noqa: E402
+
+
+def main(factor=10, n_splits_values=(2, 4, 8)):
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    preprocessor(df)
+    df = pd.concat([df] * factor, ignore_index=True)
+    df["EditID"] = np.arange(len(df))
+
+    cores = os.cpu_count()
+    n_jobs_values = sorted({1, 2, 4, cores})
+    print(f"{len(df)} rows, {cores} cores")
+    print(
+        f"{'n_splits':>8} " + " ".join(f"{f'n_jobs={n} s':>11}" for n in n_jobs_values)
+    )
+    for n_splits in n_splits_values:
+        times, reference = [], None
+        for n_jobs in n_jobs_values:
+            scorer = VandalismScorer(n_splits=n_splits, n_jobs=n_jobs)
+            start = time.perf_counter()
+            scorer.fit(df, df["isvandalism"])
+            times.append(time.perf_counter() - start)
+
+            scores = scorer.transform(df)["vandalism_score"].to_numpy()
+            if reference is None:
+                reference = scores
+            assert np.array_equal(scores, reference), "scores depend on n_jobs"
+        print(f"{n_splits:>8} " + " ".join(f"{t:>11.3f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
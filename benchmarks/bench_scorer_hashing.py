@@ -0,0 +1,81 @@
+"""
+Compare VandalismScorer in vocabulary mode (CountVectorizer) and in feature hashing
+mode (n_hash_features): pickled size of the vectorizer and of the whole fitted
+scorer (whose Naive Bayes classifiers hold dense arrays of n_hash_features columns),
+pickle round trip time of the scorer, fit and transform throughput, and F1 of the
+vandalism score on a held-out split.
+test_imbalanced.csv has few vandalism edits, so ROC AUC is reported as well.
+
+Run from the project root, optionally on another raw CSV of edits:
+    python benchmarks/bench_scorer_hashing.py [path/to/edits.csv]
+"""
+
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import VandalismScorer, preprocessor  # noqa: E402
+
+
+def main(csv_path, factor=10, n_hash_features_values=(2**14, 2**18, 2**20)):
+    df = pd.read_csv(csv_path)
+    preprocessor(df)
+    train, test = train_test_split(
+        df, test_size=0.3, random_state=42, stratify=df["isvandalism"]
+    )
+    # Throughput is measured on a larger copy of the training data
+    big = pd.concat([train] * factor, ignore_index=True)
+    big["EditID"] = np.arange(len(big))
+
+    print(
+        f"{'mode':>14} {'vectorizer KB':>14} {'scorer MB':>10} {'pickle ms':>10} "
+        f"{'fit rows/s':>11} {'transform rows/s':>17} {'F1':>6} {'ROC AUC':>8}"
+    )
+    for n_hash_features in (None,) + n_hash_features_values:
+        scorer = VandalismScorer(n_hash_features=n_hash_features)
+
+        start = time.perf_counter()
+        scorer.fit(big, big["isvandalism"])
+        fit_rate = len(big) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scorer.transform(big)
+        transform_rate = len(big) / (time.perf_counter() - start)
+
+        vectorizer = pickle.dumps(scorer.vectorizer_)
+        start = time.perf_counter()
+        pickled = pickle.dumps(scorer)
+        pickle.loads(pickled)
+        pickle_ms = (time.perf_counter() - start) * 1000
+
+        scorer = VandalismScorer(n_hash_features=n_hash_features)
+        scorer.fit(train, train["isvandalism"])
+        scores = scorer.transform(test)["vandalism_score"]
+        f1 = f1_score(test["isvandalism"], scores > 0.5)
+        auc = roc_auc_score(test["isvandalism"], scores)
+
+        mode = (
+            "vocabulary"
+            if n_hash_features is None
+            else f"hash 2^{n_hash_features.bit_length() - 1}"
+        )
+        print(
+            f"{mode:>14} {len(vectorizer) / 1024:>14.1f} "
+            f"{len(pickled) / 2**20:>10.1f} {pickle_ms:>10.2f} "
+            f"{fit_rate:>11.0f} {transform_rate:>17.0f} {f1:>6.3f} {auc:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    default_csv = os.path.join(project_root, "data", "test_imbalanced.csv")
+    main(sys.argv[1] if len(sys.argv) > 1 else default_csv)
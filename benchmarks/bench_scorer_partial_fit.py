@@ -0,0 +1,126 @@
+"""
+Benchmark VandalismScorer.partial_fit against a full refit as the corpus grows, and
+check that, in hashing mode, an incremental fit gives the same nb_classifier_total
+as a full fit on all of the edits, that edits streamed in small batches are
+spread evenly over the folds, and that edits already learned are rejected.
+
+Run from the project root:
+    python benchmarks/bench_scorer_partial_fit.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import VandalismScorer, preprocessor  # noqa: E402
+
+
+def check_equal_to_refit(df, n_batches=4):
+    batches = np.array_split(np.arange(len(df)), n_batches)
+    incremental = VandalismScorer(n_hash_features=2**18)
+    for rows in batches:
+        incremental.partial_fit(df.iloc[rows], df["isvandalism"].iloc[rows])
+    refit = VandalismScorer(n_hash_features=2**18).fit(df, df["isvandalism"])
+
+    for attribute in ("class_count_", "feature_count_", "feature_log_prob_"):
+        assert np.array_equal(
+            getattr(incremental.nb_classifier_total, attribute),
+            getattr(refit.nb_classifier_total, attribute),
+        ), f"nb_classifier_total.{attribute} differs from a full refit"
+
+    # Edits added by partial_fit must not be part of the classifier that scores them
+    new = df.iloc[np.concatenate(batches[1:])]
+    folds = incremental.EditID_to_classifier_index.lookup(new["EditID"])
+    X_counts_diff = incremental._counts_diff(new.replace(np.nan, ""))
+    first = VandalismScorer(n_hash_features=2**18)
+    first.fit(df.iloc[batches[0]], df["isvandalism"].iloc[batches[0]])
+    for i in range(incremental.n_splits):
+        added = X_counts_diff[folds != i].sum()
+        grown = incremental.nb_classifiers[i].feature_count_.sum()
+        assert grown == first.nb_classifiers[i].feature_count_.sum() + added
+
+
+def check_small_batches(df, n_fit=200, n_streamed=100):
+    scorer = VandalismScorer().fit(df.iloc[:n_fit], df["isvandalism"].iloc[:n_fit])
+    before = [clf.class_count_.copy() for clf in scorer.nb_classifiers_split]
+    end = n_fit + n_streamed
+    streamed = df.iloc[n_fit:end]
+    for row in range(len(streamed)):
+        edit = streamed.iloc[[row]]
+        scorer.partial_fit(edit, edit["isvandalism"])
+
+    # Within each class, the folds of the streamed edits differ in size by one at most
+    folds = scorer.EditID_to_classifier_index.lookup(streamed["EditID"])
+    for label in (False, True):
+        per_fold = np.bincount(
+            folds[streamed["isvandalism"].to_numpy() == label],
+            minlength=scorer.n_splits,
+        )
+        assert per_fold.max() - per_fold.min() <= 1, f"{label} edits: {per_fold}"
+    # and every split classifier learned from the streamed edits of the other folds
+    for i, clf in enumerate(scorer.nb_classifiers_split):
+        added = (clf.class_count_ - before[i]).sum()
+        assert added == np.sum(folds != i), f"classifier {i} learned {added} edits"
+
+
+def check_learned_once(df, n_fit=200):
+    scorer = VandalismScorer().fit(df.iloc[:n_fit], df["isvandalism"].iloc[:n_fit])
+    end = n_fit + 50
+    new = df.iloc[n_fit:end]
+    scorer.partial_fit(new.iloc[:25], new["isvandalism"].iloc[:25])
+    counts = [clf.feature_count_.copy() for clf in scorer.nb_classifiers]
+    folds = scorer.EditID_to_classifier_index.lookup(df["EditID"].iloc[:end])
+
+    # Edits of fit, of a previous partial_fit, or twice in the same batch
+    for rows in ([0], [n_fit], [n_fit + 30, n_fit + 30], [n_fit + 40, 5]):
+        batch = df.iloc[rows]
+        try:
+            scorer.partial_fit(batch, batch["isvandalism"])
+            raise AssertionError(f"rows {rows} were learned again")
+        except ValueError:
+            pass
+        for clf, before in zip(scorer.nb_classifiers, counts):
+            assert np.array_equal(clf.feature_count_, before), rows
+        after = scorer.EditID_to_classifier_index.lookup(df["EditID"].iloc[:end])
+        assert np.array_equal(after, folds), f"rows {rows} changed fold"
+
+
+def main(batch_size=500, n_batches=10):
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    preprocessor(df)
+    check_equal_to_refit(df)
+    check_small_batches(df)
+    check_learned_once(df)
+    print(
+        "OK: same nb_classifier_total as a refit, small batches spread over folds, "
+        "edits already learned rejected"
+    )
+
+    df = pd.concat([df] * (batch_size * n_batches // len(df) + 1), ignore_index=True)
+    df["EditID"] = np.arange(len(df))
+
+    print(f"{'corpus rows':>11} {'partial_fit s':>14} {'full refit s':>13}")
+    scorer = VandalismScorer(n_hash_features=2**18)
+    for first_row in range(0, batch_size * n_batches, batch_size):
+        end = first_row + batch_size
+        batch = df.iloc[first_row:end]
+        start = time.perf_counter()
+        scorer.partial_fit(batch, batch["isvandalism"])
+        partial_time = time.perf_counter() - start
+
+        corpus = df.iloc[:end]
+        start = time.perf_counter()
+        VandalismScorer(n_hash_features=2**18).fit(corpus, corpus["isvandalism"])
+        refit_time = time.perf_counter() - start
+        print(f"{end:>11} {partial_time:>14.3f} {refit_time:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
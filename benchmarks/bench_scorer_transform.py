@@ -0,0 +1,71 @@
+"""
+Benchmark VandalismScorer.transform: per-row predict_proba (the original
+implementation) against the batched scoring engine.
+
+Run from the project root:
+    python benchmarks/bench_scorer_transform.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import VandalismScorer, preprocessor  # noqa: E402
+
+
+def rowwise_scores(scorer, X):
+    """Original per-row scoring: one predict_proba call per edit."""
+    X = X.replace(np.nan, "").reset_index(drop=True)
+    X_counts_diff = scorer._counts_diff(X)
+    classifier_index = scorer._classifier_index(X)
+    scores = []
+    for row, i in enumerate(classifier_index):
+        clf = scorer.nb_classifiers[i]
+        scores.append(clf.predict_proba(X_counts_diff[row])[:, clf.classes_].item())
+    return np.array(scores)
+
+
+def scale_up(df, factor):
+    """Repeat df `factor` times, giving every copy after the first unseen EditIDs."""
+    copies = []
+    offset = df["EditID"].max() + 1
+    for k in range(factor):
+        copy = df.copy()
+        copy["EditID"] = copy["EditID"] + k * offset
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def main():
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    preprocessor(df)
+    scorer = VandalismScorer().fit(df, df["isvandalism"])
+
+    print(f"{'rows':>8} {'per-row rows/s':>16} {'batched rows/s':>16} {'speedup':>8}")
+    for factor in (1, 10):
+        X = scale_up(df, factor)
+
+        start = time.perf_counter()
+        expected = rowwise_scores(scorer, X)
+        rowwise_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = scorer.transform(X)["vandalism_score"].to_numpy()
+        batched_time = time.perf_counter() - start
+
+        assert np.array_equal(scores, expected), "batched scores differ from per-row"
+        print(
+            f"{len(X):>8} {len(X) / rowwise_time:>16.0f} "
+            f"{len(X) / batched_time:>16.0f} {rowwise_time / batched_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Check and time ScoringService against the offline path of
+models/final_votingmethod.ipynb (preprocessor, then the fitted Pipeline's
+predict_proba on a DataFrame), on data/test_imbalanced.csv.
+
+The notebook's ensemble of XGBoost, LightGBM and CatBoost is replaced by a soft
+VotingClassifier of scikit-learn models, so that the check runs without them; the
+service only relies on the predict_proba / predict API they share.
+
+The service must give the same vandalism scores and probabilities as the offline
+path, for every edit, also once saved and loaded, serve models that do not use the
+vandalism score, and answer malformed edits with a 400 error over HTTP. Latency is
+then measured for single edits and micro-batches, called directly and through the
+HTTP server.
+
+Run from the project root:
+    python benchmarks/bench_scoring_service.py [n_calls]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.ensemble import HistGradientBoostingClassifier, VotingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import (  # noqa: E402
+    ScoringService,
+    VandalismScorer,
+    make_server,
+    preprocessor,
+)
+from feature_engineer.scoring_service import FEATURES  # noqa: E402
+
+DATA = os.path.join(project_root, "data", "test_imbalanced.csv")
+BATCH_SIZES = [1, 8, 64]
+
+
+class FeatureSelector(BaseEstimator, TransformerMixin):
+    """Feature selector of models/final_votingmethod.ipynb."""
+
+    def __init__(self, features):
+        self.features = features
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        return X[self.features]
+
+
+def fit_pipeline(df):
+    model = VotingClassifier(
+        [
+            ("hgb", HistGradientBoostingClassifier(random_state=42)),
+            ("lr", LogisticRegression(max_iter=5000)),
+        ],
+        voting="soft",
+    )
+    pipeline = Pipeline(
+        [
+            ("scorer", VandalismScorer(n_splits=5, random_state=42)),
+            ("select", FeatureSelector(FEATURES)),
+            ("model", model),
+        ]
+    )
+    return pipeline.fit(df, df["isvandalism"])
+
+
+def offline(pipeline, raw):
+    """Scores and probabilities of the offline path, for the rows it keeps."""
+    df = raw.copy()
+    preprocessor(df)
+    scores = pipeline.named_steps["scorer"].transform(df)["vandalism_score"]
+    return df["EditID"].to_numpy(), scores.to_numpy(), pipeline.predict_proba(df)[:, 1]
+
+
+def percentiles(seconds):
+    p50, p99 = np.percentile(np.array(seconds) * 1000, [50, 99])
+    return f"p50 {p50:7.3f} ms, p99 {p99:7.3f} ms"
+
+
+def time_calls(score, records, batch_size, n_calls):
+    rng = np.random.default_rng(0)
+    seconds = []
+    for _ in range(n_calls):
+        batch = [records[i] for i in rng.integers(len(records), size=batch_size)]
+        start = time.perf_counter()
+        score(batch[0] if batch_size == 1 else batch)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def post(url, records):
+    request = urllib.request.Request(
+        url, data=json.dumps(records).encode("utf-8"), method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def check_errors(url, record):
+    """Edits with fields that cannot be read get a 400 error naming the field."""
+    malformed = [
+        ("user_reg_time", "2010-11-03"),
+        ("user_edit_count", "abc"),
+        ("current_timestamp", None),
+        ("EditID", "abc"),
+    ]
+    for field, value in malformed:
+        try:
+            post(f"{url}/score", [record, {**record, field: value}])
+            raise AssertionError(f"{field}={value!r} was scored")
+        except urllib.error.HTTPError as e:
+            assert e.code == 400, e.code
+            assert field in json.loads(e.read())["error"]
+    for body in (3, [3]):
+        try:
+            post(f"{url}/score", body)
+            raise AssertionError(f"{body!r} was scored")
+        except urllib.error.HTTPError as e:
+            assert e.code == 400, e.code
+
+
+def main(n_calls=500):
+    raw = pd.read_csv(DATA)
+    train, _ = train_test_split(
+        raw, stratify=raw["isvandalism"], test_size=0.2, random_state=42
+    )
+    train = train.copy()
+    preprocessor(train)
+    pipeline = fit_pipeline(train)
+    service = ScoringService.from_pipeline(pipeline)
+
+    # Training edits are scored by their out-of-fold classifier, the others by the
+    # classifier fit on all the training edits: check both
+    edit_ids, scores, probabilities = offline(pipeline, raw)
+    records = raw.to_dict("records")
+    results = {r["EditID"]: r for r in service.score(records) if "error" not in r}
+    assert list(results) == list(edit_ids)
+    np.testing.assert_allclose(
+        [results[e]["vandalism_score"] for e in edit_ids], scores, rtol=1e-12
+    )
+    np.testing.assert_allclose(
+        [results[e]["probability"] for e in edit_ids], probabilities, rtol=1e-12
+    )
+    one = service.score(records[0])
+    assert one == service.score([records[0]])[0]
+    print(f"OK: same scores and probabilities for {len(edit_ids)} edits")
+
+    with tempfile.TemporaryDirectory() as path:
+        service.save(path)
+        assert ScoringService.load(path).score(records) == service.score(records)
+    print("OK: same results after save and load")
+
+    # A model that does not use the vandalism score
+    features = [name for name in FEATURES if name != "vandalism_score"]
+    model = LogisticRegression(max_iter=5000).fit(
+        train[features].fillna(0), train["isvandalism"]
+    )
+    scorer = pipeline.named_steps["scorer"]
+    without = ScoringService(scorer, model, features).score(records[:8])
+    assert all(r["vandalism_score"] is None for r in without if "error" not in r)
+    print("OK: a model without the vandalism score is served")
+
+    def offline_score(batch):
+        batch = batch if isinstance(batch, list) else [batch]
+        return offline(pipeline, pd.DataFrame(batch))
+
+    # Timed on the edits the offline path keeps, so that no call is left empty
+    records = [r for r in records if r["EditID"] in results]
+    print(f"\n{n_calls} calls per batch size")
+    for batch_size in BATCH_SIZES:
+        before = percentiles(time_calls(offline_score, records, batch_size, n_calls))
+        after = percentiles(time_calls(service.score, records, batch_size, n_calls))
+        print(f"batch {batch_size:>3}: offline {before} | service {after}")
+
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        assert post(f"{url}/score", records[:8]) == json.loads(
+            json.dumps(service.score(records[:8]))
+        )
+        check_errors(url, records[0])
+        print("OK: malformed edits get a 400 error over HTTP")
+        seconds = time_calls(lambda b: post(f"{url}/score", b), records, 1, n_calls)
+        print(f"HTTP, single edits: {percentiles(seconds)}")
+        with urllib.request.urlopen(f"{url}/latency") as response:
+            print(f"service.latency(): {json.loads(response.read())}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,153 @@
+"""
+Benchmark tokenizing the edit texts once with TokenizedEdits, shared by the word
+counts of preprocessor and the matrices of VandalismScorer, against tokenizing them
+separately: word_count_vectorized, then CountVectorizer.fit on the added and deleted
+texts, then one CountVectorizer.transform for each.
+
+Both must give the same word counts, vocabulary and matrix of net words added.
+Time per stage is reported for both, then the time of preprocessor, fit and
+transform end to end, with and without the shared tokens.
+
+Run from the project root:
+    python benchmarks/bench_tokenization.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from bench_scorer_transform import scale_up  # noqa: E402
+from feature_engineer import (  # noqa: E402
+    TokenizedEdits,
+    VandalismScorer,
+    preprocessor,
+    word_count_vectorized,
+)
+
+REPEATS = 5  # timed end to end runs of each, after a warm-up run
+
+
+class Stages:
+    """Wall time of named stages, in order."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def run(self, name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.seconds[name] = time.perf_counter() - start
+        return result
+
+
+def net_added(added, deleted):
+    X_counts_diff = (added - deleted).maximum(0)
+    X_counts_diff.eliminate_zeros()
+    return X_counts_diff.tocsr()
+
+
+def separate(X):
+    stages = Stages()
+    word_counts = stages.run("word counts", word_count_vectorized, X)
+    texts = X[["added_lines", "deleted_lines"]].replace(np.nan, "")
+    vectorizer = CountVectorizer()
+    stages.run(
+        "vocabulary",
+        vectorizer.fit,
+        pd.concat([texts["added_lines"], texts["deleted_lines"]], axis=0),
+    )
+    added = stages.run("count added", vectorizer.transform, texts["added_lines"])
+    deleted = stages.run("count deleted", vectorizer.transform, texts["deleted_lines"])
+    X_counts_diff = stages.run("net words added", net_added, added, deleted)
+    return stages, word_counts, vectorizer.vocabulary_, X_counts_diff
+
+
+def shared(X):
+    stages = Stages()
+    tokens = stages.run("tokenize", TokenizedEdits.from_frame, X)
+    word_counts = stages.run("word counts", tokens.word_counts)
+    vectorizer = CountVectorizer()
+    added, deleted = stages.run(
+        "vocabulary + counts", tokens.counts, vectorizer, fit=True
+    )
+    X_counts_diff = stages.run("net words added", net_added, added, deleted)
+    return stages, word_counts, vectorizer.vocabulary_, X_counts_diff
+
+
+def end_to_end(name, X, train, test):
+    """
+    Seconds and scores of preprocessor on train and test, then fitting the scorer on
+    train and scoring test, with the tokens of X shared or not.
+    """
+    start = time.perf_counter()
+    shared_tokens = TokenizedEdits.from_frame(X) if name == "shared" else None
+    train_copy, test_copy = train.copy(), test.copy()
+    preprocessor(train_copy, tokens=shared_tokens)
+    preprocessor(test_copy, tokens=shared_tokens)
+    scorer = VandalismScorer().fit(
+        train_copy, train_copy["isvandalism"], tokens=shared_tokens
+    )
+    scores = scorer.transform(test_copy, tokens=shared_tokens)
+    return time.perf_counter() - start, scores
+
+
+def report(name, stages):
+    parts = ", ".join(f"{stage} {s:.3f}s" for stage, s in stages.seconds.items())
+    print(f"  {name:>8}: {sum(stages.seconds.values()):7.3f}s  ({parts})")
+
+
+def main():
+    df = pd.read_csv(os.path.join(project_root, "data", "test_imbalanced.csv"))
+    df = df[
+        (df["added_lines"] != "BAD REQUEST") & (df["deleted_lines"] != "BAD REQUEST")
+    ]
+
+    for factor in (1, 10, 50):
+        X = scale_up(df, factor)
+        stages_before, counts_before, vocabulary_before, diff_before = separate(X)
+        stages_after, counts_after, vocabulary_after, diff_after = shared(X)
+        for before, after in zip(counts_before, counts_after):
+            assert np.array_equal(before, after), "word counts differ"
+        assert vocabulary_before == vocabulary_after, "vocabularies differ"
+        assert (diff_before != diff_after).nnz == 0, "matrices differ"
+
+        total_before = sum(stages_before.seconds.values())
+        total_after = sum(stages_after.seconds.values())
+        print(f"{len(X)} edits: {total_before / total_after:.1f}x")
+        report("separate", stages_before)
+        report("shared", stages_after)
+
+    # End to end: the tokens of preprocessor reused by the scorer, on a split. Both
+    # are run once to warm up, then in alternating order, and the median and best
+    # times are reported
+    X = scale_up(df, 10)
+    train = X.sample(frac=0.8, random_state=0)
+    test = X.drop(train.index)
+    seconds = {"separate": [], "shared": []}
+    scores = {}
+    for run in range(REPEATS + 1):
+        names = ["separate", "shared"] if run % 2 else ["shared", "separate"]
+        for name in names:
+            elapsed, scores[name] = end_to_end(name, X, train, test)
+            if run > 0:
+                seconds[name].append(elapsed)
+    for name, times in seconds.items():
+        print(
+            f"preprocessor + fit + transform, {name} tokens: "
+            f"median {np.median(times):.3f}s, best {min(times):.3f}s "
+            f"({REPEATS} runs)"
+        )
+    pd.testing.assert_frame_equal(scores["separate"], scores["shared"])
+    print("OK: same word counts, vocabulary, matrices and scores")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark peak memory and time of the streaming XML cleaning operations
+(data/data_gathering/data_cleaning_and_preprocessing) on a synthetic WPEditSet file,
+against loading the whole tree with ET.parse as the scripts used to do.
+Each operation runs in a fresh subprocess so that its peak RSS is measured on its own.
+The files written by the operations are then checked to be byte-identical to those
+of the previous scripts, which built the whole output tree, on a smaller file.
+
+Run from the project root, optionally with the size of the synthetic file in MB:
+    python benchmarks/bench_xml_stream.py [size_mb, default 1024]
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+cleaning_dir = os.path.join(
+    project_root, "data", "data_gathering", "data_cleaning_and_preprocessing"
+)
+
+OPERATIONS = {
+    "ET.parse (whole tree)": "root = ET.parse(XML).getroot()\n"
+    "ids = {w.findtext('EditID') for w in root.findall('WPEdit')}",
+    "combine_xml": "from combine_xml import combine\ncombine([XML, SMALL], OUT)",
+    "count_edits_remove_duplicates": "from count_edits_remove_duplicates import "
+    "remove_duplicates\nremove_duplicates(XML, OUT)",
+    "remove_xml_overlaps": "from remove_xml_overlaps import remove_overlaps\n"
+    "remove_overlaps(XML, SMALL, OUT)",
+    "find_overlaps": "from find_overlaps import extract_edit_ids_and_vandal_counts\n"
+    "extract_edit_ids_and_vandal_counts(XML)",
+    "disagreement_count": "from disagreement_count import extract_editid_to_vandal\n"
+    "extract_editid_to_vandal(XML)",
+    "dates": "from dates import find_earliest_latest\nfind_earliest_latest(XML)",
+    "data_truncation": "from data_truncation import truncate\n"
+    "truncate(XML, OUT, 30)",
+}
+
+# What the scripts did before streaming, for the operations writing a file
+WHOLE_TREE = {
+    "combine_xml": "combined_root = ET.Element('WPEditSet')\n"
+    "for xml_file in [XML, SMALL]:\n"
+    "    for wpedit in ET.parse(xml_file).getroot().findall('WPEdit'):\n"
+    "        combined_root.append(wpedit)\n"
+    "ET.ElementTree(combined_root).write(OUT, encoding='utf-8', "
+    "xml_declaration=True)",
+    "count_edits_remove_duplicates": "seen_ids = set()\n"
+    "new_root = ET.Element('WPEditSet')\n"
+    "for wpedit in ET.parse(XML).getroot().findall('WPEdit'):\n"
+    "    eid = wpedit.findtext('EditID')\n"
+    "    if eid and eid not in seen_ids:\n"
+    "        seen_ids.add(eid)\n"
+    "        new_root.append(wpedit)\n"
+    "ET.ElementTree(new_root).write(OUT, encoding='utf-8', xml_declaration=True)",
+    "remove_xml_overlaps": "editids_to_remove = {\n"
+    "    w.findtext('EditID').strip()\n"
+    "    for w in ET.parse(SMALL).getroot().findall('WPEdit')\n"
+    "}\n"
+    "filtered_root = ET.Element('WPEditSet')\n"
+    "for wpedit in ET.parse(XML).getroot().findall('WPEdit'):\n"
+    "    eid = wpedit.findtext('EditID')\n"
+    "    if eid and eid.strip() not in editids_to_remove:\n"
+    "        filtered_root.append(wpedit)\n"
+    "ET.ElementTree(filtered_root).write(OUT, encoding='utf-8', "
+    "xml_declaration=True)",
+    "data_truncation": "root = ET.Element('WPEditSet')\n"
+    "root.extend(ET.parse(XML).getroot().findall('WPEdit')[:30])\n"
+    "ET.ElementTree(root).write(OUT, encoding='utf-8', xml_declaration=True)",
+}
+
+# Printed by every subprocess once it is done: peak RSS in kilobytes (Linux)
+REPORT_PEAK_RSS = """
+import resource
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def wpedit(edit_id, rng):
+    text = " ".join(
+        rng.choice(("lorem", "ipsum", "dolor", "[[link]]")) for _ in range(80)
+    )
+    fields = (
+        "<EditType>change</EditType>",
+        f"<EditID>{edit_id}</EditID>",
+        f"<comment>edit {edit_id}</comment>",
+        f"<user>User{edit_id % 997}</user>",
+        f"<common><title>Page {edit_id % 5003}</title><namespace>main</namespace>"
+        "<page_made_time>1014651791</page_made_time></common>",
+        f"<current><timestamp>{1288755849 + edit_id}</timestamp>"
+        f"<minor>false</minor><text>{text}</text></current>",
+        f"<previous><text>{text}</text></previous>",
+        f"<isvandalism>{'true' if rng.random() < 0.1 else 'false'}</isvandalism>",
+    )
+    # Indented as in the dumps, so that every element has a whitespace tail
+    return "<WPEdit>\n    " + "\n    ".join(fields) + "\n  </WPEdit>"
+
+
+def write_synthetic(path, size_mb, first_id=0):
+    rng = random.Random(0)
+    edit_id = first_id
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<WPEditSet>")
+        while f.tell() < size_mb * 2**20:
+            f.write("\n  " + wpedit(edit_id, rng))
+            edit_id += 1
+        f.write("\n</WPEditSet>\n")
+    return edit_id - first_id
+
+
+def run(code, xml_file, small_file, out_file):
+    """Run code in a fresh subprocess, returning its time and peak RSS in MB."""
+    script = (
+        f"import xml.etree.ElementTree as ET\n"
+        f"XML, SMALL, OUT = {xml_file!r}, {small_file!r}, {out_file!r}\n"
+        f"{code}\n{REPORT_PEAK_RSS}"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=cleaning_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, int(result.stdout.split()[-1]) / 1024
+
+
+def check_outputs(tmp, size_mb=20):
+    """
+    Check that every operation writing a file writes the same bytes as the whole
+    tree version, on a size_mb file.
+    """
+    xml_file = os.path.join(tmp, "parity.xml")
+    small_file = os.path.join(tmp, "parity_small.xml")
+    n_edits = write_synthetic(xml_file, size_mb)
+    write_synthetic(small_file, 1, first_id=n_edits // 2)
+    for name, code in WHOLE_TREE.items():
+        outputs = []
+        for version in (OPERATIONS[name], code):
+            out_file = os.path.join(tmp, f"parity_out{len(outputs)}.xml")
+            run(version, xml_file, small_file, out_file)
+            with open(out_file, "rb") as f:
+                outputs.append(f.read())
+        assert outputs[0] == outputs[1], f"{name}: output differs from the whole tree"
+        print(f"OK: {name} writes the same {len(outputs[0])} bytes as the whole tree")
+
+
+def main(size_mb=1024):
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_file = os.path.join(tmp, "edits.xml")
+        small_file = os.path.join(tmp, "small.xml")
+        out_file = os.path.join(tmp, "out.xml")
+        n_edits = write_synthetic(xml_file, size_mb)
+        write_synthetic(small_file, 1, first_id=n_edits // 2)
+        print(f"{size_mb} MB synthetic file, {n_edits} edits")
+
+        print(f"{'operation':>30} {'time s':>8} {'peak RSS MB':>12}")
+        for name, code in OPERATIONS.items():
+            elapsed, peak_mb = run(code, xml_file, small_file, out_file)
+            print(f"{name:>30} {elapsed:>8.1f} {peak_mb:>12.1f}")
+        os.remove(xml_file)
+
+        check_outputs(tmp)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1024)
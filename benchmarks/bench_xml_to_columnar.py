@@ -0,0 +1,193 @@
+"""
+Benchmark the single-pass WPEdit reader of xml_to_columnar (used by
+summarize_edit_diffs) against the previous per-field extract_field lookups, and
+check that:
+- both produce the same rows, edge cases included,
+- the Parquet and Arrow files written by convert read back in pandas exactly like
+  the CSV written from the same rows, with and without attach_diffs.
+
+Run from the project root, optionally with the number of synthetic edits:
+    python benchmarks/bench_xml_to_columnar.py [n_edits, default 100000]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+from xml_to_columnar import (  # noqa: E402
+    COLUMNS,
+    attach_diffs,
+    convert,
+    iter_rows,
+    read_row,
+)
+
+# Awkward WPEdits: missing fields, empty elements, repeated tags, and top level
+# elements named like the fields that come from <common> and <current>
+EDGE_CASES = [
+    "<WPEdit><EditID>1</EditID></WPEdit>",
+    "<WPEdit><EditID>2</EditID><comment/><common/><current/><user></user></WPEdit>",
+    "<WPEdit><EditID>3</EditID><user>A</user><user>B</user><title>Top</title>"
+    "<common><title>First</title><title>Second</title></common>"
+    "<common><creator>Ignored</creator></common>"
+    "<current><minor>True</minor><timestamp>5</timestamp></current>"
+    "<current_timestamp>9</current_timestamp></WPEdit>",
+    "<WPEdit><EditID>4</EditID><common>text<namespace>talk</namespace></common>"
+    "<previous><timestamp>3</timestamp></previous><previous_timestamp>7"
+    "</previous_timestamp><isvandalism>FALSE</isvandalism></WPEdit>",
+]
+
+
+def extract_field(wpedit, path, default=""):
+    """Previous implementation, one find per path component and per field."""
+    elem = wpedit
+    for part in path.split("/"):
+        if elem is not None:
+            elem = elem.find(part)
+        else:
+            return default
+    return elem.text if (elem is not None and elem.text is not None) else default
+
+
+def reference_read_row(wpedit):
+    """Previous summarize_edit_diffs.read_row, kept as the reference."""
+    row = {col: extract_field(wpedit, col) for col in COLUMNS}
+    row["page_made_time"] = extract_field(wpedit, "common/page_made_time")
+    row["title"] = extract_field(wpedit, "common/title")
+    row["namespace"] = extract_field(wpedit, "common/namespace")
+    row["creator"] = extract_field(wpedit, "common/creator")
+    row["num_recent_edits"] = extract_field(wpedit, "common/num_recent_edits")
+    row["num_recent_reversions"] = extract_field(wpedit, "common/num_recent_reversions")
+    row["current_minor"] = extract_field(wpedit, "current/minor")
+    row["current_timestamp"] = extract_field(wpedit, "current/timestamp")
+    return row
+
+
+def wpedit(edit_id, rng):
+    comment = rng.choice(("", "<comment/>", f"<comment>fix typo {edit_id}</comment>"))
+    reg_time = rng.choice(("1228940029", "20101103034415"))
+    return (
+        f"<WPEdit><EditType>change</EditType><EditID>{edit_id}</EditID>{comment}"
+        f"<user>User{edit_id % 997}</user><user_edit_count>{edit_id % 5000}"
+        f"</user_edit_count><user_distinct_pages>{edit_id % 300}"
+        f"</user_distinct_pages><user_warns>{edit_id % 7}</user_warns>"
+        f"<user_reg_time>{reg_time}</user_reg_time><prev_user>10.0.0.{edit_id % 255}"
+        f"</prev_user><common><page_made_time>1014651791</page_made_time>"
+        f"<title>Page {edit_id % 5003}</title><namespace>main</namespace>"
+        f"<creator>Creator {edit_id % 31}</creator><num_recent_edits>{edit_id % 9}"
+        f"</num_recent_edits><num_recent_reversions>{edit_id % 3}"
+        f"</num_recent_reversions></common><current><minor>"
+        f"{rng.choice(('True', 'False'))}</minor><timestamp>{1288755849 + edit_id}"
+        f"</timestamp><text>current text</text></current><previous><timestamp>"
+        f"{1288755000 + edit_id}</timestamp><text>previous text</text></previous>"
+        f"<isvandalism>{'True' if rng.random() < 0.1 else 'False'}</isvandalism>"
+        "</WPEdit>\n"
+    )
+
+
+def write_synthetic(path, n_edits):
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<WPEditSet>\n")
+        for edit_id in range(n_edits):
+            f.write(wpedit(edit_id, rng))
+        f.write("</WPEditSet>\n")
+
+
+def write_csv(path, rows, diffs):
+    """Write rows the way summarize_edit_diffs does."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            row = dict(row)
+            row["added_lines"], row["deleted_lines"] = diffs.get(
+                row["EditID"], ("BAD REQUEST", "BAD REQUEST")
+            )
+            writer.writerow(row)
+
+
+def check_parity(tmp):
+    for case in EDGE_CASES:
+        elem = ET.fromstring(case)
+        assert read_row(elem) == reference_read_row(elem), case
+
+    xml_file = os.path.join(tmp, "parity.xml")
+    write_synthetic(xml_file, 2000)
+    rows = list(iter_rows(xml_file))
+    root = ET.parse(xml_file).getroot()
+    assert rows == [reference_read_row(w) for w in root.findall("WPEdit")]
+
+    # Every other edit has a diff, with an empty deleted_lines now and then
+    diffs = {
+        row["EditID"]: [f"added {i}", "" if i % 10 == 0 else f"deleted {i}"]
+        for i, row in enumerate(rows)
+        if i % 2 == 0
+    }
+    csv_file = os.path.join(tmp, "parity.csv")
+    write_csv(csv_file, rows, diffs)
+    expected = pd.read_csv(csv_file)
+    for ext in (".parquet", ".arrow"):
+        direct = os.path.join(tmp, "direct" + ext)
+        bare = os.path.join(tmp, "bare" + ext)
+        attached = os.path.join(tmp, "attached" + ext)
+        convert(xml_file, direct, diffs=diffs, batch_size=300)
+        convert(xml_file, bare, batch_size=300)
+        attach_diffs(bare, diffs, attached, batch_size=300)
+        for path in (direct, attached):
+            read = pd.read_parquet if ext == ".parquet" else pd.read_feather
+            table = read(path)
+            # common, current and previous are always empty: read as float from the
+            # CSV, null strings here
+            containers = ["common", "current", "previous"]
+            assert table[containers].isna().all().all()
+            pd.testing.assert_frame_equal(
+                table.drop(columns=containers),
+                expected.drop(columns=containers),
+                check_column_type=False,
+            )
+    print("Parity OK: rows, edge cases, Parquet and Arrow files match the CSV")
+
+
+def main(n_edits=100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        check_parity(tmp)
+
+        xml_file = os.path.join(tmp, "edits.xml")
+        write_synthetic(xml_file, n_edits)
+        root = ET.parse(xml_file).getroot()
+        wpedits = root.findall("WPEdit")
+
+        start = time.perf_counter()
+        for w in wpedits:
+            reference_read_row(w)
+        reference = time.perf_counter() - start
+        start = time.perf_counter()
+        for w in wpedits:
+            read_row(w)
+        single_pass = time.perf_counter() - start
+        print(f"{n_edits} edits")
+        print(f"per-field extract_field: {reference:.2f}s")
+        print(f"single-pass read_row:    {single_pass:.2f}s "
+              f"({reference / single_pass:.1f}x)")  # fmt: skip
+
+        for ext in (".parquet", ".arrow"):
+            out = os.path.join(tmp, "edits" + ext)
+            start = time.perf_counter()
+            convert(xml_file, out)
+            elapsed = time.perf_counter() - start
+            size_mb = os.path.getsize(out) / 2**20
+            print(f"convert to {ext:<8}       {elapsed:.2f}s, {size_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
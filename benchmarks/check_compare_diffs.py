@@ -0,0 +1,71 @@
+"""
+Check the "compare" diff source of summarize_edit_diffs and find_edits against the
+sample compare API responses of fixtures/compare_responses.json, replayed by a local
+HTTP server: MediaWikiClient.fetch_compare_diff followed by line_diff.compare_lines
+must give the same added and deleted lines as diffing the two revision texts
+locally, and None for revisions the API reports as missing.
+
+Run from the project root:
+    python benchmarks/check_compare_diffs.py
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+from line_diff import compare_lines, trimmed_lines  # noqa: E402
+from mediawiki_client import MediaWikiClient  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "compare_responses.json")
+
+
+def replay_server(fixtures):
+    """Start a local server answering compare requests from the fixtures."""
+    responses = {(f["fromrev"], f["torev"]): f["response"] for f in fixtures}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            key = (int(params["fromrev"]), int(params["torev"]))
+            body = json.dumps(responses[key]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/api.php"
+
+
+def main():
+    with open(FIXTURES, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    server, url = replay_server(fixtures)
+    client = MediaWikiClient(api_url=url, backoff=0)
+    try:
+        for fixture in fixtures:
+            body = client.fetch_compare_diff(fixture["fromrev"], fixture["torev"])
+            if fixture["prev_text"] is None:
+                assert body is None, fixture["name"]
+                continue
+            expected = trimmed_lines(fixture["prev_text"], fixture["curr_text"])
+            assert compare_lines(body) == expected, fixture["name"]
+            print(f"OK: {fixture['name']}")
+    finally:
+        server.shutdown()
+    print(f"{len(fixtures)} fixtures, {client.requests_made} compare requests")
+
+
+if __name__ == "__main__":
+    main()
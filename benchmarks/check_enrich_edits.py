@@ -0,0 +1,209 @@
+"""
+Check and time the enrich_edits driver of data/data_gathering/api_calls against
+running summarize_edit_diffs, recent_edit_count_for_csv and is_person_encoding one
+after the other, on a synthetic xml file whose titles, revisions and Wikidata items
+are served by a local HTTP server (with a fixed delay per request standing in for
+network latency).
+
+Both must write the same csv. A second run of the driver must make no requests,
+every stage's results being in its checkpoint.
+
+Run from the project root:
+    python benchmarks/check_enrich_edits.py [n_edits]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+import enrich_edits  # noqa: E402
+import is_person_encoding  # noqa: E402
+import recent_edit_count_for_csv  # noqa: E402
+import summarize_edit_diffs  # noqa: E402
+import wikidata_resolver  # noqa: E402
+from check_wikidata_resolver import random_graph  # noqa: E402
+from mediawiki_client import MediaWikiClient  # noqa: E402
+from revision_timeline import format_time, parse_time  # noqa: E402
+
+LATENCY = 0.1  # seconds per request
+PAGE_SIZE = 500
+START = 1262304000  # 2010-01-01
+CLIENT = {"max_requests_per_second": 1000, "backoff": 0}
+
+
+class World:
+    """Titles with revision histories, and the Wikidata items of the titles."""
+
+    def __init__(self, n_titles=100, seed=0):
+        rng = random.Random(seed)
+        titles, self.parents = random_graph(n_titles, seed)
+        self.qids = {title.replace("_", " "): qid for title, qid in titles.items()}
+        self.history = {}  # title -> sorted (time, revid)
+        self.texts = {}  # revid -> wikitext
+        revid = 1000
+        for title in self.qids:
+            times = sorted(START + rng.randrange(60 * 86400) for _ in range(50))
+            lines = [f"{title} line {k}" for k in range(20)]
+            self.history[title] = []
+            for t in times:
+                revid += 1
+                lines = list(lines)
+                lines[rng.randrange(len(lines))] = f"edit {revid}"
+                self.history[title].append((t, revid))
+                self.texts[revid] = "\n".join(lines)
+
+    def respond(self, params):
+        if params.get("action") == "wbgetentities":
+            return {"entities": {q: self.entity(q) for q in params["ids"].split("|")}}
+        if params.get("prop") == "pageprops":
+            names = params["titles"].split("|")
+            pages = {}
+            for k, title in enumerate(name.replace("_", " ") for name in names):
+                pages[str(k)] = {"title": title}
+                if self.qids.get(title):
+                    pages[str(k)]["pageprops"] = {"wikibase_item": self.qids[title]}
+            normalized = [{"from": n, "to": n.replace("_", " ")} for n in names]
+            return {"query": {"normalized": normalized, "pages": pages}}
+        if "revids" in params:
+            revisions = [
+                {"revid": int(r), "slots": {"main": {"content": self.texts[int(r)]}}}
+                for r in params["revids"].split("|")
+            ]
+            return {"query": {"pages": [{"revisions": revisions}]}}
+        return self.revisions(params)
+
+    def revisions(self, params):
+        history = self.history.get(params["titles"].replace("_", " "))
+        if history is None:
+            return {"query": {"pages": {"-1": {"missing": ""}}}}
+        times = [t for t, _ in history]
+        last = bisect_right(times, parse_time(params["rvstart"]))
+        first = bisect_left(times, parse_time(params.get("rvend", format_time(0))))
+        window = history[first:last][::-1]
+        offset = int(params.get("rvcontinue", 0))
+        end = offset + (
+            PAGE_SIZE if params["rvlimit"] == "max" else int(params["rvlimit"])
+        )
+        revisions = [
+            {"revid": revid, "timestamp": format_time(t)}
+            for t, revid in window[offset:end]
+        ]
+        response = {"query": {"pages": {"1": {"revisions": revisions}}}}
+        if end < len(window):
+            response["continue"] = {"rvcontinue": str(end)}
+        return response
+
+    def entity(self, qid):
+        claims = [
+            {"mainsnak": {"datavalue": {"value": {"id": parent}}}}
+            for parent in self.parents.get(qid, [])
+        ]
+        return {"id": qid, "claims": {"P31": claims}}
+
+    def write_xml(self, path, n_edits, seed=1):
+        rng = random.Random(seed)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n<WPEditSet>\n")
+            for edit_id in range(n_edits):
+                title = rng.choice(list(self.history))
+                t, _ = rng.choice(self.history[title])
+                f.write(
+                    f"<WPEdit><EditType>change</EditType><EditID>{edit_id}</EditID>"
+                    f"<user>User{edit_id % 97}</user><common><title>{title}</title>"
+                    f"<namespace>main</namespace></common><current><minor>False"
+                    f"</minor><timestamp>{t}</timestamp></current>"
+                    f"<isvandalism>{rng.choice(['True', 'False'])}</isvandalism>"
+                    "</WPEdit>\n"
+                )
+            f.write("</WPEditSet>\n")
+
+
+def serve(world):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(LATENCY)
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            body = json.dumps(world.respond(params)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/api.php"
+
+
+def run_scripts(url, workdir, xml_file):
+    """summarize_edit_diffs, then recent_edit_count_for_csv, then is_person_encoding."""
+    summarize_edit_diffs.input_xml = xml_file
+    summarize_edit_diffs.output_csv = os.path.join(workdir, "diffs.csv")
+    summarize_edit_diffs.checkpoint_file = os.path.join(workdir, "diffs.jsonl")
+    recent_edit_count_for_csv.input_csv = summarize_edit_diffs.output_csv
+    recent_edit_count_for_csv.output_csv = os.path.join(workdir, "counts.csv")
+    is_person_encoding.input_csv = recent_edit_count_for_csv.output_csv
+    is_person_encoding.output_csv = os.path.join(workdir, "scripts.csv")
+    is_person_encoding.graph_file = os.path.join(workdir, "scripts_graph.sqlite")
+    requests_made = 0
+    for script in (summarize_edit_diffs, recent_edit_count_for_csv, is_person_encoding):
+        client = MediaWikiClient(api_url=url, **CLIENT)
+        script.main(client)
+        requests_made += client.requests_made
+    return is_person_encoding.output_csv, requests_made
+
+
+def run_driver(url, workdir, xml_file):
+    enrich_edits.input_xml = xml_file
+    enrich_edits.output_csv = os.path.join(workdir, "driver.csv")
+    enrich_edits.checkpoint_prefix = os.path.join(workdir, "driver")
+    enrich_edits.graph_file = os.path.join(workdir, "driver_graph.sqlite")
+    client = MediaWikiClient(api_url=url, pool_size=24, **CLIENT)
+    enrich_edits.main(client)
+    return enrich_edits.output_csv, client.requests_made
+
+
+def main(n_edits=1000):
+    world = World()
+    server, url = serve(world)
+    wikidata_resolver.WIKIDATA_API_URL = url
+    workdir = tempfile.mkdtemp()
+    xml_file = os.path.join(workdir, "edits.xml")
+    world.write_xml(xml_file, n_edits)
+    timings = {}
+    try:
+        for name, run in (("scripts", run_scripts), ("driver", run_driver)):
+            start = time.perf_counter()
+            output, requests_made = run(url, workdir, xml_file)
+            timings[name] = time.perf_counter() - start, requests_made
+        _, requests_made = run_driver(url, workdir, xml_file)
+        assert requests_made == 0, f"{requests_made} requests on the second run"
+    finally:
+        server.shutdown()
+
+    scripts = pd.read_csv(os.path.join(workdir, "scripts.csv"))
+    driver = pd.read_csv(os.path.join(workdir, "driver.csv"))
+    pd.testing.assert_frame_equal(scripts, driver)
+    print()
+    for name, (seconds, requests_made) in timings.items():
+        print(f"{name:>8}: {requests_made} requests, {seconds:.2f}s")
+    print(f"OK: same csv for {n_edits} edits, no requests on the second driver run")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,152 @@
+"""
+Check the retries and the rate limit of MediaWikiClient against a local HTTP server
+answering each request with a scripted status code and Retry-After header:
+
+- retryable errors (429, 5xx) are retried until a success, waiting the server's
+  Retry-After, whether given in seconds or as an HTTP date, and the exponential
+  backoff when it is missing or malformed;
+- the last error is raised once max_retries retries have failed, also for
+  connection errors;
+- requests from many threads are spaced out by max_requests_per_second.
+
+Run from the project root:
+    python benchmarks/check_mediawiki_retries.py
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+from mediawiki_client import MediaWikiClient  # noqa: E402
+
+OK = (200, None)
+
+
+def scripted_server(scripts):
+    """
+    Start a local server answering the n-th request of case c with the status and
+    Retry-After of scripts[c][n] (the last one once the script is exhausted), and
+    recording the arrival time of every request in server.arrivals.
+    """
+    hits = {case: 0 for case in scripts}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            case = parse_qs(urlparse(self.path).query)["case"][0]
+            with lock:
+                server.arrivals.append(time.monotonic())
+                n = hits[case]
+                hits[case] += 1
+            script = scripts[case]
+            status, retry_after = script[min(n, len(script) - 1)]
+            retry_after = retry_after() if callable(retry_after) else retry_after
+            body = json.dumps({"case": case, "request": n}).encode("utf-8")
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.arrivals = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/api.php"
+
+
+def http_date(seconds_from_now):
+    return lambda: formatdate(time.time() + seconds_from_now, usegmt=True)
+
+
+def timed_get(client, case):
+    start = time.monotonic()
+    data = client.get({"case": case})
+    return data, time.monotonic() - start
+
+
+def main():
+    scripts = {
+        "seconds": [(429, "0"), (503, "0"), OK],
+        "past date": [(503, http_date(-60)), OK],
+        "future date": [(429, http_date(2)), OK],
+        "malformed": [(503, "soon"), (503, ""), OK],
+        "no header": [(500, None), OK],
+        "always failing": [(502, "0")],
+        "rate": [OK],
+    }
+    server, url = scripted_server(scripts)
+    try:
+        client = MediaWikiClient(api_url=url, max_retries=3, backoff=0.05)
+
+        data, _ = timed_get(client, "seconds")
+        assert data == {"case": "seconds", "request": 2}, data
+        data, seconds = timed_get(client, "past date")
+        assert data["request"] == 1 and seconds < 1, (data, seconds)
+        # An HTTP date 2 s ahead, with one second resolution: at least 1 s of waiting
+        data, seconds = timed_get(client, "future date")
+        assert data["request"] == 1 and 1 <= seconds < 3, (data, seconds)
+        # Backoff of 0.05 s then 0.1 s when the header cannot be parsed
+        data, seconds = timed_get(client, "malformed")
+        assert data["request"] == 2 and 0.15 <= seconds < 1, (data, seconds)
+        data, seconds = timed_get(client, "no header")
+        assert data["request"] == 1 and 0.05 <= seconds < 1, (data, seconds)
+        print("OK: retries after Retry-After in seconds, as a date, or malformed")
+
+        before = client.requests_made
+        try:
+            client.get({"case": "always failing"})
+            raise AssertionError("no error raised")
+        except requests.HTTPError as e:
+            assert e.response.status_code == 502
+        assert client.requests_made - before == client.max_retries + 1
+
+        unreachable = MediaWikiClient(api_url=url, max_retries=2, backoff=0)
+        unreachable.api_url = "http://127.0.0.1:1/w/api.php"
+        try:
+            unreachable.get({"case": "rate"})
+            raise AssertionError("no error raised")
+        except requests.ConnectionError:
+            pass
+        assert unreachable.requests_made == unreachable.max_retries + 1
+        print("OK: the last error is raised after max_retries retries")
+
+        n_requests, rate = 40, 20
+        limited = MediaWikiClient(
+            api_url=url, max_workers=8, max_requests_per_second=rate
+        )
+        server.arrivals.clear()
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: limited.get({"case": "rate"}), range(n_requests)))
+        seconds = time.monotonic() - start
+        assert seconds >= (n_requests - 1) / rate, seconds
+        arrivals = sorted(server.arrivals)
+        # Any window of rate requests spans about a second
+        spans = [arrivals[i + rate] - arrivals[i] for i in range(n_requests - rate)]
+        assert min(spans) >= 0.9, min(spans)
+        print(
+            f"OK: {n_requests} requests from 8 threads at {rate}/s took "
+            f"{seconds:.2f} s"
+        )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Check MediaWikiClient.fetch_revision_texts, and the fan-out of its texts to the edits
+in summarize_edit_diffs.fetch_diffs, against a local HTTP server holding revisions
+some of which are missing or hidden, failing every request for the batch of one
+revision, and answering at most PAGE_SIZE revisions per response (the rest being
+continued, as the API does for large results):
+
+- each request asks for at most 50 revids, every revid is asked for in exactly one
+  batch, and the number of requests is that of the batches and their continuations;
+- each revid is mapped to its own text, missing and hidden revisions are left out
+  and the revisions of the failed batch are mapped to None;
+- a second call with a RevisionStore only requests the revisions of the failed
+  batch and the missing or hidden ones again;
+- fetch_diffs fetches the texts of whole revision pairs in requests of at most 50
+  revids, and checkpoints the diff of each edit's own pair of texts, BAD REQUEST for
+  the edits with a missing or hidden revision, and nothing for the edits of the
+  failed batch, which are retried on the next run;
+- interrupted while fetching texts, fetch_diffs keeps the diffs of the chunks of
+  edits fetched so far, and the next run only fetches the others.
+
+Run from the project root:
+    python benchmarks/check_revision_batches.py
+"""
+
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+from mediawiki_client import (  # noqa: E402
+    MAX_REVIDS_PER_REQUEST,
+    Checkpoint,
+    MediaWikiClient,
+)
+from revision_store import RevisionStore  # noqa: E402
+from summarize_edit_diffs import fetch_diffs, get_added_deleted_lines  # noqa: E402
+
+FIRST_REVID = 1000
+N_EDITS = 140  # two revisions per edit
+PAGE_SIZE = 20  # revisions per response
+FAILING_REVID = FIRST_REVID + 123  # every request for its batch fails
+CLIENT = {"max_requests_per_second": 1000, "max_retries": 1, "backoff": 0}
+
+
+class Revisions:
+    """
+    Revision texts of N_EDITS edits, the previous revision of edit k being
+    FIRST_REVID + 2k and the current one FIRST_REVID + 2k + 1.
+    """
+
+    def __init__(self):
+        self.texts = {}
+        for k in range(N_EDITS):
+            prev_rev = FIRST_REVID + 2 * k
+            lines = [f"Page {k} line {i}" for i in range(10)]
+            self.texts[prev_rev] = "\n".join(lines)
+            lines[k % 10] = f"edit {k}"
+            self.texts[prev_rev + 1] = "\n".join(lines + [f"added by {k}"])
+        self.missing = {revid for revid in self.texts if revid % 17 == 0}
+        self.hidden = {revid for revid in self.texts if revid % 13 == 0}
+        self.requests = []  # (revids, rvcontinue) of each revids request
+        self._lock = threading.Lock()
+
+    def respond(self, params):
+        if "titles" in params:
+            k = int(params["titles"].split("_")[-1])
+            revisions = [{"revid": FIRST_REVID + 2 * k + r} for r in (1, 0)]
+            return {"query": {"pages": {str(k): {"revisions": revisions}}}}
+        revids = [int(revid) for revid in params["revids"].split("|")]
+        with self._lock:
+            self.requests.append((revids, params.get("rvcontinue")))
+        if FAILING_REVID in revids:
+            return None
+        rest = sorted(revids)
+        if "rvcontinue" in params:
+            rest = [revid for revid in rest if revid >= int(params["rvcontinue"])]
+        page, rest = rest[:PAGE_SIZE], rest[PAGE_SIZE:]
+        revisions = []
+        for revid in page:
+            if revid in self.missing:
+                continue
+            slot = {"texthidden": True}
+            if revid not in self.hidden:
+                slot = {"content": self.texts[revid]}
+            revisions.append({"revid": revid, "slots": {"main": slot}})
+        response = {"query": {"pages": [{"revisions": revisions}]}}
+        missing = [revid for revid in page if revid in self.missing]
+        if missing:
+            response["query"]["badrevids"] = {
+                str(revid): {"revid": revid, "missing": True} for revid in missing
+            }
+        if rest:
+            response["continue"] = {"rvcontinue": str(rest[0]), "continue": "||"}
+        return response
+
+
+def serve(revisions):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            response = revisions.respond(params)
+            if response is None:
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps(response).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/api.php"
+
+
+def check_requests(revisions, revids, max_retries):
+    """
+    Check the batches of the requests made for revids, and return the revids of the
+    failed batch.
+    """
+    batches = {}
+    for batch, rvcontinue in revisions.requests:
+        assert len(batch) <= MAX_REVIDS_PER_REQUEST, len(batch)
+        batches.setdefault(tuple(batch), []).append(rvcontinue)
+    asked = sorted(revid for batch in batches for revid in batch)
+    assert asked == sorted(set(revids)), "revids asked for in several batches"
+    assert len(batches) == math.ceil(len(asked) / MAX_REVIDS_PER_REQUEST)
+
+    failed = [batch for batch in batches if FAILING_REVID in batch]
+    assert len(failed) == 1 and len(batches[failed[0]]) == max_retries + 1
+    for batch, continues in batches.items():
+        if batch != failed[0]:
+            assert len(continues) == math.ceil(len(batch) / PAGE_SIZE), continues
+    return set(failed[0])
+
+
+def check_texts(revisions, texts, revids, failed):
+    for revid in set(revids):
+        if revid in failed:
+            assert texts[revid] is None, revid
+        elif revid in revisions.missing or revid in revisions.hidden:
+            assert revid not in texts, revid
+        else:
+            assert texts[revid] == revisions.texts[revid], revid
+    assert set(texts) <= set(revids)
+
+
+class InterruptedClient(MediaWikiClient):
+    """
+    Client whose calls to fetch_revision_texts after the second one are interrupted
+    (as by Ctrl-C) after a while, the first two returning at once.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def fetch_revision_texts(self, revids, **kwargs):
+        with self._calls_lock:
+            self.calls += 1
+            call = self.calls
+        if call > 2:
+            time.sleep(0.5)
+            raise KeyboardInterrupt
+        return super().fetch_revision_texts(revids, **kwargs)
+
+
+def check_diffs(revisions, path):
+    """
+    Check the checkpoint written by fetch_diffs against the requests made for the
+    revision texts: each request holds whole revision pairs, and each edit has the
+    diff of its own texts, BAD REQUEST, or nothing if its request failed.
+    """
+    failed = set()
+    for batch, _ in revisions.requests:
+        assert len(batch) <= MAX_REVIDS_PER_REQUEST, len(batch)
+        assert all(revid ^ 1 in batch for revid in batch), "pair split in two"
+        if FAILING_REVID in batch:
+            failed.update(batch)
+    checkpoint = Checkpoint(path)
+    checkpoint.close()
+    unavailable = revisions.missing | revisions.hidden
+    for k in range(N_EDITS):
+        pair = (FIRST_REVID + 2 * k, FIRST_REVID + 2 * k + 1)
+        if failed & set(pair):
+            assert str(k) not in checkpoint, k
+        elif unavailable & set(pair):
+            assert checkpoint[str(k)] == ["BAD REQUEST", "BAD REQUEST"], k
+        else:
+            texts = (revisions.texts[revid] for revid in pair)
+            assert checkpoint[str(k)] == list(get_added_deleted_lines(*texts)), k
+
+
+def main():
+    revisions = Revisions()
+    server, url = serve(revisions)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # Unsorted, with duplicates and as strings, as the callers may pass them
+            revids = sorted(revisions.texts, key=lambda revid: -revid % 7)
+            asked = [str(revid) for revid in revids] + revids[:30]
+            client = MediaWikiClient(api_url=url, **CLIENT)
+            texts = client.fetch_revision_texts(asked)
+            failed = check_requests(revisions, revids, client.max_retries)
+            check_texts(revisions, texts, revids, failed)
+            print(
+                f"OK: {len(revids)} revisions in {len(revisions.requests)} requests "
+                f"of at most {MAX_REVIDS_PER_REQUEST} revids, "
+                f"{len(revisions.missing | revisions.hidden)} missing or hidden, "
+                f"{len(failed)} in a failed batch"
+            )
+
+            store = RevisionStore(os.path.join(directory, "store.sqlite"))
+            client = MediaWikiClient(api_url=url, store=store, **CLIENT)
+            client.fetch_revision_texts(revids)
+            revisions.requests.clear()
+            texts = client.fetch_revision_texts(revids)
+            again = {revid for batch, _ in revisions.requests for revid in batch}
+            assert again == failed | revisions.missing | revisions.hidden
+            # The failing revid is now batched with some of the missing or hidden ones
+            failed_again = next(
+                set(batch) for batch, _ in revisions.requests if FAILING_REVID in batch
+            )
+            check_texts(revisions, texts, revids, failed_again)
+            store.close()
+            print(
+                "OK: with a revision store, only the failed, missing or hidden "
+                "revisions are requested again"
+            )
+
+            edits = [
+                {"EditID": str(k), "title": f"Page {k}", "current_timestamp": "0"}
+                for k in range(N_EDITS)
+            ]
+            path = os.path.join(directory, "checkpoint.jsonl")
+            revisions.requests.clear()
+            with Checkpoint(path) as checkpoint:
+                client = InterruptedClient(api_url=url, **CLIENT)
+                try:
+                    fetch_diffs(edits, client, checkpoint, source="texts")
+                    raise AssertionError("fetch_diffs was not interrupted")
+                except KeyboardInterrupt:
+                    pass
+                done = len(checkpoint.results)
+            assert 0 < done < N_EDITS, done
+            print(f"OK: {done} edits checkpointed before the interruption")
+
+            with Checkpoint(path) as checkpoint:
+                assert len(checkpoint.results) == done
+                fetch_diffs(edits, MediaWikiClient(api_url=url, **CLIENT), checkpoint)
+            check_diffs(revisions, path)
+            print("OK: fetch_diffs checkpoints the diff of each edit's own revisions")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
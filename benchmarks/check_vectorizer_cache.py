@@ -0,0 +1,151 @@
+"""
+Check VectorizerCache on its own and through VandalismScorer:
+
+- a refit on the same training texts is a hit and scores the edits exactly like the
+  fit that filled the cache, which was a miss;
+- the key changes with the texts, their order and the vectorizer's parameters, and
+  an unknown or unreadable entry is a miss;
+- when the entries grow beyond max_bytes, the least recently used ones (put or hit)
+  are evicted first;
+- stats.json counts every hit and miss, including those of processes using the
+  same directory at the same time, and clear resets it.
+
+Run from the project root:
+    python benchmarks/check_vectorizer_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from feature_engineer import VandalismScorer, VectorizerCache  # noqa: E402
+
+N_PROCESSES = 4
+GETS_PER_PROCESS = 200
+
+
+def edits(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(["lorem", "ipsum", "dolor", "sit", "amet", "poop", "lol"])
+    return pd.DataFrame(
+        {
+            "EditID": np.arange(n),
+            "added_lines": [" ".join(rng.choice(words, 20)) for _ in range(n)],
+            "deleted_lines": [" ".join(rng.choice(words, 5)) for _ in range(n)],
+            "isvandalism": rng.random(n) < 0.3,
+        }
+    )
+
+
+def check_scorer(cache_dir, df):
+    cache = VectorizerCache(cache_dir)
+    scores = []
+    for _ in range(2):
+        scorer = VandalismScorer(vectorizer_cache=cache).fit(df, df["isvandalism"])
+        scores.append(scorer.transform(df)["vandalism_score"].to_numpy())
+    assert np.array_equal(scores[0], scores[1]), "scores differ after a cache hit"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1), stats
+    print("OK: a refit on the same texts hits the cache and gives the same scores")
+
+
+def check_keys(cache_dir, df):
+    cache = VectorizerCache(cache_dir)
+    vectorizer = CountVectorizer()
+    key = cache.key(vectorizer, df)
+    assert key == cache.key(CountVectorizer(), df.copy())
+    changed = df.copy()
+    changed.loc[3, "added_lines"] += " amet"
+    others = [
+        cache.key(vectorizer, changed),
+        cache.key(vectorizer, df.iloc[::-1]),
+        cache.key(vectorizer, df.iloc[:-1]),
+        cache.key(CountVectorizer(lowercase=False), df),
+        cache.key(HashingVectorizer(), df),
+    ]
+    assert len(set(others + [key])) == len(others) + 1, "cache keys collide"
+
+    before = cache.stats()
+    assert cache.get(others[0]) is None
+    os.makedirs(os.path.join(cache_dir, "corrupt"))
+    with open(os.path.join(cache_dir, "corrupt", "vectorizer.pkl"), "wb") as f:
+        f.write(b"not a pickle")
+    assert cache.get("corrupt") is None
+    after = cache.stats()
+    assert after["misses"] == before["misses"] + 2, (before, after)
+    assert after["hits"] == before["hits"]
+    cache.clear()
+    print("OK: keys change with the texts and the vectorizer, bad entries are misses")
+
+
+def check_eviction(cache_dir, df):
+    vectorizer = CountVectorizer()
+    X_counts_diff = vectorizer.fit_transform(df["added_lines"])
+    probe = VectorizerCache(cache_dir)
+    probe.put("probe", vectorizer, X_counts_diff)
+    entry_bytes = probe.stats()["size_bytes"]
+    probe.clear()
+
+    # Room for two entries
+    cache = VectorizerCache(cache_dir, max_bytes=2 * entry_bytes)
+    for key in ("a", "b"):
+        cache.put(key, vectorizer, X_counts_diff)
+        time.sleep(0.01)
+    assert cache.get("a") is not None  # now more recently used than b
+    time.sleep(0.01)
+    cache.put("c", vectorizer, X_counts_diff)
+    kept = sorted(os.path.basename(path) for path, _, _ in cache._entries())
+    assert kept == ["a", "c"], kept
+    assert cache.stats()["size_bytes"] <= cache.max_bytes
+    cache.clear()
+    print("OK: the least recently used entries are evicted beyond max_bytes")
+
+
+def get_many(cache_dir, key):
+    cache = VectorizerCache(cache_dir)
+    for i in range(GETS_PER_PROCESS):
+        cache.get(key if i % 2 else "missing")
+
+
+def check_concurrent_stats(cache_dir, df):
+    cache = VectorizerCache(cache_dir)
+    vectorizer = CountVectorizer()
+    cache.put("key", vectorizer, vectorizer.fit_transform(df["added_lines"]))
+    with ProcessPoolExecutor(N_PROCESSES) as executor:
+        for future in [
+            executor.submit(get_many, cache_dir, "key") for _ in range(N_PROCESSES)
+        ]:
+            future.result()
+    stats = cache.stats()
+    expected = N_PROCESSES * GETS_PER_PROCESS // 2
+    assert (stats["hits"], stats["misses"]) == (expected, expected), stats
+    assert not [name for name in os.listdir(cache_dir) if name.startswith(".tmp-")]
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "entries": 0, "size_bytes": 0}
+    print(
+        f"OK: stats.json counts the {2 * expected} lookups of {N_PROCESSES} "
+        "concurrent processes, clear resets it"
+    )
+
+
+def main():
+    df = edits(500)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_scorer(os.path.join(tmp, "scorer"), df)
+        check_keys(os.path.join(tmp, "keys"), df)
+        check_eviction(os.path.join(tmp, "eviction"), df)
+        check_concurrent_stats(os.path.join(tmp, "stats"), df)
+
+
+if __name__ == "__main__":
+    main()
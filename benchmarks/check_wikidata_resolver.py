@@ -0,0 +1,236 @@
+"""
+Check the WikidataResolver of data/data_gathering/api_calls/wikidata_resolver.py,
+used by is_person_encoding, on a random synthetic P31/P279 graph (with shared
+ancestors and cycles) served by a local HTTP server answering pageprops and
+wbgetentities requests:
+
+- descends_from must agree with a breadth-first search of the whole graph for
+  every item, whatever the max_depth and the order of earlier queries on the same
+  graph file;
+- requests must be batched, and no entity fetched twice;
+- a second run on the same graph file must make no requests at all;
+- when the requests for some titles and entities fail, the lookups depending on
+  them must be undecided (None), in is_person_flags too, the others exact, and
+  enrich_edits must not checkpoint the undecided edits.
+
+Run from the project root:
+    python benchmarks/check_wikidata_resolver.py [n_titles]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(project_root, "data", "data_gathering", "api_calls"))
+
+import enrich_edits  # noqa: E402
+import wikidata_resolver  # noqa: E402
+from is_person_encoding import is_person_flags  # noqa: E402
+from mediawiki_client import Checkpoint, MediaWikiClient  # noqa: E402
+from wikidata_resolver import WikidataResolver  # noqa: E402
+
+
+def random_graph(n_titles, seed=0):
+    """
+    Titles -> QID (some titles without an item), and QID -> parents, as a layered
+    class hierarchy above Q5 and other roots, with a few upward links making cycles.
+    """
+    rng = random.Random(seed)
+    layers = [["Q5", "Q35120", "Q16521"]]
+    for depth in range(1, 7):
+        layers.append([f"Q{depth}00{k}" for k in range(10 * depth)])
+    parents = {qid: [] for layer in layers for qid in layer}
+    for depth in range(1, len(layers)):
+        for qid in layers[depth]:
+            start = max(0, depth - 2)
+            above = [q for layer in layers[start:depth] for q in layer]
+            parents[qid] = rng.sample(above, rng.randint(1, 3))
+            if rng.random() < 0.05:
+                parents[qid].append(rng.choice(layers[-1]))  # cycle
+    parents["Q35120"] = ["Q35120"]
+    classes = [qid for layer in layers[1:] for qid in layer]
+    titles = {}
+    for k in range(n_titles):
+        if rng.random() < 0.1:
+            titles[f"Title_{k}"] = None
+            continue
+        qid = f"Q9{k}"
+        titles[f"Title_{k}"] = qid
+        parents[qid] = rng.sample(classes, rng.randint(1, 2))
+    return titles, parents
+
+
+def reference(qids, parents, target, max_depth):
+    """Whether target is at most max_depth links away, by breadth-first search."""
+    result = {}
+    for qid in qids:
+        seen, frontier = {qid}, [qid]
+        for _ in range(max_depth):
+            frontier = [
+                p for q in frontier for p in parents.get(q, []) if p not in seen
+            ]
+            seen.update(frontier)
+        result[qid] = target in seen
+    return result
+
+
+def serve(titles, parents, log, failing=frozenset()):
+    """
+    Start a local server answering pageprops and wbgetentities requests, with an
+    error for the requests naming a title or QID of the set failing (none by
+    default).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            names = params.get("ids", params.get("titles", "")).split("|")
+            if failing.intersection(names):
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if params.get("action") == "wbgetentities":
+                ids = params["ids"].split("|")
+                log.append(("entities", ids))
+                response = {"entities": {qid: entity(qid) for qid in ids}}
+            else:
+                names = params["titles"].split("|")
+                log.append(("titles", names))
+                pages = {}
+                for k, title in enumerate(names):
+                    page = {"title": title.replace("_", " ")}
+                    if titles.get(title):
+                        page["pageprops"] = {"wikibase_item": titles[title]}
+                    pages[str(k)] = page
+                normalized = [
+                    {"from": t, "to": t.replace("_", " ")} for t in names if "_" in t
+                ]
+                response = {"query": {"normalized": normalized, "pages": pages}}
+            body = json.dumps(response).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    def entity(qid):
+        if qid not in parents:
+            return {"id": qid, "missing": ""}
+        claims = [
+            {"mainsnak": {"datavalue": {"value": {"id": parent}}}}
+            for parent in parents[qid]
+        ]
+        return {"id": qid, "claims": {"P31": claims[:1], "P279": claims[1:]}}
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/w/api.php"
+
+
+def run(graph_file, url, titles, parents, max_depths):
+    """Resolve the titles, then their QIDs for each max_depth, checking each result."""
+    client = MediaWikiClient(api_url=url, backoff=0)
+    resolver = WikidataResolver(client, graph_file, wikidata_url=url)
+    qid_by_title = resolver.qids(list(titles))
+    assert qid_by_title == titles, "wrong title -> QID lookups"
+    qids = [qid for qid in qid_by_title.values() if qid]
+    for max_depth in max_depths:
+        found = resolver.descends_from(qids, "Q5", max_depth)
+        assert found == reference(qids, parents, "Q5", max_depth), max_depth
+        print(f"  max_depth={max_depth}: {sum(found.values())}/{len(qids)} people")
+    stats = resolver.stats()
+    resolver.close()
+    return client.requests_made, stats
+
+
+def check_failures(url, titles, parents, failing, directory):
+    """
+    Resolve the titles while the requests naming those of failing fail: every
+    lookup that is not None must be exact, and the undecided ones must be decided
+    once the requests succeed.
+    """
+    client = MediaWikiClient(api_url=url, max_retries=0, backoff=0)
+    graph_file = os.path.join(directory, "failing_graph.sqlite")
+    resolver = WikidataResolver(client, graph_file, wikidata_url=url)
+    qid_by_title = resolver.qids(list(titles))
+    assert all(titles[title] == qid for title, qid in qid_by_title.items())
+    assert not failing.intersection(qid_by_title), "failed titles were resolved"
+    qids = [qid for qid in titles.values() if qid]
+    found = resolver.descends_from(qids, "Q5", 5)
+    resolver.close()
+    expected = reference(qids, parents, "Q5", 5)
+    undecided = [qid for qid in qids if found[qid] is None]
+    assert all(found[qid] == expected[qid] for qid in qids if found[qid] is not None)
+    assert undecided, "no lookup depends on the failing entities"
+
+    decided = []
+    for title, flag in zip(titles, is_person_flags(titles, client, graph_file)):
+        if flag is not None:
+            qid = titles[title]
+            assert flag == int(qid is not None and expected[qid]), title
+            decided.append(title)
+    edits = [{"EditID": str(k), "title": title} for k, title in enumerate(titles)]
+    enrich_edits.graph_file = graph_file
+    with Checkpoint(os.path.join(directory, "is_person.jsonl")) as checkpoint:
+        enrich_edits.is_person_stage(edits, client, checkpoint, {})
+        enriched = [edit["title"] for edit in edits if edit["EditID"] in checkpoint]
+    assert enriched == decided, "undecided edits were checkpointed"
+    print(
+        f"  {len(titles) - len(qid_by_title)} titles and {len(undecided)} items "
+        f"undecided, {len(titles) - len(enriched)} edits left for the next run"
+    )
+
+    failing.clear()
+    resolver = WikidataResolver(client, graph_file, wikidata_url=url)
+    assert resolver.descends_from(qids, "Q5", 5) == expected
+    resolver.close()
+
+
+def main(n_titles=2000):
+    titles, parents = random_graph(n_titles)
+    log, failing = [], set()
+    server, url = serve(titles, parents, log, failing)
+    wikidata_resolver.WIKIDATA_API_URL = url
+    graph_file = os.path.join(tempfile.mkdtemp(), "wikidata_graph.sqlite")
+    try:
+        print(f"{len(titles)} titles, {len(parents)} items in the graph")
+        print("First run (max_depth 2, then 5, then 3):")
+        requests_made, stats = run(graph_file, url, titles, parents, [2, 5, 3])
+        fetched = Counter(qid for kind, ids in log if kind == "entities" for qid in ids)
+        assert max(fetched.values()) == 1, "an entity was fetched twice"
+        assert all(len(ids) <= 50 for _, ids in log), "batch over 50"
+        print(
+            f"  {requests_made} requests for {len(titles)} titles and "
+            f"{len(fetched)} entities (the old script made one request per title "
+            f"and per entity: {len(titles) + len(fetched)})"
+        )
+        print(f"  graph file: {stats}")
+
+        log.clear()
+        print("Second run on the same graph file:")
+        requests_made, _ = run(graph_file, url, titles, parents, [5, 2])
+        assert requests_made == 0, f"{requests_made} requests on the second run"
+        print("  0 requests")
+
+        print("With failing requests for some titles and entities:")
+        failing.update(["Title_7", "Q2003", "Q3010", "Q4001"])
+        check_failures(url, titles, parents, failing, os.path.dirname(graph_file))
+    finally:
+        server.shutdown()
+    print("OK: descends_from matches breadth-first search on every item")
+    print("OK: lookups depending on failed requests are undecided and not kept")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+
+
+class AncestryIndex:
+    """
+    Precomputed answers to "does this item descend from this class" for a set of
+    items and a few target classes (e.g. human, sports team, country, company),
+    through at most max_depth P31/P279 links.
+
+    It is built once from a local P31/P279 graph, such as the one returned by
+    WikidataResolver.ancestors, by a breadth-first search from each target class
+    along reversed links. Each item then has a bitmask of the classes it descends
+    from, so looking up a page costs one dictionary access, and multi-hot columns
+    for millions of rows take a few vectorized operations (see encode).
+    """
+
+    def __init__(self, targets, masks, max_depth=5):
+        self.targets = list(targets)
+        self.masks = masks  # QID -> bitmask over targets, items with no bit left out
+        self.max_depth = max_depth
+
+    @classmethod
+    def build(cls, graph, targets, max_depth=5, items=None):
+        """
+        Build the index from graph, a dictionary from QID to the list of its
+        parents. Distances are only exact for items whose ancestors less than
+        max_depth links away are all in graph, so the index keeps items (all the
+        QIDs of graph if None).
+        """
+        children = {}
+        for qid, parents in graph.items():
+            for parent in parents:
+                children.setdefault(parent, []).append(qid)
+        items = set(graph if items is None else items)
+        masks = {}
+        for bit, target in enumerate(targets):
+            seen, frontier = {target}, [target]
+            for _ in range(max_depth):
+                next_frontier = []
+                for qid in frontier:
+                    for child in children.get(qid, []):
+                        if child not in seen:
+                            seen.add(child)
+                            next_frontier.append(child)
+                frontier = next_frontier
+            for qid in seen & items:
+                masks[qid] = masks.get(qid, 0) | 1 << bit
+        return cls(targets, masks, max_depth)
+
+    def lookup(self, qid):
+        """Bitmask of the targets qid descends from (bit i for targets[i])."""
+        return self.masks.get(qid, 0)
+
+    def descends_from(self, qid, target):
+        return bool(self.lookup(qid) >> self.targets.index(target) & 1)
+
+    def encode(self, qids):
+        """
+        Return a (len(qids), len(targets)) uint8 array whose column i is 1 for the
+        QIDs descending from targets[i], and 0 for the others (None included).
+        """
+        masks = np.fromiter(
+            (self.masks.get(qid, 0) for qid in qids), dtype=np.int64, count=len(qids)
+        )
+        bits = np.arange(len(self.targets), dtype=np.int64)
+        return (masks[:, None] >> bits & 1).astype(np.uint8)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "targets": self.targets,
+                    "max_depth": self.max_depth,
+                    "masks": self.masks,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["targets"], data["masks"], data["max_depth"])
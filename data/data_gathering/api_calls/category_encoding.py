@@ -0,0 +1,55 @@
+import pandas as pd
+
+from ancestry_index import AncestryIndex
+from mediawiki_client import MediaWikiClient
+from wikidata_resolver import WikidataResolver
+
+# ======= EDIT THESE FILE NAMES =======
+input_csv = "filtered_edits_with_edit_counts_isperson.csv"
+output_csv = "filtered_edits_with_categories.csv"
+graph_file = "wikidata_graph.sqlite"  # Local Wikidata graph of the WikidataResolver
+index_file = "category_index.json"  # Precomputed AncestryIndex of the titles
+# =====================================
+
+# Column -> Wikidata class whose descendants (through P31/P279 links) get a 1
+CATEGORIES = {
+    "is_person": "Q5",
+    "is_sports_team": "Q12973014",
+    "is_country": "Q6256",
+    "is_company": "Q783794",
+}
+max_depth = 5
+
+
+# --- MAIN PROCESS ---
+def main(client=None):
+    client = client or MediaWikiClient()
+    resolver = WikidataResolver(client, graph_file)
+
+    df = pd.read_csv(input_csv)
+    titles = df["title"].astype(str).str.replace(" ", "_")
+    qid_by_title = resolver.qids(titles.drop_duplicates().tolist())
+    qids = [qid for qid in qid_by_title.values() if qid]
+
+    # One traversal of the titles' ancestors answers for every category, and the
+    # graph file keeps them, so adding a category later costs no requests
+    graph = resolver.ancestors(qids, max_depth)
+    index = AncestryIndex.build(graph, list(CATEGORIES.values()), max_depth, items=qids)
+    index.save(index_file)
+    print(
+        f"Ancestry index of {len(qids)} items over {len(graph)} entities "
+        f"written to {index_file}"
+    )
+
+    encoded = index.encode([qid_by_title.get(t) for t in titles])
+    for i, column in enumerate(CATEGORIES):
+        df[column] = encoded[:, i]
+        print(f"{column}: {df[column].sum()}/{len(df)} edits")
+    df.to_csv(output_csv, index=False)
+    print(f"Wikidata graph: {resolver.stats()}")
+    resolver.close()
+    print(f"Done. Output written to {output_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import csv
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from is_person_encoding import is_person_flags
+from mediawiki_client import Checkpoint, MediaWikiClient
+from recent_edit_count_for_csv import WINDOWS, count_recent_edits
+from revision_store import RevisionStore
+from summarize_edit_diffs import fetch_diffs
+from xml_to_columnar import COLUMNS, iter_rows
+
+# ======= EDIT THESE FILE NAMES =======
+input_xml = "filtered_edits_no_dup.xml"
+output_csv = "filtered_edits_enriched.csv"
+# Results of each stage go to <checkpoint_prefix>.<stage>.checkpoint.jsonl
+checkpoint_prefix = "filtered_edits_enriched"
+# Local revision store shared by the api_calls scripts, and Wikidata graph
+store_file = "revision_store.sqlite"
+graph_file = "wikidata_graph.sqlite"
+# =====================================
+
+max_workers = 8  # threads per stage, all stages sharing one rate limit
+max_requests_per_second = 10
+
+
+def diffs_stage(edits, client, checkpoint, inputs):
+    """added_lines and deleted_lines of each edit, see summarize_edit_diffs."""
+    fetch_diffs(edits, client, checkpoint)
+
+
+def edit_counts_stage(edits, client, checkpoint, inputs):
+    """Edits to the title in each window of WINDOWS, see recent_edit_count_for_csv."""
+    titles = [row["title"] for row in edits]
+    timestamps = [row["current_timestamp"] for row in edits]
+    counts = count_recent_edits(titles, timestamps, client)
+    for i, row in enumerate(edits):
+        values = [counts[column][i] for column in WINDOWS]
+        if "" not in values:  # otherwise retried on the next run
+            checkpoint.add(row["EditID"], values)
+
+
+def is_person_stage(edits, client, checkpoint, inputs):
+    """is_person of each edit's title, see is_person_encoding."""
+    flags = is_person_flags([row["title"] for row in edits], client, graph_file)
+    for row, flag in zip(edits, flags):
+        if flag is not None:  # otherwise retried on the next run
+            checkpoint.add(row["EditID"], [flag])
+
+
+# Stage -> (function, columns it adds, stages whose results it needs). A stage
+# function gets the edits missing from its checkpoint, the shared client, its
+# checkpoint, and the checkpoints of the stages it needs; it adds to its checkpoint
+# the list of its columns' values for each edit it could enrich.
+STAGES = {
+    "diffs": (diffs_stage, ["added_lines", "deleted_lines"], []),
+    "edit_counts": (edit_counts_stage, list(WINDOWS), []),
+    "is_person": (is_person_stage, ["is_person"], []),
+}
+
+
+_print_lock = threading.Lock()
+
+
+def report(name, message):
+    """Print a progress line of stage name, without mixing it with other stages'."""
+    with _print_lock:
+        print(f"[{name}] {message}", flush=True)
+
+
+def run_stage(name, edits, client, checkpoint, inputs):
+    function = STAGES[name][0]
+    pending = [row for row in edits if row["EditID"] not in checkpoint]
+    report(name, f"{len(pending)} of {len(edits)} edits to enrich")
+    start = time.perf_counter()
+    if pending:
+        function(pending, client, checkpoint, inputs)
+    done = sum(row["EditID"] in checkpoint for row in edits)
+    elapsed = time.perf_counter() - start
+    report(name, f"done in {elapsed:.1f}s: {done}/{len(edits)} edits enriched")
+
+
+def run_stages(edits, client, checkpoints):
+    """
+    Run every stage once the stages it needs are done, independent stages
+    running concurrently. Raises the first error of a stage, after the running
+    stages have finished.
+    """
+    done, running = set(), {}
+    with ThreadPoolExecutor(max_workers=len(STAGES)) as pool:
+        while len(done) < len(STAGES):
+            for name, (_, _, needs) in STAGES.items():
+                if name in done or name in running.values():
+                    continue
+                if all(need in done for need in needs):
+                    inputs = {need: checkpoints[need] for need in needs}
+                    future = pool.submit(
+                        run_stage, name, edits, client, checkpoints[name], inputs
+                    )
+                    running[future] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                done.add(running.pop(future))
+
+
+def write_csv(checkpoints):
+    """Stream the edits of the xml file into the csv, with every stage's columns."""
+    columns = [
+        column for _, stage_columns, _ in STAGES.values() for column in stage_columns
+    ]
+    fieldnames = list(dict.fromkeys(COLUMNS + columns))
+    missing = {"diffs": ["BAD REQUEST", "BAD REQUEST"]}
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in iter_rows(input_xml):
+            for name, (_, stage_columns, _) in STAGES.items():
+                checkpoint = checkpoints[name]
+                if row["EditID"] in checkpoint:
+                    values = checkpoint[row["EditID"]]
+                else:
+                    values = missing.get(name, [""] * len(stage_columns))
+                row.update(zip(stage_columns, values))
+            writer.writerow(row)
+
+
+# --- MAIN PROCESS ---
+
+
+def main(client=None):
+    # Only the fields needed by the stages are kept, the rows are read again from
+    # the xml file when writing the csv
+    edits = [
+        {
+            "EditID": row["EditID"],
+            "title": row["title"],
+            "current_timestamp": row["current_timestamp"],
+        }
+        for row in iter_rows(input_xml)
+    ]
+    print(f"{len(edits)} edits in {input_xml}")
+
+    # One client for all the stages: one pooled session and one global rate limit
+    client = client or MediaWikiClient(
+        max_workers=max_workers,
+        max_requests_per_second=max_requests_per_second,
+        store=RevisionStore(store_file),
+        pool_size=max_workers * len(STAGES),
+    )
+    checkpoints = {
+        name: Checkpoint(f"{checkpoint_prefix}.{name}.checkpoint.jsonl")
+        for name in STAGES
+    }
+    try:
+        run_stages(edits, client, checkpoints)
+        write_csv(checkpoints)
+    finally:
+        for checkpoint in checkpoints.values():
+            checkpoint.close()
+
+    print(f"{client.requests_made} API calls in total")
+    if client.store is not None:
+        print(f"Revision store: {client.store.stats()}")
+    print(f"Done. Output written to {output_csv}")
+
+
+if __name__ == "__main__":
+    main()
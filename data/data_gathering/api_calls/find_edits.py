@@ -1,9 +1,15 @@
 import xml.etree.ElementTree as ET
-import requests
 import difflib
-import time
 from datetime import datetime
 
+from line_diff import compare_lines
+from mediawiki_client import MediaWikiClient
+from revision_store import RevisionStore
+
+# "texts" fetches both revision texts and diffs them locally, "compare" fetches
+# MediaWiki's own diff of the two revisions instead
+diff_source = "texts"
+
 def to_iso8601(ts):
     # If ts is digits and 10 characters, treat as unix timestamp
     if ts and ts.isdigit():
@@ -14,8 +20,7 @@ def to_iso8601(ts):
     # Otherwise, return as is
     return ts
 
-def get_two_revisions(title, timestamp):
-    S = requests.Session()
+def get_two_revisions(title, timestamp, client):
     params = {
         "action": "query",
         "prop": "revisions",
@@ -26,57 +31,31 @@ def get_two_revisions(title, timestamp):
         "rvprop": "ids|timestamp|user",
         "format": "json"
     }
-    for attempt in range(3):
-        try:
-            r = S.get("https://en.wikipedia.org/w/api.php", params=params, timeout=10)
-            r.raise_for_status()
-            data = r.json()
-            pages = list(data['query']['pages'].values())
-            if not pages or 'revisions' not in pages[0]:
-                return None, None
-            revs = pages[0]['revisions']
-            if len(revs) == 2:
-                return revs[1]['revid'], revs[0]['revid']  # prev, current
-            elif len(revs) == 1:
-                # Only one rev, treat as both prev and current
-                return revs[0]['revid'], revs[0]['revid']
-            else:
-                return None, None
-        except Exception as e:
-            print("API error, retrying...", e)
-            time.sleep(1)
+    try:
+        data = client.get(params)  # retries with backoff on API errors
+        pages = list(data['query']['pages'].values())
+        if not pages or 'revisions' not in pages[0]:
+            return None, None
+        revs = pages[0]['revisions']
+        if len(revs) == 2:
+            return revs[1]['revid'], revs[0]['revid']  # prev, current
+        elif len(revs) == 1:
+            # Only one rev, treat as both prev and current
+            return revs[0]['revid'], revs[0]['revid']
+        else:
+            return None, None
+    except Exception as e:
+        print("API error:", e)
     return None, None
 
-def get_revision_text(revid):
-    S = requests.Session()
-    params = {
-        "action": "query",
-        "prop": "revisions",
-        "revids": revid,
-        "rvslots": "main",
-        "rvprop": "content",
-        "formatversion": 2,
-        "format": "json"
-    }
-    for attempt in range(3):
-        try:
-            r = S.get("https://en.wikipedia.org/w/api.php", params=params, timeout=10)
-            r.raise_for_status()
-            data = r.json()
-            pages = data['query']['pages']
-            if pages and 'revisions' in pages[0]:
-                return pages[0]['revisions'][0]['slots']['main']['content']
-            else:
-                return ""
-        except Exception as e:
-            print("API error, retrying...", e)
-            time.sleep(1)
-    return ""
-
-def main():
+def main(client=None):
+    client = client or MediaWikiClient(
+        max_workers=1, max_requests_per_second=2, store=RevisionStore()
+    )  # Be nice to the API!
     tree = ET.parse("truncated_edits.xml")
     root = tree.getroot()
 
+    edits = []
     for i, wpedit in enumerate(root.findall("WPEdit")):
         title_elem = wpedit.find("common/title")
         curr_ts_elem = wpedit.find("current/timestamp")
@@ -87,15 +66,46 @@ def main():
         title = title_elem.text
         curr_ts = curr_ts_elem.text
         iso_ts = to_iso8601(curr_ts)
+        prev_rev, curr_rev = get_two_revisions(title, iso_ts, client)
+        edits.append((i, title, iso_ts, prev_rev, curr_rev))
 
+    if diff_source == "compare":
+        for i, title, iso_ts, prev_rev, curr_rev in edits:
+            print(f"\nEdit {i+1}: {title} at {iso_ts}")
+            if not prev_rev or not curr_rev:
+                print("  Could not retrieve two revisions.")
+                continue
+            body = client.fetch_compare_diff(prev_rev, curr_rev)
+            if body is None:
+                print("  Could not retrieve the diff.")
+                continue
+            added, deleted = compare_lines(body)
+            diff_lines = [f"-{line}" for line in deleted.splitlines()]
+            diff_lines += [f"+{line}" for line in added.splitlines()]
+            if not diff_lines:
+                print("  No difference between previous and current.")
+                continue
+            print("  Diff preview:")
+            for line in diff_lines[:12]:
+                print("   ", line)
+            if len(diff_lines) > 12:
+                print("   ...")
+        return
+
+    # Fetch the contents of all revisions at once, 50 revisions per request
+    texts = client.fetch_revision_texts(
+        rev for _, _, _, prev_rev, curr_rev in edits if prev_rev and curr_rev
+        for rev in (prev_rev, curr_rev)
+    )
+
+    for i, title, iso_ts, prev_rev, curr_rev in edits:
         print(f"\nEdit {i+1}: {title} at {iso_ts}")
-        prev_rev, curr_rev = get_two_revisions(title, iso_ts)
         if not prev_rev or not curr_rev:
             print("  Could not retrieve two revisions.")
             continue
 
-        prev_text = get_revision_text(prev_rev)
-        curr_text = get_revision_text(curr_rev)
+        prev_text = texts.get(prev_rev) or ""
+        curr_text = texts.get(curr_rev) or ""
 
         if prev_text == curr_text:
             print("  No difference between previous and current.")
@@ -113,8 +123,5 @@ def main():
                 if len(diff_lines) > 12:
                     print("   ...")
 
-        # Be nice to the API!
-        time.sleep(0.5)
-
 if __name__ == "__main__":
     main()
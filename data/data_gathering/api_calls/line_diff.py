@@ -0,0 +1,297 @@
+import difflib
+from html.parser import HTMLParser
+
+import numpy as np
+
+# Hashes of windows of consecutive lines are polynomials in _BASE modulo 2**64
+_BASE = 1_000_003
+_BASE_INVERSE = pow(_BASE, -1, 2**64)
+
+
+def difflib_lines(prev_text, curr_text):
+    """
+    Reference engine: difflib.unified_diff over the lines of both texts,
+    the added and deleted lines being parsed back out of the diff.
+    """
+    added, deleted = [], []
+    diff = difflib.unified_diff(
+        prev_text.splitlines(),
+        curr_text.splitlines(),
+        fromfile="previous",
+        tofile="current",
+        lineterm="",
+        n=0,
+    )
+    for line in diff:
+        if line.startswith("---") or line.startswith("+++") or line.startswith("@@"):
+            continue
+        elif line.startswith("-"):
+            deleted.append(line[1:])
+        elif line.startswith("+"):
+            added.append(line[1:])
+    return "\n".join(added), "\n".join(deleted)
+
+
+def trimmed_lines(prev_text, curr_text):
+    """
+    Same output as difflib_lines, usually much faster on long texts with a small
+    change.
+
+    Lines are mapped to integer ids, and the common prefix and suffix of both
+    texts are matched directly, leaving only the middle to difflib. That is only
+    done when difflib would match them first, as whole blocks (see _certified),
+    which is the case for most edits; otherwise difflib runs on the whole texts.
+    benchmarks/bench_line_diff.py checks the output against difflib_lines on
+    random pairs with many repeated lines.
+    """
+    a, b = prev_text.splitlines(), curr_text.splitlines()
+    if a == b:
+        return "", ""
+    ids = {line: id_ for id_, line in enumerate(dict.fromkeys(a + b))}
+    a_ids, b_ids = list(map(ids.__getitem__, a)), list(map(ids.__getitem__, b))
+
+    added, deleted = [], []
+    i = j = 0
+    for block_i, block_j, size in _matching_blocks(a_ids, b_ids):
+        deleted.extend(a[i:block_i])
+        added.extend(b[j:block_j])
+        i, j = block_i + size, block_j + size
+    # The headers of unified_diff start with "---" and "+++", and difflib_lines
+    # skips every diff line that does: deleted lines starting with "--" and added
+    # lines starting with "++" (e.g. "----" rules) are left out the same way.
+    added = [line for line in added if not line.startswith("++")]
+    deleted = [line for line in deleted if not line.startswith("--")]
+    return "\n".join(added), "\n".join(deleted)
+
+
+DIFF_ENGINES = {"difflib": difflib_lines, "trimmed": trimmed_lines}
+
+
+def compare_lines(body):
+    """
+    Added and deleted lines of the HTML diff table returned by MediaWiki's compare
+    API, in the same form as the engines above: lines joined with newlines, and
+    deleted lines starting with "--" and added lines starting with "++" left out.
+
+    The server's diff can align repeated lines differently from difflib, so the
+    lines can differ from the engines' ones on such edits.
+    """
+    parser = _CompareTableParser()
+    parser.feed(body)
+    parser.close()
+    added = [line for line in parser.added if not line.startswith("++")]
+    deleted = [line for line in parser.deleted if not line.startswith("--")]
+    return "\n".join(added), "\n".join(deleted)
+
+
+class _CompareTableParser(HTMLParser):
+    """
+    Collect the text of the diff-addedline and diff-deletedline cells of a diff
+    table. The line is the text of the cell's <div> (inline <ins> and <del>
+    markup included), or of the cell itself in formats without it; links such as
+    moved paragraph markers are skipped.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.added, self.deleted = [], []
+        self._cell = None  # list receiving the current cell's line, if any
+        self._text = []
+        self._in_link = False
+        self._line_done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "td":
+            classes = (dict(attrs).get("class") or "").split()
+            if "diff-addedline" in classes:
+                self._cell, self._text = self.added, []
+            elif "diff-deletedline" in classes:
+                self._cell, self._text = self.deleted, []
+            self._line_done = False
+        elif tag == "a":
+            self._in_link = True
+        elif tag == "div" and self._cell is not None:
+            self._text = []  # drop anything before the line itself
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._in_link = False
+        elif tag == "div":
+            self._line_done = True
+        elif tag == "td" and self._cell is not None:
+            self._cell.append("".join(self._text))
+            self._cell = None
+
+    def handle_data(self, data):
+        if self._cell is not None and not (self._in_link or self._line_done):
+            self._text.append(data)
+
+
+# Below this many lines in both texts, difflib is fast enough on its own
+_MIN_TRIMMED_LINES = 200
+
+
+def _matching_blocks(a, b):
+    """
+    Return difflib.SequenceMatcher(None, a, b).get_matching_blocks() for two lists
+    of ids, possibly unmerged, ending with the (len(a), len(b), 0) sentinel.
+    """
+    if min(len(a), len(b)) == 0 or max(len(a), len(b)) < _MIN_TRIMMED_LINES:
+        return difflib.SequenceMatcher(None, a, b).get_matching_blocks()
+    a_ids, b_ids = np.array(a, dtype=np.int64), np.array(b, dtype=np.int64)
+    n = min(len(a), len(b))
+    mismatch = np.flatnonzero(a_ids[:n] != b_ids[:n])
+    prefix = int(mismatch[0]) if len(mismatch) else n
+    # The suffix may overlap the prefix, e.g. when lines are inserted into a run of
+    # equal lines: which of the two difflib extends over the overlap is decided by
+    # _certified
+    mismatch = np.flatnonzero(a_ids[::-1][:n] != b_ids[::-1][:n])
+    suffix = int(mismatch[0]) if len(mismatch) else n
+
+    # Same popular lines as SequenceMatcher's autojunk heuristic
+    counts = np.bincount(b_ids, minlength=max(max(a), max(b)) + 1)
+    popular = counts > len(b) // 100 + 1
+    if len(b) < 200:
+        popular[:] = False
+
+    segments = _certified(a_ids, b_ids, popular, prefix, suffix)
+    if segments is None:
+        return difflib.SequenceMatcher(None, a, b).get_matching_blocks()
+
+    # Match the middle box as get_matching_blocks would within the whole texts:
+    # same popular lines, offset positions
+    a_start = b_start = 0
+    a_end, b_end = len(a), len(b)
+    for i, j, k in segments:
+        if i == 0 and j == 0:
+            a_start = b_start = k
+        else:
+            a_end, b_end = i, j
+    matcher = difflib.SequenceMatcher(
+        None, a[a_start:a_end], b[b_start:b_end], autojunk=False
+    )
+    for id_ in [id_ for id_ in matcher.b2j if popular[id_]]:
+        del matcher.b2j[id_]
+    blocks = list(segments)
+    for i, j, k in matcher.get_matching_blocks():
+        if k:
+            blocks.append((i + a_start, j + b_start, k))
+    blocks.sort()
+    blocks.append((len(a), len(b), 0))
+    return blocks
+
+
+def _certified(a, b, popular, prefix, suffix):
+    """
+    Return the blocks difflib matches first on the common prefix and suffix of
+    sizes prefix and suffix, or None if that cannot be shown.
+
+    find_longest_match picks the longest run of equal lines along a diagonal
+    that contains no popular line, the first one to reach that length if several
+    do, then extends it over any equal lines within its box, so a run inside a
+    segment grows into the whole segment. The segment whose longest run comes
+    first in that order is taken first if no run outside the segments is as long.
+    The other one is then cut to the box left after it (the two overlap when
+    lines are inserted into or deleted from a run of equal lines) and must in turn
+    have the longest run of that box.
+    """
+    segments = []
+    if prefix:
+        segments.append((0, 0, prefix))
+    if suffix:
+        segments.append((len(a) - suffix, len(b) - suffix, suffix))
+    if not segments:
+        return None
+    runs = [_longest_run(a, popular, segment) for segment in segments]
+    if min(size for size, _, _ in runs) == 0:
+        return None
+    weights = np.random.default_rng(0).integers(
+        0, 2**64, size=len(popular), dtype=np.uint64, endpoint=False
+    )
+    box = (0, len(a), 0, len(b))
+    first = min(range(len(segments)), key=lambda s: (-runs[s][0], runs[s][1:]))
+    if _has_run_outside(a, b, popular, weights, runs[first][0], box, segments):
+        return None
+    i, j, k = segments[first]
+    certified = [segments[first]]
+    if len(segments) == 1:
+        return certified
+
+    # The box left for the other segment: after the prefix or before the suffix
+    if i == 0 and j == 0:
+        box = (k, len(a), k, len(b))
+        size = min(suffix, len(a) - k, len(b) - k)
+        other = (len(a) - size, len(b) - size, size)
+    else:
+        box = (0, i, 0, j)
+        size = min(prefix, i, j)
+        other = (0, 0, size)
+    if size == 0:
+        return certified
+    run = _longest_run(a, popular, other)[0]
+    if run == 0 or _has_run_outside(a, b, popular, weights, run, box, [other]):
+        return None
+    return sorted(certified + [other])
+
+
+def _has_run_outside(a, b, popular, weights, size, box, segments):
+    """
+    Whether the box (alo, ahi, blo, bhi) holds a diagonal run of size equal lines
+    with no popular line, that is not inside one of the segments.
+
+    Windows of size lines are compared by hash: every pair of equal windows is
+    counted, and the ones inside a segment are known to pair with their own
+    diagonal. Hash collisions can only make it answer True wrongly, which is safe.
+    """
+    alo, ahi, blo, bhi = box
+    if ahi - alo < size or bhi - blo < size:
+        return False
+    a_hashes, a_valid = _window_hashes(a[alo:ahi], popular, weights, size)
+    b_hashes, _ = _window_hashes(b[blo:bhi], popular, weights, size)
+    a_values, a_counts = np.unique(a_hashes[a_valid], return_counts=True)
+    b_values, b_counts = np.unique(b_hashes, return_counts=True)
+    _, a_index, b_index = np.intersect1d(
+        a_values, b_values, assume_unique=True, return_indices=True
+    )
+    pairs = int(np.sum(a_counts[a_index] * b_counts[b_index]))
+
+    on_segments = 0
+    for i, _, k in segments:
+        if alo <= i and i + k <= ahi and k >= size:
+            start, end = i - alo, i + k - size + 1 - alo
+            on_segments += int(np.sum(a_valid[start:end]))
+    return pairs > on_segments
+
+
+def _window_hashes(ids, popular, weights, size):
+    """
+    Hash of every window of size consecutive ids, and whether the window holds no
+    popular id. The hash is the sum of weights[id] * _BASE**offset over the window,
+    modulo 2**64.
+    """
+    with np.errstate(over="ignore"):
+        powers = np.cumprod(np.full(len(ids), _BASE, dtype=np.uint64)) * _BASE_INVERSE
+        inverse_powers = (
+            np.cumprod(np.full(len(ids), _BASE_INVERSE, dtype=np.uint64)) * _BASE
+        )
+        sums = np.cumsum(weights[ids] * powers, dtype=np.uint64)
+        sums = np.concatenate((np.zeros(1, dtype=np.uint64), sums))
+        # Divide by the power of the window's start to make it relative to it
+        hashes = (sums[size:] - sums[:-size]) * inverse_powers[: len(ids) - size + 1]
+    popular_counts = np.concatenate(([0], np.cumsum(popular[ids])))
+    return hashes, popular_counts[size:] == popular_counts[:-size]
+
+
+def _longest_run(a, popular, segment):
+    """
+    Length of the longest run of lines with no popular line in segment (i, j, k),
+    and the positions in a and b of the last line of the first such run.
+    """
+    i, j, k = segment
+    end = i + k
+    is_popular = popular[a[i:end]]
+    breaks = np.flatnonzero(np.concatenate(([True], is_popular, [True])))
+    lengths = np.diff(breaks) - 1
+    longest = int(np.argmax(lengths))
+    last = int(breaks[longest + 1]) - 2  # offset of the run's last line
+    return int(lengths[longest]), i + last, j + last
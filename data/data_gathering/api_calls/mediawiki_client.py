@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+# Maximum number of revids the query API accepts in one request
+MAX_REVIDS_PER_REQUEST = 50
+
+# Status codes worth retrying: rate limited or temporary server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing out calls to wait() to at most max_per_second."""
+
+    def __init__(self, max_per_second):
+        self.interval = 1.0 / max_per_second
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class MediaWikiClient:
+    """
+    MediaWiki API client sharing one pooled HTTP session between threads,
+    with a global rate limit and retries with exponential backoff.
+
+    api_url can point to a local stub server replaying canned API responses.
+    If a RevisionStore is given, it is read before going to the network and filled
+    with everything fetched.
+    """
+
+    def __init__(
+        self,
+        api_url=API_URL,
+        max_workers=8,
+        max_requests_per_second=10,
+        max_retries=3,
+        backoff=1.0,
+        timeout=10,
+        store=None,
+        pool_size=None,
+    ):
+        self.api_url = api_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.store = store
+        self.rate_limiter = RateLimiter(max_requests_per_second)
+        self.requests_made = 0
+        self._count_lock = threading.Lock()
+
+        self.session = requests.Session()
+        # Callers running several map()s at once need more connections than workers
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "WikiShield data gathering"
+
+    def get(self, params, url=None, cache=True):
+        """
+        Send a GET request with params to the API (or to url) and return the decoded
+        JSON. Retries on connection errors and retryable status codes, waiting
+        backoff * 2**attempt seconds (or the server's Retry-After, in seconds or as
+        an HTTP date) in between.
+        Raises the last error once max_retries retries have failed.
+
+        If cache is True and the client has a store, the response is looked up in the
+        store first, and successful responses are saved to it.
+        """
+        url = url or self.api_url
+        if cache and self.store is not None:
+            data = self.store.get_response(url, params)
+            if data is not None:
+                return data
+        data = self._get(params, url)
+        if cache and self.store is not None and "error" not in data:
+            self.store.put_response(url, params, data)
+        return data
+
+    def _get(self, params, url):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            with self._count_lock:
+                self.requests_made += 1
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    return r.json()
+                error = requests.HTTPError(f"{r.status_code} from {r.url}", response=r)
+                delay = _retry_after(
+                    r.headers.get("Retry-After"), self.backoff * 2**attempt
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                delay = self.backoff * 2**attempt
+            if attempt < self.max_retries:
+                time.sleep(delay)
+        raise error
+
+    def fetch_revision_texts(self, revids, batch_size=MAX_REVIDS_PER_REQUEST):
+        """
+        Fetch the wikitext of many revisions with multi-revid query requests of up to
+        batch_size pipe-separated revids each, run concurrently.
+
+        Returns a dictionary from revid to wikitext. Revisions that do not exist or
+        whose content is hidden are left out; revisions of batches whose request
+        failed are mapped to None.
+        """
+        revids = sorted({int(revid) for revid in revids})
+        texts = {}
+        if self.store is not None:
+            texts = self.store.get_texts(revids)
+            revids = [revid for revid in revids if revid not in texts]
+        batches = []
+        for start in range(0, len(revids), batch_size):
+            end = start + batch_size
+            batches.append(revids[start:end])
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self._fetch_revision_batch, batch): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                try:
+                    batch_texts = future.result()
+                except Exception as e:
+                    print(f"Failed to fetch revisions {futures[future]}: {e}")
+                    texts.update(dict.fromkeys(futures[future]))
+                    continue
+                texts.update(batch_texts)
+                if self.store is not None:
+                    self.store.put_texts(batch_texts)
+        return texts
+
+    def _fetch_revision_batch(self, revids):
+        params = {
+            "action": "query",
+            "prop": "revisions",
+            "revids": "|".join(str(revid) for revid in revids),
+            "rvslots": "main",
+            "rvprop": "ids|content",
+            "formatversion": 2,
+            "format": "json",
+        }
+        texts = {}
+        while True:
+            data = self.get(params, cache=False)  # texts are stored by revid instead
+            for page in data.get("query", {}).get("pages", []):
+                for rev in page.get("revisions", []):
+                    slot = rev.get("slots", {}).get("main", {})
+                    if "content" in slot:
+                        texts[rev["revid"]] = slot["content"]
+            # Large batches can exceed the API's result size and be continued
+            if "continue" not in data:
+                return texts
+            params = {**params, **data["continue"]}
+
+    def fetch_compare_diff(self, fromrev, torev):
+        """
+        Fetch MediaWiki's diff from revision fromrev to torev with one compare
+        request, much smaller than the two revision texts. Returns the HTML diff
+        table (see line_diff.compare_lines), or None if the API reports an error,
+        e.g. for a missing or hidden revision.
+        """
+        params = {
+            "action": "compare",
+            "fromrev": fromrev,
+            "torev": torev,
+            "prop": "diff",
+            "formatversion": 2,
+            "format": "json",
+        }
+        data = self.get(params)
+        if "error" in data:
+            return None
+        compare = data.get("compare", {})
+        return compare.get("body", compare.get("*", ""))
+
+    def map(self, fn, items, checkpoint=None, key=None):
+        """
+        Call fn(item) for every item on a pool of max_workers threads and yield
+        (item, result) pairs as they complete.
+
+        If a Checkpoint is given, items whose key(item) is already in it are skipped,
+        and every result is appended to it as soon as it is ready, so that an
+        interrupted run can resume where it stopped. Items for which fn raises are
+        reported and left out of the checkpoint, to be retried by the next run.
+        """
+        if checkpoint is not None:
+            items = [item for item in items if key(item) not in checkpoint]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(fn, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Failed on {item}: {e}")
+                    continue
+                if checkpoint is not None:
+                    checkpoint.add(key(item), result)
+                yield item, result
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines file of {"key": ..., "result": ...} records,
+    loaded back into a dictionary when the file already exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # last line of an interrupted write
+                    self.results[record["key"]] = record["result"]
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() > 0 and not _ends_with_newline(path):
+            self._file.write("\n")  # terminate the line of an interrupted write
+
+    def add(self, key, result):
+        with self._lock:
+            self.results[key] = result
+            self._file.write(json.dumps({"key": key, "result": result}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def __getitem__(self, key):
+        return self.results[key]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _retry_after(value, default):
+    """
+    Seconds to wait according to a Retry-After header, given either as a number of
+    seconds or as an HTTP date; default if the header is missing or malformed.
+    """
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
@@ -1,7 +1,25 @@
 import pandas as pd
-import requests
-from datetime import datetime, timedelta
-import time
+from datetime import datetime, timezone
+
+from mediawiki_client import MediaWikiClient
+from revision_store import RevisionStore
+from revision_timeline import RevisionTimelines
+
+# ======= EDIT THESE FILE NAMES =======
+input_csv = "filtered_edits_no_dup.csv"         # Input filename
+output_csv = "filtered_edits_with_edit_counts.csv"  # Output filename
+store_file = "revision_store.sqlite"  # Local revision store of the api_calls scripts
+# =====================================
+
+# Output column -> window in seconds: number of edits to the title in the window
+# before each edit. All windows are counted from the revisions of the largest one
+WINDOWS = {
+    "num_edits_1h_before": 3600,
+    "num_edits_1d_before": 86400,
+    "num_edits_5d_before": 5 * 86400,
+    "num_edits_30d_before": 30 * 86400,
+}
+
 
 def to_iso8601(ts):
     ts = str(ts)
@@ -12,67 +30,65 @@ def to_iso8601(ts):
             return f"{ts[:4]}-{ts[4:6]}-{ts[6:8]}T{ts[8:10]}:{ts[10:12]}:{ts[12:14]}Z"
     return ts  # fallback
 
-def revision_count(title, start, end):
-    url = "https://en.wikipedia.org/w/api.php"
-    total = 0
-    next_rvcontinue = None
-    while True:
-        params = {
-            "action": "query",
-            "format": "json",
-            "prop": "revisions",
-            "titles": title,
-            "rvstart": start,
-            "rvend": end,
-            "rvlimit": "max",
-            "rvdir": "older",
-            "rvprop": "ids"
-        }
-        if next_rvcontinue:
-            params['rvcontinue'] = next_rvcontinue
-        try:
-            r = requests.get(url, params=params, timeout=10)
-            r.raise_for_status()
-            data = r.json()
-            pages = list(data["query"]["pages"].values())
-            if not pages or "revisions" not in pages[0]:
-                break
-            revs = pages[0]["revisions"]
-            total += len(revs)
-            if "continue" in data:
-                next_rvcontinue = data["continue"]["rvcontinue"]
-            else:
-                break
-        except Exception:
-            break
-    return total
+
+def edit_seconds(ts):
+    """Unix time in seconds of a timestamp of the csv, in any format of to_iso8601."""
+    edit_time = datetime.strptime(to_iso8601(ts), "%Y-%m-%dT%H:%M:%SZ")
+    return int(edit_time.replace(tzinfo=timezone.utc).timestamp())
+
 
 # --- MAIN PROCESS ---
+def count_recent_edits(titles, timestamps, client, windows=None):
+    """
+    Number of edits to each title within each window before the matching timestamp,
+    as a dictionary from the columns of windows (WINDOWS by default) to lists of
+    counts, "" where the timestamp or the title's revisions could not be read.
+    """
+    windows = windows or WINDOWS
+    titles = pd.Series(list(titles)).astype(str).str.replace(" ", "_")
+    times = pd.Series(pd.NA, index=titles.index, dtype="Int64")
+    for i, ts in enumerate(timestamps):
+        try:
+            times[i] = edit_seconds(ts)
+        except Exception as e:
+            print(f"Error for {titles[i]} @ {ts}: {e}")
+
+    # Each title's revision times are fetched once over the union of its windows,
+    # then every row's count is a binary search in them
+    timelines = RevisionTimelines(client)
+    rows_by_title = titles.index[times.notna()].groupby(titles[times.notna()])
+    for title, rows in rows_by_title.items():
+        timelines.need(title, times[rows].to_numpy(), max(windows.values()))
+    timelines.fetch()
+    print(f"Fetched the revision timelines of {len(rows_by_title)} titles "
+          f"with {client.requests_made} requests")
+
+    counts = {}
+    for column, window in windows.items():
+        counts[column] = pd.Series("", index=titles.index, dtype=object)
+        for title, rows in rows_by_title.items():
+            if title not in timelines.failed:
+                recent = timelines.count(title, times[rows].to_numpy(), window)
+                counts[column][rows] = recent.tolist()
+    return {column: values.tolist() for column, values in counts.items()}
+
+
+def main(client=None):
+    # Requests go through the local revision store, so timelines fetched by earlier
+    # runs cost no API calls
+    client = client or MediaWikiClient(store=RevisionStore(store_file))
+
+    df = pd.read_csv(input_csv)
+    counts = count_recent_edits(df['title'], df['current_timestamp'], client)
+    for column, values in counts.items():
+        df[column] = values
+    print(df[list(counts)].head())
+
+    df.to_csv(output_csv, index=False)
+    if client.store is not None:
+        print(f"Revision store: {client.store.stats()}")
+    print(f"Done. Output written to {output_csv}")
 
-input_csv = "filtered_edits_no_dup.csv"         # Input filename
-output_csv = "filtered_edits_with_edit_counts.csv"  # Output filename
 
-df = pd.read_csv(input_csv)
-edit_counts = []
-
-for i, row in df.iterrows():
-    title = str(row['title']).replace(" ", "_")
-    ts = row['current_timestamp']
-    try:
-        dt = to_iso8601(ts)
-        edit_time = datetime.strptime(dt, "%Y-%m-%dT%H:%M:%SZ")
-        start = (edit_time - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
-        end = (edit_time - timedelta(days=5)).strftime("%Y-%m-%dT%H:%M:%SZ")
-        count = revision_count(title, start, end)
-    except Exception as e:
-        print(f"Error for {title} @ {ts}: {e}")
-        count = ""
-    edit_counts.append(count)
-    print(f"{i+1}/{len(df)} | {title} | edits in 5d before: {count}")
-    if (i+1) % 250 == 0:
-        print(f"Pausing for 1 second after {i+1} API calls...")
-        time.sleep(1)
-
-df['num_edits_5d_before'] = edit_counts
-df.to_csv(output_csv, index=False)
-print(f"Done. Output written to {output_csv}")
+if __name__ == "__main__":
+    main()
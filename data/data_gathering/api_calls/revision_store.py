@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+
+class RevisionStore:
+    """
+    Persistent local store of MediaWiki data, shared by the api_calls scripts so that
+    re-running them on overlapping edits costs almost no network I/O.
+
+    A single SQLite file holds:
+    - revision wikitext, zlib-compressed and content-addressed: each distinct text is
+      stored once under its SHA-1, and revids point to it (reverted articles share
+      most of their revisions' contents),
+    - decoded API responses, keyed by request URL and parameters, for metadata
+      lookups such as revision IDs or revision counts.
+
+    The store counts hits and misses of both kinds of lookups, see stats().
+    """
+
+    def __init__(self, path="revision_store.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (sha1 TEXT PRIMARY KEY, data BLOB);
+            CREATE TABLE IF NOT EXISTS revisions (revid INTEGER PRIMARY KEY, sha1 TEXT);
+            CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, data BLOB);
+            """
+        )
+        self.hits = {"texts": 0, "responses": 0}
+        self.misses = {"texts": 0, "responses": 0}
+
+    def get_texts(self, revids):
+        """Return a dictionary from revid to wikitext for the revids in the store."""
+        revids = [int(revid) for revid in revids]
+        texts = {}
+        with self._lock:
+            # Stay below SQLite's limit on the number of query parameters
+            for start in range(0, len(revids), 500):
+                end = start + 500
+                chunk = revids[start:end]
+                rows = self._conn.execute(
+                    "SELECT revid, data FROM revisions JOIN blobs USING (sha1) "
+                    f"WHERE revid IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for revid, data in rows:
+                    texts[revid] = zlib.decompress(data).decode("utf-8")
+            self.hits["texts"] += len(texts)
+            self.misses["texts"] += len(set(revids)) - len(texts)
+        return texts
+
+    def put_texts(self, texts):
+        """Store the wikitext of each revid in the dictionary texts."""
+        rows, blobs = [], {}
+        for revid, text in texts.items():
+            encoded = text.encode("utf-8")
+            sha1 = hashlib.sha1(encoded).hexdigest()
+            rows.append((int(revid), sha1))
+            if sha1 not in blobs:
+                blobs[sha1] = zlib.compress(encoded)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO blobs VALUES (?, ?)", blobs.items()
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO revisions VALUES (?, ?)", rows
+            )
+
+    def get_response(self, url, params):
+        """Return the stored decoded response of a request, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM responses WHERE key = ?", (_request_key(url, params),)
+            ).fetchone()
+            if row is None:
+                self.misses["responses"] += 1
+                return None
+            self.hits["responses"] += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put_response(self, url, params, data):
+        """Store the decoded response data of a request."""
+        blob = zlib.compress(json.dumps(data).encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?)",
+                (_request_key(url, params), blob),
+            )
+
+    def iter_responses(self):
+        """Yield (url, params, data) for every stored response."""
+        with self._lock:
+            rows = self._conn.execute("SELECT key, data FROM responses").fetchall()
+        for key, data in rows:
+            url, items = json.loads(key)
+            yield url, dict(items), json.loads(zlib.decompress(data))
+
+    def stats(self):
+        """
+        Return a dictionary with the hits, misses and hit rate of the lookups made
+        through this store object, the number of stored revisions, distinct texts and
+        responses, and the size of the store file in bytes.
+        """
+        with self._lock:
+            counts = {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("revisions", "blobs", "responses")
+            }
+        lookups = sum(self.hits.values()) + sum(self.misses.values())
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": sum(self.hits.values()) / lookups if lookups else 0.0,
+            "revisions": counts["revisions"],
+            "distinct_texts": counts["blobs"],
+            "responses": counts["responses"],
+            "size_bytes": os.path.getsize(self.path),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def _request_key(url, params):
+    """Canonical key of a GET request: its URL and sorted parameters."""
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    return json.dumps([url, items])
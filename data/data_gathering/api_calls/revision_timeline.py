@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class RevisionTimelines:
+    """
+    Revision timestamps of many titles, fetched once per title over the union of
+    the time windows needed, to count the revisions made within any window before
+    any time by binary search instead of one API walk per window.
+
+    Usage: need(title, time, window) for every count to come, then fetch(), then
+    count(title, times, window) for any window up to the ones declared.
+    Times are Unix timestamps in seconds.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.timelines = {}  # title -> sorted array of revision times
+        self.failed = set()  # titles whose revisions could not all be fetched
+        self._needed = {}  # title -> list of (start, end) windows, ends included
+
+    def need(self, title, times, window):
+        """Declare that revisions of title in [t - window, t - 1] will be counted."""
+        windows = self._needed.setdefault(title, [])
+        windows.extend((int(t) - window, int(t) - 1) for t in np.atleast_1d(times))
+
+    def fetch(self):
+        """
+        Fetch the revision times of every declared title, one title per thread of
+        the client's pool. Titles whose requests failed are left in failed.
+        """
+        titles = list(self._needed)
+        for title, times in self.client.map(self._fetch_title, titles):
+            self.timelines[title] = np.sort(np.array(times, dtype=np.int64))
+        self.failed.update(title for title in titles if title not in self.timelines)
+        self._needed.clear()
+
+    def count(self, title, times, window):
+        """
+        Number of revisions of title made in [time - window, time - 1] for each of
+        times, as an array. Only meaningful for windows declared with need.
+        """
+        timeline = self.timelines.get(title, np.empty(0, dtype=np.int64))
+        times = np.asarray(times, dtype=np.int64)
+        last = np.searchsorted(timeline, times - 1, side="right")
+        first = np.searchsorted(timeline, times - window, side="left")
+        return last - first
+
+    def _fetch_title(self, title):
+        """
+        Times of the revisions of title made in its declared windows (and possibly
+        in between), newest first.
+
+        The revisions are walked from the newest window down to the oldest one.
+        Whenever a page ends between two windows, the walk jumps to the end of the
+        next window with a new request instead of paging through the gap, so each
+        request either fetches needed revisions or skips a gap.
+        """
+        windows = merge_windows(self._needed[title])
+        params = {
+            "action": "query",
+            "format": "json",
+            "prop": "revisions",
+            "titles": title,
+            "rvstart": format_time(windows[-1][1]),
+            "rvend": format_time(windows[0][0]),
+            "rvlimit": "max",
+            "rvdir": "older",
+            "rvprop": "timestamp",
+        }
+        times = []
+        while True:
+            data = self.client.get(params)
+            pages = list(data["query"]["pages"].values())
+            if not pages or "revisions" not in pages[0]:
+                break
+            times.extend(parse_time(rev["timestamp"]) for rev in pages[0]["revisions"])
+            if "continue" not in data:
+                break
+            # Every revision newer than the oldest one so far has been fetched
+            oldest = times[-1]
+            while windows and windows[-1][0] > oldest:
+                windows.pop()
+            if not windows:
+                break
+            if windows[-1][1] < oldest:
+                params = {**params, "rvstart": format_time(windows[-1][1])}
+                params.pop("rvcontinue", None)
+            else:
+                params = {**params, "rvcontinue": data["continue"]["rvcontinue"]}
+        return times
+
+
+def merge_windows(windows):
+    """Union of (start, end) windows with both ends included, as sorted windows."""
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(window) for window in merged]
+
+
+def format_time(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime(ISO_FORMAT)
+
+
+def parse_time(timestamp):
+    return int(
+        datetime.strptime(timestamp, ISO_FORMAT)
+        .replace(tzinfo=timezone.utc)
+        .timestamp()
+    )
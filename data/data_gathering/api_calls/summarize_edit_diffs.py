@@ -1,30 +1,23 @@
-import xml.etree.ElementTree as ET
 import csv
-import difflib
-import requests
-import time
+
+from line_diff import DIFF_ENGINES, compare_lines
+from mediawiki_client import MAX_REVIDS_PER_REQUEST, MediaWikiClient, Checkpoint
+from revision_store import RevisionStore
+from xml_to_columnar import COLUMNS, iter_rows
 
 # ======= EDIT THESE FILE NAMES =======
 input_xml = "filtered_edits_no_dup.xml"   # <--- Put input xml filename here
 output_csv = "filtered_edits_no_dup.csv"     # <--- Put output csv filename here
+checkpoint_file = "filtered_edits_no_dup.checkpoint.jsonl"  # <--- Fetched diffs, to resume an interrupted run
+store_file = "revision_store.sqlite"  # <--- Local revision store shared by the api_calls scripts
 # =====================================
 
-COLUMNS = [
-    "EditType", "EditID", "comment", "user", "user_edit_count", "user_distinct_pages",
-    "user_warns", "user_reg_time", "prev_user", "common", "current", "previous", "page_made_time", "title", "namespace", "creator",
-    "num_recent_edits", "num_recent_reversions", "current_minor", "current_timestamp", "added_lines", "previous_timestamp",
-    "deleted_lines", "isvandalism"
-]
-
-def extract_field(wpedit, path, default=""):
-    """Safely get text from nested XML tags."""
-    elem = wpedit
-    for part in path.split("/"):
-        if elem is not None:
-            elem = elem.find(part)
-        else:
-            return default
-    return elem.text if (elem is not None and elem.text is not None) else default
+# "texts" fetches both revision texts and diffs them locally, "compare" fetches
+# MediaWiki's own diff of the two revisions instead (one small request per edit)
+diff_source = "texts"
+
+# Edits whose revision texts are fetched in one request and diffed together
+PAIRS_PER_CHUNK = MAX_REVIDS_PER_REQUEST // 2
 
 def to_iso8601(ts):
     ts = str(ts)
@@ -36,8 +29,7 @@ def to_iso8601(ts):
             return f"{ts[:4]}-{ts[4:6]}-{ts[6:8]}T{ts[8:10]}:{ts[10:12]}:{ts[12:14]}Z"
     return ts
 
-def fetch_revision_ids(title, timestamp_iso):
-    url = "https://en.wikipedia.org/w/api.php"
+def fetch_revision_ids(title, timestamp_iso, client):
     params = {
         "action": "query",
         "prop": "revisions",
@@ -48,8 +40,7 @@ def fetch_revision_ids(title, timestamp_iso):
         "rvprop": "ids|timestamp",
         "format": "json"
     }
-    r = requests.get(url, params=params, timeout=10)
-    data = r.json()
+    data = client.get(params)
     if "error" in data or "query" not in data:
         return None, None
     pages = list(data["query"]["pages"].values())
@@ -63,98 +54,117 @@ def fetch_revision_ids(title, timestamp_iso):
     else:
         return None, None
 
-def fetch_revision_text(revid):
-    url = "https://en.wikipedia.org/w/api.php"
-    params = {
-        "action": "query",
-        "prop": "revisions",
-        "revids": revid,
-        "rvslots": "main",
-        "rvprop": "content",
-        "formatversion": 2,
-        "format": "json"
-    }
-    r = requests.get(url, params=params, timeout=10)
-    data = r.json()
-    pages = data.get("query", {}).get("pages", [])
-    if pages and 'revisions' in pages[0]:
-        slot = pages[0]['revisions'][0]['slots'].get('main', {})
-        return slot.get('content', "") if 'content' in slot else ""
-    else:
-        return ""
-
-def get_added_deleted_lines(prev_text, curr_text):
-    added, deleted = [], []
-    diff = difflib.unified_diff(
-        prev_text.splitlines(), curr_text.splitlines(),
-        fromfile='previous', tofile='current', lineterm="", n=0)
-    for line in diff:
-        if line.startswith("---") or line.startswith("+++") or line.startswith("@@"):
-            continue
-        elif line.startswith("-"):
-            deleted.append(line[1:])
-        elif line.startswith("+"):
-            added.append(line[1:])
-    return "\n".join(added), "\n".join(deleted)
-
-tree = ET.parse(input_xml)
-root = tree.getroot()
-output_rows = []
-api_calls = 0
-
-for i, wpedit in enumerate(root.findall("WPEdit")):
-    row = {col: extract_field(wpedit, col) for col in COLUMNS}
-
-    # Now fill the extra fields from <common> and <current> children if missing:
-    row["page_made_time"]          = extract_field(wpedit, "common/page_made_time")
-    row["title"]                   = extract_field(wpedit, "common/title")
-    row["namespace"]               = extract_field(wpedit, "common/namespace")
-    row["creator"]                 = extract_field(wpedit, "common/creator")
-    row["num_recent_edits"]        = extract_field(wpedit, "common/num_recent_edits")
-    row["num_recent_reversions"]   = extract_field(wpedit, "common/num_recent_reversions")
-    row["current_minor"]           = extract_field(wpedit, "current/minor")
-    row["current_timestamp"]       = extract_field(wpedit, "current/timestamp")
-
-    # Compute added/deleted lines if not already present or set to BAD REQUEST
+def get_added_deleted_lines(prev_text, curr_text, engine="difflib"):
+    """Added and deleted lines between two revision texts, see line_diff.DIFF_ENGINES."""
+    return DIFF_ENGINES[engine](prev_text, curr_text)
+
+def fetch_revision_pair(row, client):
+    """
+    Return the [previous, current] revids of the edit in row,
+    or None if the edit or its revisions could not be found.
+    Network errors are raised, so that the edit is retried on the next run.
+    """
     title = row["title"].replace(" ", "_")
     curr_ts = row["current_timestamp"]
     if not title or not curr_ts:
-        row['added_lines'] = "BAD REQUEST"
-        row['deleted_lines'] = "BAD REQUEST"
-        print(f"Row {i+1}: blank title or timestamp, skipping.")
-        output_rows.append(row)
-        continue
+        print(f"{row['EditID']}: blank title or timestamp, skipping.")
+        return None
     timestamp_iso = to_iso8601(curr_ts)
-    prev_rev, curr_rev = fetch_revision_ids(title, timestamp_iso)
-    api_calls += 1
-    if prev_rev and curr_rev:
-        prev_text = fetch_revision_text(prev_rev)
-        curr_text = fetch_revision_text(curr_rev)
-        api_calls += 2
-        if not prev_text or not curr_text:
-            row['added_lines'] = "BAD REQUEST"
-            row['deleted_lines'] = "BAD REQUEST"
-            print(f"Row {i+1}: Could not retrieve revision content for {title}")
+    prev_rev, curr_rev = fetch_revision_ids(title, timestamp_iso, client)
+    if not (prev_rev and curr_rev):
+        print(f"{row['EditID']}: Could not fetch revisions for {title}")
+        return None
+    return [prev_rev, curr_rev]
+
+def fetch_diffs(edits, client, checkpoint, source=None):
+    """
+    Find the added and deleted lines of each edit (a dictionary with EditID, title
+    and current_timestamp) and add them to the checkpoint under its EditID, as
+    ["BAD REQUEST", "BAD REQUEST"] if they could not be found. Edits already in the
+    checkpoint are skipped, and edits whose requests failed are left out of it.
+    """
+    source = source or diff_source
+    pending = [row for row in edits if row["EditID"] not in checkpoint]
+
+    # 1. Find the previous and current revision of each edit (one request per edit)
+    revision_pairs = {}
+    for row, pair in client.map(lambda row: fetch_revision_pair(row, client), pending):
+        if pair is None:
+            checkpoint.add(row["EditID"], ["BAD REQUEST", "BAD REQUEST"])
         else:
-            added, deleted = get_added_deleted_lines(prev_text, curr_text)
-            row['added_lines'] = added
-            row['deleted_lines'] = deleted
-            print(f"Row {i+1}: Found diffs for {title}")
+            revision_pairs[row["EditID"]] = pair
+    print(f"Found revisions of {len(revision_pairs)} edits with {client.requests_made} API calls")
+
+    if source == "compare":
+        # 2. Fetch the server's diff of each pair of revisions
+        for (edit_id, _), body in client.map(
+            lambda item: client.fetch_compare_diff(*item[1]), revision_pairs.items()
+        ):
+            if body is None:
+                print(f"{edit_id}: Could not retrieve the diff")
+                checkpoint.add(edit_id, ["BAD REQUEST", "BAD REQUEST"])
+            else:
+                checkpoint.add(edit_id, list(compare_lines(body)))
+        print(f"Fetched the diffs with {client.requests_made} API calls in total")
     else:
-        row['added_lines'] = "BAD REQUEST"
-        row['deleted_lines'] = "BAD REQUEST"
-        print(f"Row {i+1}: Could not fetch revisions for {title}")
-
-    output_rows.append(row)
-    if api_calls % 250 == 0:
-        print(f"Pausing 1 second after {api_calls} API calls...")
-        time.sleep(1)
-
-with open(output_csv, "w", newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=COLUMNS)
-    writer.writeheader()
-    for row in output_rows:
-        filtered_row = {k: row.get(k, "") for k in COLUMNS}
-        writer.writerow(filtered_row)
-
-print(f"Done. Output saved as {output_csv}.")
\ No newline at end of file
+        # 2. Fetch the contents of the revisions, one request of up to 50 revisions per
+        # chunk of edits, and checkpoint the diffs of each chunk as soon as it arrives:
+        # only the texts of the chunks in flight are held, and an interrupted run
+        # keeps every chunk diffed so far
+        pairs = list(revision_pairs.items())
+        chunks = []
+        for start in range(0, len(pairs), PAIRS_PER_CHUNK):
+            end = start + PAIRS_PER_CHUNK
+            chunks.append(pairs[start:end])
+
+        def fetch_texts(chunk):
+            return client.fetch_revision_texts(
+                revid for _, pair in chunk for revid in pair
+            )
+
+        fetched = 0
+        for chunk, texts in client.map(fetch_texts, chunks):
+            fetched += sum(text is not None for text in texts.values())
+            # 3. Fan the texts back out to the edits of the chunk
+            for edit_id, (prev_rev, curr_rev) in chunk:
+                prev_text, curr_text = texts.get(prev_rev, ""), texts.get(curr_rev, "")
+                if prev_text is None or curr_text is None:
+                    continue  # request failed, retry on the next run
+                if not prev_text or not curr_text:
+                    print(f"{edit_id}: Could not retrieve revision content")
+                    checkpoint.add(edit_id, ["BAD REQUEST", "BAD REQUEST"])
+                else:
+                    lines = get_added_deleted_lines(prev_text, curr_text)
+                    checkpoint.add(edit_id, list(lines))
+        print(f"Fetched {fetched} revisions, {client.requests_made} API calls in total")
+
+def main(client=None):
+    # Only the fields needed to find the revisions are kept, the rows are read again
+    # from the xml file when writing the csv
+    edits = [
+        {"EditID": row["EditID"], "title": row["title"], "current_timestamp": row["current_timestamp"]}
+        for row in iter_rows(input_xml)
+    ]
+
+    # Edits are fetched concurrently through one pooled, rate limited session.
+    # Every result goes to the checkpoint file, so an interrupted run resumes where it stopped.
+    client = client or MediaWikiClient(store=RevisionStore(store_file))
+    with Checkpoint(checkpoint_file) as checkpoint:
+        fetch_diffs(edits, client, checkpoint)
+
+        with open(output_csv, "w", newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for row in iter_rows(input_xml):
+                if row["EditID"] in checkpoint:
+                    row["added_lines"], row["deleted_lines"] = checkpoint[row["EditID"]]
+                else:
+                    row["added_lines"], row["deleted_lines"] = "BAD REQUEST", "BAD REQUEST"
+                writer.writerow(row)
+
+    if client.store is not None:
+        print(f"Revision store: {client.store.stats()}")
+    print(f"Done. Output saved as {output_csv}.")
+
+if __name__ == "__main__":
+    main()
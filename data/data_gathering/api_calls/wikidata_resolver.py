@@ -0,0 +1,291 @@
+import heapq
+import json
+import os
+import sqlite3
+
+from mediawiki_client import MAX_REVIDS_PER_REQUEST
+
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+
+# Properties followed from an item to its types: instance of, subclass of
+PARENT_PROPERTIES = ("P31", "P279")
+
+
+class WikidataResolver:
+    """
+    Resolve Wikipedia titles to Wikidata items and test whether items descend from
+    a class (e.g. human, Q5) through P31/P279 links, with batched requests and a
+    persistent local graph.
+
+    A SQLite file keeps the title -> QID lookups, the QID -> parents graph and,
+    for every node met while resolving, its distance to each target class, so that
+    shared ancestors are fetched and resolved once, in this run and the next ones.
+    Titles are looked up 50 per request, and entities 50 per wbgetentities request.
+    """
+
+    def __init__(
+        self,
+        client,
+        path="wikidata_graph.sqlite",
+        wikidata_url=None,
+        batch_size=MAX_REVIDS_PER_REQUEST,
+    ):
+        self.client = client
+        self.path = path
+        self.wikidata_url = wikidata_url or WIKIDATA_API_URL
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS titles (title TEXT PRIMARY KEY, qid TEXT);
+            CREATE TABLE IF NOT EXISTS parents (qid TEXT PRIMARY KEY, parents TEXT);
+            CREATE TABLE IF NOT EXISTS reach (
+                qid TEXT, target TEXT, distance INTEGER, radius INTEGER,
+                PRIMARY KEY (qid, target)
+            );
+            """
+        )
+        self.fetched = {"titles": 0, "entities": 0}
+
+    def qids(self, titles):
+        """
+        Return a dictionary from each title to the QID of its Wikidata item, or
+        None if it has none. Titles of batches whose request failed are left out.
+        """
+        titles = list(dict.fromkeys(titles))
+        known = self._select("SELECT title, qid FROM titles WHERE title IN", titles)
+        missing = [title for title in titles if title not in known]
+        for _, found in self.client.map(self._fetch_qids, self._batches(missing)):
+            self._conn.executemany("INSERT OR REPLACE INTO titles VALUES (?, ?)", found)
+            self._conn.commit()
+            known.update(found)
+            self.fetched["titles"] += len(found)
+        return known
+
+    def parents(self, qids):
+        """
+        Return a dictionary from each QID to the list of its P31 and P279 values.
+        QIDs of batches whose request failed are left out.
+        """
+        qids = list(dict.fromkeys(qids))
+        rows = self._select("SELECT qid, parents FROM parents WHERE qid IN", qids)
+        known = {qid: json.loads(parents) for qid, parents in rows.items()}
+        missing = [qid for qid in qids if qid not in known]
+        for _, found in self.client.map(self._fetch_parents, self._batches(missing)):
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parents VALUES (?, ?)",
+                [(qid, json.dumps(parents)) for qid, parents in found.items()],
+            )
+            self._conn.commit()
+            known.update(found)
+            self.fetched["entities"] += len(found)
+        return known
+
+    def descends_from(self, qids, target="Q5", max_depth=5):
+        """
+        Return a dictionary from each QID to whether target can be reached from it in
+        at most max_depth P31/P279 links, or None if that depends on entities that
+        could not be fetched.
+
+        The ancestors of all the QIDs are explored together, level by level, one
+        batch of entity requests per level. Nodes whose distance to target is
+        already known well enough (from the memo) are not expanded. If some
+        entities could not be fetched, the results are not memoized, and only the
+        QIDs reaching target without them, or not reaching them, are decided.
+        """
+        qids = list(dict.fromkeys(qids))
+        memo = {}  # (distance, radius) of the nodes met so far, see _memo_entries
+        depth = {qid: 0 for qid in qids}
+        graph = {}  # parents of the expanded nodes
+        leaves = {}  # distance to target of the nodes known from the memo
+        frontier, failed = qids, []
+        for level in range(max_depth + 1):
+            memo.update(self._memo([q for q in frontier if q not in memo], target))
+            expand = []
+            for qid in frontier:
+                distance, radius = memo.get(qid, (None, -1))
+                if qid == target:
+                    leaves[qid] = 0
+                elif distance is not None or radius >= max_depth - level:
+                    leaves[qid] = distance if distance is not None else float("inf")
+                elif level < max_depth:
+                    expand.append(qid)
+            parents = self.parents(expand)
+            next_frontier = []
+            for qid in expand:
+                if qid not in parents:
+                    failed.append(qid)
+                graph[qid] = parents.get(qid, [])
+                for parent in graph[qid]:
+                    if parent not in depth:
+                        depth[parent] = level + 1
+                        next_frontier.append(parent)
+            frontier = next_frontier
+
+        distances = _distances_to_target(graph, leaves)
+        reached = {qid: distances.get(qid, float("inf")) <= max_depth for qid in qids}
+        if not failed:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO reach VALUES (?, ?, ?, ?)",
+                _memo_entries(graph, distances, depth, target, max_depth),
+            )
+            self._conn.commit()
+            return reached
+        # The QIDs not reaching target could through the parents of failed entities
+        undecided = _distances_to_target(graph, dict.fromkeys(failed, 0))
+        return {
+            qid: None if not reached[qid] and qid in undecided else reached[qid]
+            for qid in qids
+        }
+
+    def ancestors(self, qids, max_depth=5):
+        """
+        Return the dictionary from QID to parents of the QIDs and all their
+        ancestors less than max_depth P31/P279 links away, fetching the missing
+        entities level by level. Unlike descends_from, nothing is cut short for a
+        given class, so the result can answer for any classes (see AncestryIndex).
+        Entities that could not be fetched have no parents in it.
+        """
+        graph = {}
+        frontier = list(dict.fromkeys(qids))
+        for _ in range(max_depth):
+            parents = self.parents([qid for qid in frontier if qid not in graph])
+            next_frontier = []
+            for qid in frontier:
+                if qid in graph:
+                    continue
+                graph[qid] = parents.get(qid, [])
+                next_frontier.extend(p for p in graph[qid] if p not in graph)
+            frontier = next_frontier
+        return graph
+
+    def stats(self):
+        """
+        Return a dictionary with the number of titles and entities fetched through
+        this object, the number of stored titles, entities and memoized distances,
+        and the size of the graph file in bytes.
+        """
+        counts = {
+            table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("titles", "parents", "reach")
+        }
+        return {
+            "fetched": dict(self.fetched),
+            "titles": counts["titles"],
+            "entities": counts["parents"],
+            "memoized": counts["reach"],
+            "size_bytes": os.path.getsize(self.path),
+        }
+
+    def close(self):
+        self._conn.close()
+
+    def _memo(self, qids, target):
+        """Memoized (distance, radius) to target of the given QIDs that have one."""
+        return self._select(
+            "SELECT qid, distance, radius FROM reach WHERE target = ? AND qid IN",
+            qids,
+            (target,),
+            many=True,
+        )
+
+    def _batches(self, items):
+        batches = []
+        for start in range(0, len(items), self.batch_size):
+            end = start + self.batch_size
+            batches.append(items[start:end])
+        return batches
+
+    def _select(self, query, keys, params=(), many=False):
+        """
+        Run query + " (?, ?, ...)" over keys in chunks, and return a dictionary from
+        the first column to the second one (to the tuple of the others if many).
+        """
+        found = {}
+        for start in range(0, len(keys), 500):
+            end = start + 500
+            chunk = keys[start:end]
+            rows = self._conn.execute(
+                f"{query} ({','.join('?' * len(chunk))})", (*params, *chunk)
+            )
+            for key, *values in rows:
+                found[key] = tuple(values) if many else values[0]
+        return found
+
+    def _fetch_qids(self, titles):
+        params = {
+            "action": "query",
+            "prop": "pageprops",
+            "ppprop": "wikibase_item",
+            "titles": "|".join(titles),
+            "format": "json",
+        }
+        data = self.client.get(params, cache=False)
+        query = data["query"]
+        renamed = {n["from"]: n["to"] for n in query.get("normalized", [])}
+        qid_by_title = {
+            page["title"]: page.get("pageprops", {}).get("wikibase_item")
+            for page in query["pages"].values()
+        }
+        return [
+            (title, qid_by_title.get(renamed.get(title, title))) for title in titles
+        ]
+
+    def _fetch_parents(self, qids):
+        params = {
+            "action": "wbgetentities",
+            "ids": "|".join(qids),
+            "props": "claims",
+            "format": "json",
+        }
+        data = self.client.get(params, url=self.wikidata_url, cache=False)
+        if "error" in data:
+            raise ValueError(data["error"].get("info", data["error"]))
+        found = {qid: [] for qid in qids}  # missing items have no parents
+        for key, entity in data.get("entities", {}).items():
+            qid = entity.get("redirects", {}).get("from", key)
+            parents = set()
+            for prop in PARENT_PROPERTIES:
+                for claim in entity.get("claims", {}).get(prop, []):
+                    value = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+                    if isinstance(value, dict) and "id" in value:
+                        parents.add(value["id"])
+            found[qid] = sorted(parents)
+        return found
+
+
+def _distances_to_target(graph, leaves):
+    """
+    Shortest distance to the target from every node of graph (node -> parents),
+    given the distance of its leaves, by Dijkstra's algorithm on reversed edges.
+    """
+    children = {}
+    for qid, parents in graph.items():
+        for parent in parents:
+            children.setdefault(parent, []).append(qid)
+    distances = dict(leaves)
+    heap = [(distance, qid) for qid, distance in leaves.items()]
+    heapq.heapify(heap)
+    while heap:
+        distance, qid = heapq.heappop(heap)
+        if distance > distances.get(qid, float("inf")):
+            continue
+        for child in children.get(qid, []):
+            if child not in leaves and distance + 1 < distances.get(
+                child, float("inf")
+            ):
+                distances[child] = distance + 1
+                heapq.heappush(heap, (distance + 1, child))
+    return distances
+
+
+def _memo_entries(graph, distances, depth, target, max_depth):
+    """
+    Rows of the reach table for every expanded node. Its ancestors were explored
+    up to max_depth - depth[qid] links (the radius), so its distance is exact within
+    the radius, None standing for "farther than the radius".
+    """
+    for qid in graph:
+        distance = distances.get(qid, float("inf"))
+        radius = max_depth - depth[qid]
+        yield qid, target, (int(distance) if distance <= radius else None), radius
@@ -0,0 +1,212 @@
+import os
+import sys
+
+# The WPEdit reader is shared with the XML cleaning scripts
+sys.path.append(
+    os.path.join(os.path.dirname(__file__), "..", "data_cleaning_and_preprocessing")
+)
+from wpedit_stream import iter_wpedits  # noqa: E402
+
+# ======= EDIT THESE FILE NAMES =======
+input_xml = "filtered_edits_no_dup.xml"  # <--- Put input xml filename here
+output_file = "filtered_edits_no_dup.parquet"  # <--- .parquet, or .arrow for Arrow IPC
+# Diffs fetched by summarize_edit_diffs, attached if the file exists
+checkpoint_file = "filtered_edits_no_dup.checkpoint.jsonl"
+# =====================================
+
+COLUMNS = [
+    "EditType", "EditID", "comment", "user", "user_edit_count", "user_distinct_pages",
+    "user_warns", "user_reg_time", "prev_user", "common", "current", "previous",
+    "page_made_time", "title", "namespace", "creator", "num_recent_edits",
+    "num_recent_reversions", "current_minor", "current_timestamp", "added_lines",
+    "previous_timestamp", "deleted_lines", "isvandalism",
+]  # fmt: skip
+
+# Columns filled from the children of <common> and <current> instead of WPEdit's own
+NESTED_COLUMNS = {
+    "common": {
+        "page_made_time": "page_made_time",
+        "title": "title",
+        "namespace": "namespace",
+        "creator": "creator",
+        "num_recent_edits": "num_recent_edits",
+        "num_recent_reversions": "num_recent_reversions",
+    },
+    "current": {"minor": "current_minor", "timestamp": "current_timestamp"},
+}
+_NESTED_TARGETS = {col for fields in NESTED_COLUMNS.values() for col in fields.values()}
+
+DIFF_COLUMNS = ["added_lines", "deleted_lines"]
+
+# Column types of the columnar output, the ones pandas infers when reading the CSV;
+# the other columns are strings. Empty fields are null.
+INT_COLUMNS = {
+    "EditID", "user_edit_count", "user_distinct_pages", "user_warns", "user_reg_time",
+    "page_made_time", "num_recent_edits", "num_recent_reversions",
+    "current_timestamp", "previous_timestamp",
+}  # fmt: skip
+BOOL_COLUMNS = {"current_minor", "isvandalism"}
+_BOOLS = {"true": True, "false": False}
+
+
+def read_row(wpedit):
+    """
+    Return the CSV row of a WPEdit element as a dictionary of strings, with ""
+    for missing fields, walking its children (and those of <common> and <current>)
+    once.
+    """
+    row = dict.fromkeys(COLUMNS, "")
+    seen = set()
+    for child in wpedit:
+        if child.tag in seen:
+            continue  # only the first element with a given tag counts
+        seen.add(child.tag)
+        if child.tag in row and child.tag not in _NESTED_TARGETS:
+            row[child.tag] = child.text or ""
+        fields = NESTED_COLUMNS.get(child.tag)
+        if fields:
+            seen_fields = set()
+            for field in child:
+                if field.tag in fields and field.tag not in seen_fields:
+                    seen_fields.add(field.tag)
+                    row[fields[field.tag]] = field.text or ""
+    return row
+
+
+def iter_rows(xml_file):
+    """Stream the read_row of every WPEdit of xml_file with constant memory."""
+    for wpedit in iter_wpedits(xml_file):
+        yield read_row(wpedit)
+
+
+def parse_value(column, value):
+    """Convert the text of a field to the type of its column, None if empty."""
+    if value == "":
+        return None
+    if column in INT_COLUMNS:
+        return int(value)
+    if column in BOOL_COLUMNS:
+        return _BOOLS[value.lower()]
+    return value
+
+
+def schema(columns=COLUMNS):
+    """pyarrow schema of the given columns of the columnar output."""
+    import pyarrow as pa
+
+    def column_type(column):
+        if column in INT_COLUMNS:
+            return pa.int64()
+        if column in BOOL_COLUMNS:
+            return pa.bool_()
+        return pa.string()
+
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+
+def convert(input_xml, output_path, diffs=None, batch_size=50_000):
+    """
+    Convert a WPEditSet file into a Parquet file (if output_path ends with
+    ".parquet") or an Arrow IPC file, with the columns and types of the
+    summarize_edit_diffs CSV as read by pandas. The XML is streamed and written in
+    batches of batch_size edits, so memory use does not depend on its size.
+
+    diffs maps EditIDs (as strings) to their [added_lines, deleted_lines], e.g. the
+    Checkpoint of summarize_edit_diffs; edits missing from it get "BAD REQUEST" like
+    in the CSV. Without diffs, the added_lines and deleted_lines columns are left out,
+    to be added later with attach_diffs.
+
+    Returns the number of edits written.
+    """
+    import pyarrow as pa
+
+    columns = [col for col in COLUMNS if diffs is not None or col not in DIFF_COLUMNS]
+    out_schema = schema(columns)
+    buffers = {col: [] for col in columns}
+    count = 0
+    with _open_writer(output_path, out_schema) as writer:
+        for row in iter_rows(input_xml):
+            if diffs is not None:
+                row["added_lines"], row["deleted_lines"] = _diff(diffs, row["EditID"])
+            for col in columns:
+                try:
+                    buffers[col].append(parse_value(col, row[col]))
+                except (ValueError, KeyError):
+                    raise ValueError(
+                        f"{row['EditID']}: unexpected {col} value {row[col]!r}"
+                    ) from None
+            count += 1
+            if len(buffers["EditID"]) == batch_size:
+                writer.write_batch(pa.record_batch(buffers, schema=out_schema))
+                buffers = {col: [] for col in columns}
+        if buffers["EditID"] or count == 0:
+            writer.write_batch(pa.record_batch(buffers, schema=out_schema))
+    return count
+
+
+def attach_diffs(input_path, diffs, output_path, batch_size=50_000):
+    """
+    Copy a file written by convert without diffs to output_path, adding the
+    added_lines and deleted_lines columns from diffs (see convert) in their CSV
+    position. Returns the number of edits written.
+    """
+    import pyarrow as pa
+
+    out_schema = schema()
+    count = 0
+    with _open_writer(output_path, out_schema) as writer:
+        for batch in _iter_batches(input_path, batch_size):
+            pairs = [
+                _diff(diffs, str(edit_id))
+                for edit_id in batch.column("EditID").to_pylist()
+            ]
+            arrays = {name: batch.column(name) for name in batch.schema.names}
+            for i, col in enumerate(DIFF_COLUMNS):
+                values = [parse_value(col, pair[i]) for pair in pairs]
+                arrays[col] = pa.array(values, pa.string())
+            writer.write_batch(pa.record_batch(arrays, schema=out_schema))
+            count += batch.num_rows
+    return count
+
+
+def _diff(diffs, edit_id):
+    if edit_id in diffs:
+        return diffs[edit_id]
+    return "BAD REQUEST", "BAD REQUEST"
+
+
+def _open_writer(path, schema):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(".parquet"):
+        return pq.ParquetWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+def _iter_batches(path, batch_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(".parquet"):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def main():
+    if os.path.exists(checkpoint_file):
+        from mediawiki_client import Checkpoint
+
+        with Checkpoint(checkpoint_file) as checkpoint:
+            count = convert(input_xml, output_file, diffs=checkpoint)
+    else:
+        count = convert(input_xml, output_file)
+    print(f"Done. {count} edits saved as {output_file}.")
+
+
+if __name__ == "__main__":
+    main()
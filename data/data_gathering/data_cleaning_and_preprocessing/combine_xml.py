@@ -1,24 +1,19 @@
-import xml.etree.ElementTree as ET
+from wpedit_stream import iter_wpedits, WPEditWriter
 
 file1 = "train-edits-random.xml"
 file2 = "train-edits-reported.xml"
 output_file = "combined_edits.xml"
 
-# Parse both files
-tree1 = ET.parse(file1)
-tree2 = ET.parse(file2)
-root1 = tree1.getroot()
-root2 = tree2.getroot()
 
-# Create a new root and append all WPEdit children from both files
-combined_root = ET.Element("WPEditSet")
+def combine(input_files, output_file):
+    # Stream all WPEdit children from each file into a new WPEditSet, one at a time
+    with WPEditWriter(output_file) as writer:
+        for input_file in input_files:
+            for wpedit in iter_wpedits(input_file):
+                writer.write(wpedit)
+    return writer.count
 
-for wpedit in root1.findall("WPEdit"):
-    combined_root.append(wpedit)
 
-for wpedit in root2.findall("WPEdit"):
-    combined_root.append(wpedit)
-
-# Write out the combined XML
-ET.ElementTree(combined_root).write(output_file, encoding="utf-8", xml_declaration=True)
-print(f"Combined XML saved as {output_file}.")
+if __name__ == "__main__":
+    combine([file1, file2], output_file)
+    print(f"Combined XML saved as {output_file}.")
@@ -1,35 +1,31 @@
-import xml.etree.ElementTree as ET
+from wpedit_stream import iter_fields, iter_wpedits, WPEditWriter
 
 
 input_xml = "filtered_edits.xml"
 output_xml = "filtered_edits_no_dup.xml"
 
-tree = ET.parse(input_xml)
-root = tree.getroot()
 
-seen_ids = set()
-new_root = ET.Element("WPEditSet")
-
-for wpedit in root.findall("WPEdit"):
-    eid = wpedit.findtext("EditID")
-    if eid and eid not in seen_ids:
-        seen_ids.add(eid)
-        new_root.append(wpedit)
-
-print(f"Original edits: {len(root.findall('WPEdit'))}")
-print(f"Deduplicated edits: {len(seen_ids)}")
-
-ET.ElementTree(new_root).write(output_xml, encoding="utf-8", xml_declaration=True)
-print(f"Deduplicated XML saved as {output_xml}.")
-
-tree = ET.parse("filtered_edits_no_dup.xml")
-root = tree.getroot()
-
-
-editids = []
-for wpedit in root.findall("WPEdit"):
-    eid = wpedit.findtext("EditID")
-    if eid:
-        editids.append(eid)
-print("Total edits:", len(editids))
-print("Unique EditIDs:", len(set(editids)))
+def remove_duplicates(input_xml, output_xml):
+    """Copy input_xml to output_xml keeping the first edit of each EditID.
+    Returns the number of edits read and written."""
+    seen_ids = set()
+    total = 0
+    with WPEditWriter(output_xml) as writer:
+        for wpedit in iter_wpedits(input_xml):
+            total += 1
+            eid = wpedit.findtext("EditID")
+            if eid and eid not in seen_ids:
+                seen_ids.add(eid)
+                writer.write(wpedit)
+    return total, writer.count
+
+
+if __name__ == "__main__":
+    total, deduplicated = remove_duplicates(input_xml, output_xml)
+    print(f"Original edits: {total}")
+    print(f"Deduplicated edits: {deduplicated}")
+    print(f"Deduplicated XML saved as {output_xml}.")
+
+    editids = [eid for (eid,) in iter_fields(output_xml, "EditID") if eid]
+    print("Total edits:", len(editids))
+    print("Unique EditIDs:", len(set(editids)))
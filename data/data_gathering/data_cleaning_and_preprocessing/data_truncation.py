@@ -1,22 +1,19 @@
-import xml.etree.ElementTree as ET
-import copy
+from wpedit_stream import iter_wpedits, WPEditWriter
 
 N = 30  # Number of edits to keep
 infile = "train-edits.xml"
 outfile = "truncated_edits.xml"
 
-context = ET.iterparse(infile, events=("end",))
-root = ET.Element("WPEditSet")
-count = 0
 
-for event, elem in context:
-    if elem.tag == "WPEdit":
-        if count < N:
-            root.append(copy.deepcopy(elem))
-            count += 1
-        elem.clear()
-    if count >= N:
-        break
+def truncate(infile, outfile, n):
+    # Stop reading as soon as the first n edits are written
+    with WPEditWriter(outfile) as writer:
+        for wpedit in iter_wpedits(infile):
+            if writer.count >= n:
+                break
+            writer.write(wpedit)
+    return writer.count
 
-tree = ET.ElementTree(root)
-tree.write(outfile, encoding="utf-8", xml_declaration=True)
+
+if __name__ == "__main__":
+    truncate(infile, outfile, N)
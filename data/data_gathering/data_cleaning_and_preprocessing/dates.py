@@ -1,6 +1,7 @@
-import xml.etree.ElementTree as ET
 from datetime import datetime
 
+from wpedit_stream import iter_fields
+
 def to_datetime(ts):
     if ts and ts.isdigit():
         if len(ts) == 10:  # Unix time
@@ -10,20 +11,15 @@ def to_datetime(ts):
     return None
 
 def find_earliest_latest(infile):
-    tree = ET.parse(infile)
-    root = tree.getroot()
-    all_dates = []
-    for wpedit in root.findall("WPEdit"):
-        ts = None
-        curr_ts = wpedit.find("current/timestamp")
-        if curr_ts is not None and curr_ts.text:
-            ts = curr_ts.text.strip()
-            dt = to_datetime(ts)
+    # Only the running minimum and maximum are kept, not every date
+    earliest = latest = None
+    for (curr_ts,) in iter_fields(infile, "current/timestamp"):
+        if curr_ts:
+            dt = to_datetime(curr_ts.strip())
             if dt is not None:
-                all_dates.append(dt)
-    if all_dates:
-        earliest = min(all_dates)
-        latest = max(all_dates)
+                earliest = dt if earliest is None else min(earliest, dt)
+                latest = dt if latest is None else max(latest, dt)
+    if earliest is not None:
         print(f"Earliest edit date: {earliest.isoformat()} (UTC)")
         print(f"Latest edit date:   {latest.isoformat()} (UTC)")
     else:
@@ -1,28 +1,23 @@
-import xml.etree.ElementTree as ET
+from wpedit_stream import iter_fields, iter_wpedits, WPEditWriter
 
 file1 = "combined_edits.xml"     # File to filter (edits to keep only if NOT in file2)
 file2 = "trial-edits-0713d.xml"     # File whose edits are to be removed from file1
 output_file = "filtered_edits.xml"
 
-# 1. Build a set of EditIDs in file2
-tree2 = ET.parse(file2)
-root2 = tree2.getroot()
-editids_to_remove = set()
-for wpedit in root2.findall("WPEdit"):
-    eid = wpedit.findtext("EditID")
-    if eid:
-        editids_to_remove.add(eid.strip())
 
-# 2. Parse file1, keep only edits NOT in file2
-tree1 = ET.parse(file1)
-root1 = tree1.getroot()
-filtered_root = ET.Element("WPEditSet")
+def remove_overlaps(file1, file2, output_file):
+    # 1. Build a set of EditIDs in file2
+    editids_to_remove = {eid.strip() for (eid,) in iter_fields(file2, "EditID") if eid}
 
-for wpedit in root1.findall("WPEdit"):
-    eid = wpedit.findtext("EditID")
-    if eid and eid.strip() not in editids_to_remove:
-        filtered_root.append(wpedit)
+    # 2. Stream file1, keep only edits NOT in file2
+    with WPEditWriter(output_file) as writer:
+        for wpedit in iter_wpedits(file1):
+            eid = wpedit.findtext("EditID")
+            if eid and eid.strip() not in editids_to_remove:
+                writer.write(wpedit)
+    return writer.count
 
-# 3. Write result to output file
-ET.ElementTree(filtered_root).write(output_file, encoding="utf-8", xml_declaration=True)
-print(f"Filtered XML saved as {output_file}.")
+
+if __name__ == "__main__":
+    remove_overlaps(file1, file2, output_file)
+    print(f"Filtered XML saved as {output_file}.")
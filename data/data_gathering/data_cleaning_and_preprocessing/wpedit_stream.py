@@ -0,0 +1,62 @@
+import xml.etree.ElementTree as ET
+
+
+def iter_wpedits(xml_file):
+    """
+    Stream the WPEdit elements of a WPEditSet file with constant memory.
+
+    Each WPEdit is yielded once fully parsed, then cleared and dropped from the
+    tree, so it must not be kept after the next one is requested (use
+    copy.deepcopy for that). Works on files of any size.
+    """
+    context = ET.iterparse(xml_file, events=("start", "end"))
+    _, root = next(context)  # the WPEditSet element
+    wpedit = None
+    for event, elem in context:
+        if wpedit is not None:
+            # Yielded one event late: the tail of an element (the whitespace up to
+            # the next tag) is only parsed with the next tag, and may still be
+            # missing at its "end" event
+            yield wpedit
+            wpedit.clear()
+            root.clear()  # drop the references root keeps to the edits already seen
+            wpedit = None
+        if event == "end" and elem.tag == "WPEdit":
+            wpedit = elem
+
+
+def iter_fields(xml_file, *paths):
+    """
+    Stream a tuple of the text (or None) at each of the given paths
+    (e.g. "EditID", "current/timestamp") for every WPEdit of xml_file.
+    """
+    for wpedit in iter_wpedits(xml_file):
+        yield tuple(wpedit.findtext(path) for path in paths)
+
+
+class WPEditWriter:
+    """
+    Write WPEdit elements one at a time into a WPEditSet file, producing the same
+    XML as building the whole tree and saving it with ElementTree.write.
+
+        with WPEditWriter("out.xml") as writer:
+            for wpedit in iter_wpedits("in.xml"):
+                writer.write(wpedit)
+    """
+
+    def __init__(self, xml_file):
+        self.xml_file = xml_file
+        self.count = 0
+
+    def __enter__(self):
+        self._file = open(self.xml_file, "w", encoding="utf-8")
+        self._file.write("<?xml version='1.0' encoding='utf-8'?>\n<WPEditSet>")
+        return self
+
+    def write(self, wpedit):
+        self._file.write(ET.tostring(wpedit, encoding="unicode"))
+        self.count += 1
+
+    def __exit__(self, *exc):
+        self._file.write("</WPEditSet>")
+        self._file.close()
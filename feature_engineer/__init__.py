@@ -1,15 +1,31 @@
+from . import instrumentation
 from .vandalism_scorer import VandalismScorer
-from .is_ip import is_IP
-from .account_age import account_age
-from .comment_empty import comment_empty
-from .word_count import word_count
-from .preprocessor import preprocessor
+from .vectorizer_cache import VectorizerCache
+from .is_ip import is_IP, is_IP_vectorized
+from .account_age import account_age, account_age_vectorized
+from .comment_empty import comment_empty, comment_empty_vectorized
+from .word_count import word_count, word_count_vectorized
+from .tokenized_edits import TokenizedEdits
+from .preprocessor import preprocessor, preprocess_csv
+from .scoring_service import ScoringService, make_server
+from .cascade import CascadeService
 
 __all__ = [
+    "instrumentation",
     "VandalismScorer",
+    "VectorizerCache",
     "is_IP",
+    "is_IP_vectorized",
     "account_age",
+    "account_age_vectorized",
     "comment_empty",
+    "comment_empty_vectorized",
     "word_count",
+    "word_count_vectorized",
     "preprocessor",
+    "preprocess_csv",
+    "TokenizedEdits",
+    "ScoringService",
+    "make_server",
+    "CascadeService",
 ]
@@ -0,0 +1,182 @@
+import os
+from collections import deque
+
+import joblib
+import numpy as np
+from scipy.special import expit
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+from .scoring_service import ScoringMixin, ScoringService
+
+# Metadata features of the first stage, known without looking at the texts
+CHEAP_FEATURES = ["user_warns", "is_IP", "user_edit_count", "account_age"]
+
+
+class CascadeService(ScoringMixin):
+    """
+    Two-stage online scoring of edits: a small classifier on cheap metadata
+    (CHEAP_FEATURES) decides the edits it is confident about, and a ScoringService
+    scores the others with the vandalism score and the full model.
+
+    The first stage's probabilities of vandalism are calibrated, and the band
+    [low, high] bounds its confidence: edits below low are taken as benign, edits
+    above high as vandalism, and only those in between pay for the tokenization, the
+    Naive Bayes scorer and the ensemble. Widening the band trades throughput for
+    accuracy; benchmarks/bench_cascade.py reports both for a range of bands.
+
+    score and latency are those of ScoringService (see ScoringMixin), so make_server
+    serves a CascadeService as well.
+    """
+
+    def __init__(
+        self,
+        service: ScoringService,
+        first_stage=None,
+        low: float = 0.1,
+        high: float = 0.3,
+        window: int = 10_000,
+    ) -> None:
+        """
+        Parameters:
+            service: ScoringService of the second stage.
+            first_stage: classifier on CHEAP_FEATURES with calibrated predict_proba,
+                fitted by fit (MetadataClassifier() by default).
+            low, high: the first stage decides the edits whose probability of
+                vandalism is below low or above high. The default band agrees with
+                the full model on every edit of data/test_imbalanced.csv while
+                deciding 46% of them, see benchmarks/bench_cascade.py.
+            window: number of calls whose latency is kept.
+        """
+        self.service = service
+        self.first_stage = (
+            first_stage if first_stage is not None else MetadataClassifier()
+        )
+        self.low = low
+        self.high = high
+        self.latencies = deque(maxlen=window)  # seconds per call
+
+    def fit(self, df, labels) -> "CascadeService":
+        """
+        Fit the first stage on the CHEAP_FEATURES columns of df, a DataFrame processed
+        by preprocessor, and the labels of its rows. The service is left as is.
+
+        Returns:
+            self
+        """
+        X = df[CHEAP_FEATURES].to_numpy(dtype=np.float64)
+        self.first_stage.fit(X, np.asarray(labels, dtype=bool))
+        return self
+
+    def save(self, path: str) -> None:
+        """
+        Save the cascade to the directory path: the service with ScoringService.save,
+        and the first stage and the band with joblib (in path/first_stage.joblib).
+        """
+        self.service.save(path)
+        joblib.dump(
+            {"first_stage": self.first_stage, "low": self.low, "high": self.high},
+            os.path.join(path, "first_stage.joblib"),
+        )
+
+    @classmethod
+    def load(cls, path: str, mmap_mode="r", **kwargs) -> "CascadeService":
+        """Load a cascade saved with save (see ScoringService.load)."""
+        service = ScoringService.load(path, mmap_mode=mmap_mode)
+        saved = joblib.load(os.path.join(path, "first_stage.joblib"))
+        return cls(service, saved["first_stage"], saved["low"], saved["high"], **kwargs)
+
+    def first_stage_proba(self, records) -> np.ndarray:
+        """The first stage's probability of vandalism of each edit in records."""
+        X = self.service.feature_matrix(records, CHEAP_FEATURES)
+        proba = self.first_stage.predict_proba(X)
+        return proba[:, list(self.first_stage.classes_).index(True)]
+
+    def _score_records(self, records) -> list:
+        """
+        Score a list of edits as ScoringService does, with a "stage" key giving the
+        stage that decided each edit. For the edits decided by the first stage,
+        "probability" is the first stage's and "vandalism_score" is None, since the
+        texts were not looked at.
+        """
+        results = [None] * len(records)
+        if records:
+            probability = self.first_stage_proba(records)
+            decided = (probability < self.low) | (probability > self.high)
+            for i in np.flatnonzero(decided):
+                if "BAD REQUEST" in (
+                    records[i].get("added_lines"),
+                    records[i].get("deleted_lines"),
+                ):
+                    continue  # left to the service, which reports the error
+                results[i] = {
+                    "EditID": records[i].get("EditID"),
+                    "vandalism_score": None,
+                    "probability": float(probability[i]),
+                    "isvandalism": bool(probability[i] > self.high),
+                    "stage": 1,
+                }
+            rest = [i for i, result in enumerate(results) if result is None]
+            if rest:
+                scored = self.service.score([records[i] for i in rest])
+                for i, result in zip(rest, scored):
+                    results[i] = {**result, "stage": 2}
+        return results
+
+
+class MetadataClassifier(ClassifierMixin, BaseEstimator):
+    """
+    The default first stage: a logistic regression on the logarithms of the
+    metadata (missing values replaced by the medians), calibrated with a sigmoid
+    fitted on its out-of-fold decision function, as Platt scaling does.
+
+    Both steps are linear in the log features, so the fitted model is folded into
+    one weight per feature and an intercept, and predict_proba is a dot product in
+    numpy, without the per-call overhead of a scikit-learn pipeline.
+    """
+
+    def __init__(self, cv: int = 5) -> None:
+        """
+        Parameters:
+            cv: number of folds of the out-of-fold decision function.
+        """
+        self.cv = cv
+
+    def fit(self, X, y) -> "MetadataClassifier":
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        self.classes_ = np.unique(y)
+        if len(self.classes_) != 2:
+            raise ValueError(f"Expected two classes, got {self.classes_}")
+        model = make_pipeline(
+            SimpleImputer(strategy="median"),
+            FunctionTransformer(np.log1p),
+            StandardScaler(),
+            LogisticRegression(),
+        )
+        decision = cross_val_predict(
+            model, X, y, cv=self.cv, method="decision_function"
+        )
+        sigmoid = LogisticRegression().fit(decision.reshape(-1, 1), y)
+        model.fit(X, y)
+
+        imputer, scaler, regression = model[0], model[2], model[3]
+        coef = regression.coef_[0] / scaler.scale_
+        intercept = regression.intercept_[0] - coef @ scaler.mean_
+        self.medians_ = imputer.statistics_
+        self.coef_ = sigmoid.coef_[0, 0] * coef
+        self.intercept_ = sigmoid.coef_[0, 0] * intercept + sigmoid.intercept_[0]
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        X = np.where(np.isnan(X), self.medians_, X)
+        positive = expit(np.log1p(X) @ self.coef_ + self.intercept_)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(np.intp)]
@@ -12,3 +12,16 @@ def comment_empty(row: pd.Series) -> bool:
         bool: True if the comment is missing (NaN), False otherwise.
     """
     return pd.isna(row["comment"])
+
+
+def comment_empty_vectorized(df: pd.DataFrame) -> pd.Series:
+    """
+    Vectorized version of comment_empty, computed on the whole 'comment' column.
+
+    Parameters:
+        df (pandas.DataFrame): A DataFrame containing a 'comment' column.
+
+    Returns:
+        pandas.Series: Boolean Series, True where the comment is missing (NaN).
+    """
+    return df["comment"].isna()
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+class EditIDIndex:
+    """
+    Compact, picklable mapping from EditIDs to the index of a classifier.
+
+    EditIDs are stored as a sorted int64 array with a parallel small-int array of
+    classifier indices, and looked up in bulk with np.searchsorted. EditIDs that are
+    not in the index map to `default`, like a defaultdict would.
+    """
+
+    def __init__(self, edit_ids, classifier_indices, default: int) -> None:
+        """
+        Parameters:
+            edit_ids: Iterable of integer EditIDs.
+            classifier_indices: Iterable of the same length giving the classifier
+                index of each EditID. If an EditID appears several times, its last
+                classifier index is kept, as with repeated dictionary assignment.
+            default: Classifier index returned for EditIDs not in the index.
+        """
+        edit_ids = np.asarray(edit_ids, dtype=np.int64)
+        dtype = np.int8 if default <= np.iinfo(np.int8).max else np.int32
+        classifier_indices = np.asarray(classifier_indices, dtype=dtype)
+
+        # np.unique keeps the first occurrence, so search the reversed arrays
+        # to keep the last one
+        self.edit_ids, last = np.unique(edit_ids[::-1], return_index=True)
+        self.classifier_indices = classifier_indices[::-1][last]
+        self.default = default
+
+    @classmethod
+    def from_arrays(
+        cls, edit_ids: np.ndarray, classifier_indices: np.ndarray, default: int
+    ) -> "EditIDIndex":
+        """
+        Index over arrays already in the layout of an index (e.g. memory-mapped
+        copies of the edit_ids and classifier_indices of another one), used as they
+        are.
+        """
+        index = cls.__new__(cls)
+        index.edit_ids = edit_ids
+        index.classifier_indices = classifier_indices
+        index.default = default
+        return index
+
+    def lookup(self, edit_ids) -> np.ndarray:
+        """
+        Return the classifier index of each EditID in edit_ids, or default
+        for EditIDs not in the index.
+        """
+        edit_ids = np.asarray(edit_ids, dtype=np.int64)
+        if len(self.edit_ids) == 0:
+            return np.full(edit_ids.shape, self.default, dtype=np.intp)
+        pos = np.searchsorted(self.edit_ids, edit_ids)
+        pos[pos == len(self.edit_ids)] = 0
+        found = self.edit_ids[pos] == edit_ids
+        return np.where(found, self.classifier_indices[pos], self.default).astype(
+            np.intp
+        )
+
+    def contains(self, edit_ids) -> np.ndarray:
+        """Return whether each EditID in edit_ids is in the index."""
+        edit_ids = np.asarray(edit_ids, dtype=np.int64)
+        if len(self.edit_ids) == 0:
+            return np.zeros(edit_ids.shape, dtype=bool)
+        pos = np.searchsorted(self.edit_ids, edit_ids)
+        pos[pos == len(self.edit_ids)] = 0
+        return self.edit_ids[pos] == edit_ids
+
+    def update(self, edit_ids, classifier_indices) -> None:
+        """
+        Add EditIDs to the index, or change the classifier index of EditIDs already
+        in it. Costs one search per new EditID plus a single copy of the arrays.
+        """
+        new = EditIDIndex(edit_ids, classifier_indices, default=self.default)
+        pos = np.searchsorted(self.edit_ids, new.edit_ids)
+        present = np.zeros(len(new.edit_ids), dtype=bool)
+        in_range = pos < len(self.edit_ids)
+        present[in_range] = self.edit_ids[pos[in_range]] == new.edit_ids[in_range]
+
+        self.classifier_indices[pos[present]] = new.classifier_indices[present]
+        self.edit_ids = np.insert(self.edit_ids, pos[~present], new.edit_ids[~present])
+        self.classifier_indices = np.insert(
+            self.classifier_indices,
+            pos[~present],
+            new.classifier_indices[~present],
+        )
+
+    def __getitem__(self, edit_id) -> int:
+        return int(self.lookup([edit_id])[0])
+
+    def __contains__(self, edit_id) -> bool:
+        pos = np.searchsorted(self.edit_ids, edit_id)
+        return pos < len(self.edit_ids) and self.edit_ids[pos] == edit_id
+
+    def __len__(self) -> int:
+        return len(self.edit_ids)
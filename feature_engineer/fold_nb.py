@@ -0,0 +1,167 @@
+import numpy as np
+import scipy.sparse
+from joblib import Parallel, delayed
+from scipy.special import logsumexp
+from sklearn.naive_bayes import MultinomialNB
+
+from .instrumentation import stage
+
+
+class FoldNB:
+    """
+    The n_splits + 1 multinomial Naive Bayes classifiers of VandalismScorer, fitted
+    together from per-fold class counts.
+
+    Classifier i < n_splits is trained on every row outside fold i, and classifier
+    n_splits on all rows. Instead of summing the counts of almost the same rows
+    n_splits + 1 times, the feature counts of each (fold, class) pair are computed in
+    one sparse product, and the counts of classifier i are the total counts minus
+    those of fold i. The log probabilities are then derived as MultinomialNB does,
+    so every classifier is equal to a MultinomialNB fitted on its rows.
+
+    The log probabilities of all classifiers are stored side by side in weights_, of
+    shape (n_features, n_classifiers * n_classes), so that the joint log likelihoods
+    of rows scored by different classifiers come from a single sparse product.
+    """
+
+    def __init__(
+        self, n_splits: int, alpha: float = 1.0, fit_prior: bool = False, n_jobs=None
+    ) -> None:
+        """
+        Parameters:
+            n_splits: number of folds.
+            alpha, fit_prior: as in MultinomialNB.
+            n_jobs: number of threads deriving the classifiers' log probabilities
+                (None means 1, -1 means all processors).
+        """
+        self.n_splits = n_splits
+        self.alpha = alpha
+        self.fit_prior = fit_prior
+        self.n_jobs = n_jobs
+
+    @property
+    def n_classifiers(self) -> int:
+        return self.n_splits + 1
+
+    def fit(self, X, labels, folds) -> "FoldNB":
+        """
+        Parameters:
+            X: sparse matrix of feature counts, shape (n_samples, n_features).
+            labels: class of each row.
+            folds: integer array giving the fold (0 to n_splits - 1) of each row.
+
+        Returns:
+            self
+        """
+        with stage("fold training", X.shape[0]):
+            self.classes_, y = np.unique(np.asarray(labels), return_inverse=True)
+            n_classes, n_features = len(self.classes_), X.shape[1]
+            fold_counts, fold_class_counts = self._fold_counts(X, y, folds)
+
+            shape = (self.n_classifiers, n_classes)
+            self.feature_count_ = np.empty(shape + (n_features,), dtype=np.float64)
+            self.class_count_ = np.empty(shape, dtype=np.float64)
+            self.feature_count_[-1] = fold_counts.sum(axis=0)
+            self.class_count_[-1] = fold_class_counts.sum(axis=0)
+            self.feature_count_[:-1] = self.feature_count_[-1] - fold_counts
+            self.class_count_[:-1] = self.class_count_[-1] - fold_class_counts
+
+            self.weights_ = np.empty((n_features, self.n_classifiers * n_classes))
+            self.class_log_prior_ = np.empty(shape, dtype=np.float64)
+            self._update_log_probs()
+        return self
+
+    def partial_fit(self, X, labels, folds) -> "FoldNB":
+        """
+        Add rows to every classifier but the one of their fold, and to the last one,
+        as MultinomialNB.partial_fit on the rows of each classifier would.
+        Parameters as in fit. The labels must be classes seen by fit.
+        """
+        labels = np.asarray(labels)
+        y = np.searchsorted(self.classes_, labels)
+        y[y == len(self.classes_)] = 0
+        if not np.array_equal(self.classes_[y], labels):
+            raise ValueError(f"Labels must be among the classes {self.classes_}")
+        with stage("fold training", X.shape[0]):
+            fold_counts, fold_class_counts = self._fold_counts(X, y, folds)
+
+            self.feature_count_[:-1] += fold_counts.sum(axis=0) - fold_counts
+            self.class_count_[:-1] += fold_class_counts.sum(axis=0) - fold_class_counts
+            self.feature_count_[-1] += fold_counts.sum(axis=0)
+            self.class_count_[-1] += fold_class_counts.sum(axis=0)
+            self._update_log_probs()
+        return self
+
+    def predict_proba(self, X, classifier_index) -> np.ndarray:
+        """
+        Return the class probabilities of each row of X given by the classifier of
+        index classifier_index[row], shape (n_samples, n_classes). Equal to the
+        predict_proba of the corresponding MultinomialNB on each row.
+        """
+        n_classes = len(self.classes_)
+        rows = np.arange(X.shape[0])
+        # Joint log likelihoods of every row under every classifier, of which each
+        # row keeps those of its own classifier
+        jll = (X @ self.weights_).reshape(X.shape[0], self.n_classifiers, n_classes)
+        jll = jll[rows, classifier_index] + self.class_log_prior_[classifier_index]
+        log_prob_x = logsumexp(jll, axis=1)
+        return np.exp(jll - np.atleast_2d(log_prob_x).T)
+
+    def classifier(self, i: int) -> MultinomialNB:
+        """
+        Classifier i as a fitted MultinomialNB, whose arrays are views of this
+        object's: they follow partial_fit.
+        """
+        n_classes = len(self.classes_)
+        clf = MultinomialNB(alpha=self.alpha, fit_prior=self.fit_prior)
+        clf.classes_ = self.classes_
+        clf.n_features_in_ = self.weights_.shape[0]
+        if hasattr(self, "feature_count_"):  # not kept by VandalismScorer.save
+            clf.feature_count_ = self.feature_count_[i]
+            clf.class_count_ = self.class_count_[i]
+        columns = slice(i * n_classes, (i + 1) * n_classes)
+        clf.feature_log_prob_ = self.weights_[:, columns].T
+        clf.class_log_prior_ = self.class_log_prior_[i]
+        return clf
+
+    def _fold_counts(self, X, y, folds):
+        """
+        Feature counts, shape (n_splits, n_classes, n_features), and row counts,
+        shape (n_splits, n_classes), of the rows of each fold and class.
+        """
+        n_classes = len(self.classes_)
+        n_groups = self.n_splits * n_classes
+        groups = np.asarray(folds) * n_classes + y
+        indicator = scipy.sparse.csr_matrix(
+            (np.ones(len(groups)), (groups, np.arange(len(groups)))),
+            shape=(n_groups, X.shape[0]),
+        )
+        fold_counts = (indicator @ X).toarray().astype(np.float64)
+        fold_class_counts = np.bincount(groups, minlength=n_groups)
+        return (
+            fold_counts.reshape(self.n_splits, n_classes, X.shape[1]),
+            fold_class_counts.reshape(self.n_splits, n_classes).astype(np.float64),
+        )
+
+    def _update_log_probs(self) -> None:
+        # The classifiers are independent; numpy releases the GIL, so threads help
+        Parallel(n_jobs=self.n_jobs, prefer="threads")(
+            delayed(self._update_classifier)(i) for i in range(self.n_classifiers)
+        )
+
+    def _update_classifier(self, i: int) -> None:
+        """Log probabilities of classifier i from its counts, as in MultinomialNB."""
+        n_classes = len(self.classes_)
+        smoothed_fc = self.feature_count_[i] + self.alpha
+        smoothed_cc = smoothed_fc.sum(axis=1)
+        feature_log_prob = np.log(smoothed_fc) - np.log(smoothed_cc.reshape(-1, 1))
+        columns = slice(i * n_classes, (i + 1) * n_classes)
+        self.weights_[:, columns] = feature_log_prob.T
+
+        if self.fit_prior:
+            with np.errstate(divide="ignore"):
+                log_class_count = np.log(self.class_count_[i])
+            prior = log_class_count - np.log(self.class_count_[i].sum())
+        else:
+            prior = np.full(n_classes, -np.log(n_classes))
+        self.class_log_prior_[i] = prior
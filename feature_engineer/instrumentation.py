@@ -0,0 +1,222 @@
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Sink receiving the records of the stages, None while instrumentation is disabled
+_sink = None
+# Whether the peak allocation of the stages is traced, and whether enable started
+# tracemalloc (and disable should stop it)
+_trace_memory = False
+_started_tracing = False
+# Stages entered and not yet exited, per thread
+_local = threading.local()
+# Returned by stage while disabled: entering and exiting it does nothing
+_DISABLED = nullcontext()
+
+
+class MemorySink:
+    """Keeps the records of the stages in a list, records."""
+
+    def __init__(self) -> None:
+        self.records = []
+
+    def emit(self, record: dict) -> None:
+        self.records.append(record)
+
+    def summary(self) -> dict:
+        """
+        Totals per stage name, in order of first appearance: number of calls, seconds,
+        rows, rows per second, and the largest peak allocation in bytes (None if
+        memory was not traced).
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(
+                record["stage"],
+                {"calls": 0, "seconds": 0.0, "rows": 0, "peak_bytes": None},
+            )
+            total["calls"] += 1
+            total["seconds"] += record["seconds"]
+            total["rows"] += record["rows"] or 0
+            if record["peak_bytes"] is not None:
+                total["peak_bytes"] = max(
+                    total["peak_bytes"] or 0, record["peak_bytes"]
+                )
+        for total in totals.values():
+            total["rows_per_second"] = _rate(total["rows"], total["seconds"])
+        return totals
+
+
+class JsonLinesSink:
+    """Appends each record as a line of JSON to the file path."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record: dict) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+class LoggingSink:
+    """
+    Logs each record with logger (the "feature_engineer" logger by default) at
+    level, the record itself being passed as extra={"stage_record": record}.
+    """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("feature_engineer")
+        self.level = level
+
+    def emit(self, record: dict) -> None:
+        message = "%s: %.6f s, %s rows, %s rows/s, peak %s bytes"
+        self.logger.log(
+            self.level,
+            message,
+            record["stage"],
+            record["seconds"],
+            record["rows"],
+            record["rows_per_second"],
+            record["peak_bytes"],
+            extra={"stage_record": record},
+        )
+
+
+def enable(sink, memory: bool = False) -> None:
+    """
+    Send the records of the stages of feature_engineer to sink, an object with an
+    emit(record) method such as MemorySink, JsonLinesSink or LoggingSink.
+
+    Each record is a dictionary with the stage name, the name of the stage it runs
+    in (parent, None at the top level), its wall time in seconds, its number of rows
+    and rows per second (None for stages without rows), and its peak allocation
+    above the memory allocated when it started, in bytes (peak_bytes).
+
+    The peak allocation is only traced if memory is True: tracing goes through
+    tracemalloc, which slows down every allocation, so it is meant for profiling
+    runs, and it counts the allocations of all threads. peak_bytes is None otherwise.
+    """
+    global _sink, _trace_memory, _started_tracing
+    disable()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+    _trace_memory = memory
+    _sink = sink
+
+
+def disable() -> None:
+    """Stop sending records, and stop tracemalloc if enable started it."""
+    global _sink, _trace_memory, _started_tracing
+    _sink = None
+    _trace_memory = False
+    if _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+
+@contextmanager
+def instrumented(sink, memory: bool = False):
+    """Context manager enabling instrumentation (see enable) for its block."""
+    enable(sink, memory=memory)
+    try:
+        yield sink
+    finally:
+        disable()
+
+
+def stage(name: str, rows: int = None):
+    """
+    Context manager timing the stage name of rows rows, whose record is sent to the
+    sink on exit. While instrumentation is disabled it returns a shared no-op
+    context manager, so that a disabled stage costs a function call.
+    """
+    if _sink is None:
+        return _DISABLED
+    return _Stage(name, rows)
+
+
+def staged(name: str):
+    """
+    Decorator making a method a stage (see stage) whose rows are those of its first
+    argument after self, like VandalismScorer.fit(X, labels). While instrumentation
+    is disabled, the method is called directly.
+    """
+
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, X, *args, **kwargs):
+            if _sink is None:
+                return method(self, X, *args, **kwargs)
+            with _Stage(name, len(X)):
+                return method(self, X, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class _Stage:
+    __slots__ = ("name", "rows", "parent", "start", "start_memory", "peak")
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        if _trace_memory:
+            # The peak of tracemalloc is reset for this stage: that of the parent
+            # so far is kept in parent.peak
+            current, peak = tracemalloc.get_traced_memory()
+            _raise_peak(self.parent, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = self.peak = current
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        _local.stack.pop()
+        peak_bytes = None
+        if _trace_memory and hasattr(self, "peak"):
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            _raise_peak(self.parent, self.peak)
+            tracemalloc.reset_peak()
+            peak_bytes = self.peak - self.start_memory
+        sink = _sink
+        if sink is not None:
+            sink.emit(
+                {
+                    "stage": self.name,
+                    "parent": None if self.parent is None else self.parent.name,
+                    "seconds": seconds,
+                    "rows": self.rows,
+                    "rows_per_second": _rate(self.rows, seconds),
+                    "peak_bytes": peak_bytes,
+                }
+            )
+        return False
+
+
+def _raise_peak(stage, peak):
+    """Raise the peak memory of stage to peak, if stage traces memory."""
+    if stage is not None and hasattr(stage, "peak"):
+        stage.peak = max(stage.peak, peak)
+
+
+def _rate(rows, seconds):
+    """Rows per second, None without rows or time."""
+    if not rows or seconds <= 0:
+        return None
+    return rows / seconds
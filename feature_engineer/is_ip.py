@@ -1,6 +1,20 @@
 import pandas as pd  # Pandas library for data manipulation
 import ipaddress  # Built-in module for working with IP addresses
 
+# An IPv4 address as accepted by ipaddress: four decimal octets in 0-255,
+# without leading zeros
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+_IPV4_PATTERN = rf"{_OCTET}(?:\.{_OCTET}){{3}}"
+
+
+def _is_ip_address(user) -> bool:
+    """Return True if user parses as an IPv4 or IPv6 address."""
+    try:
+        ipaddress.ip_address(user)
+        return True
+    except ValueError:
+        return False
+
 
 def is_IP(row: pd.Series) -> bool:
     """
@@ -17,9 +31,31 @@ def is_IP(row: pd.Series) -> bool:
         This function uses the ipaddress module to check if the 'user' value
         is a valid IP address. If parsing fails, the value is assumed to be a username.
     """
-    user = row["user"]
-    try:
-        ipaddress.ip_address(user)
-        return True
-    except ValueError:
-        return False
+    return _is_ip_address(row["user"])
+
+
+def is_IP_vectorized(df: pd.DataFrame) -> pd.Series:
+    """
+    Vectorized version of is_IP, computed on the whole 'user' column.
+
+    Parameters:
+        df (pandas.DataFrame): A DataFrame containing a 'user' column.
+
+    Returns:
+        pandas.Series: Boolean Series, True where 'user' is a valid IPv4 or IPv6
+        address.
+
+    Notes:
+        IPv4 addresses are matched with a regular expression. IPv6 addresses
+        (the only other values that can contain ':') are rare enough to be checked
+        with the ipaddress module, once per distinct value.
+    """
+    user = df["user"].astype(object).where(df["user"].notna(), "").astype(str)
+    ip = user.str.fullmatch(_IPV4_PATTERN)
+
+    maybe_ipv6 = user.str.contains(":", regex=False)
+    if maybe_ipv6.any():
+        candidates = user[maybe_ipv6]
+        ipv6 = {value: _is_ip_address(value) for value in candidates.unique()}
+        ip[maybe_ipv6] = candidates.map(ipv6)
+    return ip.astype(bool)
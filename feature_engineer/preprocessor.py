@@ -1,19 +1,36 @@
 import pandas as pd
 
-from .account_age import account_age
-from .comment_empty import comment_empty
-from .is_ip import is_IP
-from .word_count import word_count
+from .account_age import account_age, account_age_vectorized
+from .comment_empty import comment_empty, comment_empty_vectorized
+from .instrumentation import stage
+from .is_ip import is_IP, is_IP_vectorized
+from .tokenized_edits import TokenizedEdits
+from .word_count import word_count, word_count_vectorized
 
 
-def preprocessor(df: pd.DataFrame) -> None:
+def preprocessor(
+    df: pd.DataFrame, vectorized: bool = True, tokens: TokenizedEdits = None
+) -> None:
     """
     Preprocess the DataFrame by applying various feature engineering techniques.
     Modifies the DataFrame in place.
 
     Args:
         df (pd.DataFrame): The input DataFrame to be processed.
+        vectorized (bool): If True (default), compute the features with whole-column
+            operations. If False, apply the row-level reference functions to each row.
+            Both modes produce the same columns.
+        tokens (TokenizedEdits): Optional tokens of the edits of df (or of more
+            edits), selected by EditID. The word counts are then taken from them
+            instead of tokenizing the texts, and the same tokens can be passed on to
+            VandalismScorer.fit and transform. Only used in vectorized mode: a
+            ValueError is raised if tokens are given with vectorized=False.
     """
+    if tokens is not None and not vectorized:
+        raise ValueError(
+            "tokens are only used in vectorized mode, the row-level functions "
+            "tokenize each row themselves"
+        )
 
     df.drop(
         df[
@@ -26,9 +43,89 @@ def preprocessor(df: pd.DataFrame) -> None:
     # After dropping rows, reset index so that the indices are consecutive integers from 0 to df.shape[0]-1
     df.reset_index(drop=True, inplace=True)
 
-    df["comment_empty"] = df.apply(comment_empty, axis=1)
-    df["account_age"] = df.apply(account_age, axis=1)
-    df["is_IP"] = df.apply(is_IP, axis=1)
-    df["word_count_added"], df["word_count_deleted"] = zip(
-        *df.apply(word_count, axis=1)
-    )
+    # Each feature is an instrumentation stage, see feature_engineer.instrumentation
+    rows = len(df)
+    if vectorized:
+        with stage("preprocessor.comment_empty", rows):
+            df["comment_empty"] = comment_empty_vectorized(df)
+        with stage("preprocessor.account_age", rows):
+            df["account_age"] = account_age_vectorized(df)
+        with stage("preprocessor.is_IP", rows):
+            df["is_IP"] = is_IP_vectorized(df)
+        with stage("preprocessor.word_count", rows):
+            if tokens is None:
+                word_counts = word_count_vectorized(df)
+            else:
+                word_counts = tokens.select(df["EditID"]).word_counts()
+            df["word_count_added"], df["word_count_deleted"] = word_counts
+    else:
+        with stage("preprocessor.comment_empty", rows):
+            df["comment_empty"] = df.apply(comment_empty, axis=1)
+        with stage("preprocessor.account_age", rows):
+            df["account_age"] = df.apply(account_age, axis=1)
+        with stage("preprocessor.is_IP", rows):
+            df["is_IP"] = df.apply(is_IP, axis=1)
+        with stage("preprocessor.word_count", rows):
+            df["word_count_added"], df["word_count_deleted"] = zip(
+                *df.apply(word_count, axis=1)
+            )
+
+
+def preprocess_csv(
+    input_csv: str,
+    output_path: str,
+    chunksize: int = 100_000,
+    vectorized: bool = True,
+    **read_csv_kwargs,
+) -> int:
+    """
+    Streaming version of preprocessor for CSV files too large to load at once.
+    Reads input_csv in chunks of chunksize rows, applies preprocessor to each chunk
+    and appends it to output_path, so that peak memory depends on chunksize
+    and not on the size of the file.
+
+    Args:
+        input_csv (str): Path of the CSV file of edits to be processed.
+        output_path (str): Path of the output file. Written as Parquet if it ends
+            with ".parquet" (requires pyarrow), as CSV otherwise.
+        chunksize (int): Number of rows read and processed at a time.
+        vectorized (bool): Passed on to preprocessor.
+        **read_csv_kwargs: Extra keyword arguments passed on to pandas.read_csv,
+            e.g. usecols or dtype.
+
+    Returns:
+        int: The number of rows written, after dropping "BAD REQUEST" rows.
+
+    Notes:
+        Column types are inferred separately for each chunk. The Parquet schema is
+        taken from the first chunk and the following chunks are cast to it; pass
+        dtype to fix the types of columns whose inferred type changes between chunks.
+    """
+    to_parquet = output_path.endswith(".parquet")
+    if to_parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    writer = None
+    n_rows = 0
+    try:
+        for i, chunk in enumerate(
+            pd.read_csv(input_csv, chunksize=chunksize, **read_csv_kwargs)
+        ):
+            preprocessor(chunk, vectorized=vectorized)
+            n_rows += len(chunk)
+
+            if to_parquet:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(
+                    output_path, mode="w" if i == 0 else "a", header=i == 0, index=False
+                )
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return n_rows
@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+from sklearn.utils import murmurhash3_32
+
+# Version of the layout written by save_arrays, checked by load_arrays
+FORMAT_VERSION = 1
+
+
+class MappedVocabulary(Mapping):
+    """
+    Read-only mapping from token to column, stored as flat arrays that can be
+    memory-mapped instead of a dictionary that every process builds for itself.
+
+    The UTF-8 bytes of the tokens are concatenated in column order (token_bytes,
+    with token_offsets). Tokens are found through the sorted murmurhash3 values of
+    all tokens (token_hashes, with the column of each in token_columns): a binary
+    search for the hash, then a comparison of the bytes of the few tokens sharing it.
+    """
+
+    def __init__(self, token_hashes, token_columns, token_offsets, token_bytes):
+        self.token_hashes = token_hashes
+        self.token_columns = token_columns
+        self.token_offsets = token_offsets
+        self.token_bytes = token_bytes
+
+    @classmethod
+    def from_dict(cls, vocabulary: dict) -> "MappedVocabulary":
+        """Mapping with the same tokens and columns as vocabulary."""
+        tokens = [None] * len(vocabulary)
+        for token, column in vocabulary.items():
+            tokens[column] = token.encode("utf-8")
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        token_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        token_bytes = np.frombuffer(b"".join(tokens), dtype=np.uint8)
+        hashes = np.array([_hash(token) for token in tokens], dtype=np.uint32)
+        token_columns = np.argsort(hashes, kind="stable").astype(np.int32)
+        return cls(hashes[token_columns], token_columns, token_offsets, token_bytes)
+
+    def arrays(self) -> dict:
+        """The arrays of the mapping, by name, as taken by the constructor."""
+        return {
+            "token_hashes": self.token_hashes,
+            "token_columns": self.token_columns,
+            "token_offsets": self.token_offsets,
+            "token_bytes": self.token_bytes,
+        }
+
+    def lookup(self, tokens) -> np.ndarray:
+        """Return the column of each token, or -1 for tokens not in the mapping."""
+        encoded = [token.encode("utf-8") for token in tokens]
+        hashes = np.array([_hash(token) for token in encoded], dtype=np.uint32)
+        first = np.searchsorted(self.token_hashes, hashes, side="left")
+        last = np.searchsorted(self.token_hashes, hashes, side="right")
+        columns = np.full(len(encoded), -1, dtype=np.intp)
+        for k in np.flatnonzero(last > first):
+            for position in range(first[k], last[k]):
+                column = self.token_columns[position]
+                if self._token_bytes(column) == encoded[k]:
+                    columns[k] = column
+                    break
+        return columns
+
+    def __getitem__(self, token) -> int:
+        column = self.lookup([token])[0]
+        if column < 0:
+            raise KeyError(token)
+        return int(column)
+
+    def __len__(self) -> int:
+        return len(self.token_offsets) - 1
+
+    def __iter__(self):
+        for column in range(len(self)):
+            yield self._token_bytes(column).decode("utf-8")
+
+    def _token_bytes(self, column) -> bytes:
+        start, end = self.token_offsets[column], self.token_offsets[column + 1]
+        return self.token_bytes[start:end].tobytes()
+
+
+def save_arrays(path: str, meta: dict, arrays: dict) -> None:
+    """
+    Write meta as meta.json and every array as <name>.npy in the directory path,
+    replacing an artifact saved there before. The directory is written under a
+    temporary name first, so that readers never see half an artifact.
+
+    Raises FileExistsError if path exists and is not an artifact (a directory
+    with a meta.json), so that no other file or directory is ever deleted.
+    """
+    if os.path.lexists(path) and not _is_artifact(path):
+        raise FileExistsError(f"{path} exists and is not a saved artifact")
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    old = None
+    try:
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"format_version": FORMAT_VERSION, **meta}, f, indent=2)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+        if os.path.exists(path):
+            # The previous artifact is moved aside, and only deleted once the new
+            # one is in place
+            old = tempfile.mkdtemp(dir=parent, prefix=".old-")
+            os.replace(path, os.path.join(old, "artifact"))
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            if old is not None:
+                os.replace(os.path.join(old, "artifact"), path)
+                old = None
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_arrays(path: str, mmap_mode="r") -> tuple[dict, dict]:
+    """
+    Read the meta dictionary and the arrays written by save_arrays. With mmap_mode
+    "r" (the default) the arrays are read-only memory maps, so processes loading
+    the same artifact share one copy of it in the page cache.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {meta.get('format_version')} in {path}"
+        )
+    arrays = {
+        name[: -len(".npy")]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+        for name in os.listdir(path)
+        if name.endswith(".npy")
+    }
+    return meta, arrays
+
+
+def _is_artifact(path) -> bool:
+    """Whether path is a directory written by save_arrays."""
+    return (
+        os.path.isdir(path)
+        and not os.path.islink(path)
+        and os.path.isfile(os.path.join(path, "meta.json"))
+    )
+
+
+def _hash(token) -> int:
+    """Unsigned 32-bit murmurhash3 of a token (str or its UTF-8 bytes)."""
+    return murmurhash3_32(token, seed=0, positive=True)
@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .account_age import account_age
+from .comment_empty import comment_empty
+from .instrumentation import stage
+from .is_ip import is_IP
+from .tokenized_edits import TokenizedEdits
+from .vandalism_scorer import VandalismScorer
+
+# Features of the final model of models/final_votingmethod.ipynb, in order
+FEATURES = [
+    "user_edit_count",
+    "user_distinct_pages",
+    "user_warns",
+    "num_edits_5d_before",
+    "num_recent_edits",
+    "num_recent_reversions",
+    "is_person",
+    "current_minor",
+    "account_age",
+    "comment_empty",
+    "is_IP",
+    "word_count_added",
+    "word_count_deleted",
+    "vandalism_score",
+]
+
+# Features computed from the texts of the edits
+TEXT_FEATURES = {"word_count_added", "word_count_deleted", "vandalism_score"}
+
+# Fields of an edit record read by the service, besides the features above
+RECORD_FIELDS = [
+    "EditID",
+    "comment",
+    "user",
+    "user_reg_time",
+    "current_timestamp",
+    "added_lines",
+    "deleted_lines",
+]
+
+
+class ScoringMixin:
+    """
+    Calling convention of the scoring services: score takes one edit or a list of
+    edits and times the call, latency reports the latency of the last calls.
+    Classes using it keep the seconds of the last calls in a deque, latencies, and
+    score a list of edit dictionaries with _score_records.
+    """
+
+    def score(self, records):
+        """
+        Score one edit (a dictionary) or a list of edits, and return a dictionary or
+        a list of dictionaries (see _score_records). Raises a ValueError, naming the
+        edit and the field, for a field that cannot be read, e.g. a user_reg_time
+        that is not a timestamp.
+        """
+        start = time.perf_counter()
+        single = isinstance(records, dict)
+        records = [records] if single else list(records)
+        if not all(isinstance(record, dict) for record in records):
+            raise ValueError("Edits must be dictionaries")
+        results = self._score_records(records)
+        self.latencies.append(time.perf_counter() - start)
+        return results[0] if single else results
+
+    def latency(self) -> dict:
+        """Number of calls kept, and median and 99th percentile latency in ms."""
+        if not self.latencies:
+            return {"calls": 0, "p50_ms": None, "p99_ms": None}
+        p50, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 99])
+        return {"calls": len(self.latencies), "p50_ms": p50, "p99_ms": p99}
+
+
+class ScoringService(ScoringMixin):
+    """
+    Online scoring of edits with a fitted VandalismScorer and a classifier trained on
+    its output, such as the VotingClassifier of models/final_votingmethod.ipynb.
+
+    Edits are plain dictionaries with the fields of the enriched csv rows (as read by
+    pandas: numbers, booleans, and None or NaN for missing values, or the strings of
+    the XML), scored one at a time or in micro-batches. They are not raw WPEdit
+    records: those have neither the added and deleted lines (fetched from the
+    MediaWiki API by summarize_edit_diffs) nor num_edits_5d_before and is_person
+    (fetched by enrich_edits), which the model needs, and fetching them on each call
+    would put API round trips in the latency of the service, so edits are scored
+    once enrich_edits has added them to their WPEdit fields.
+
+    The features of preprocessor are computed with the row-level functions, the word
+    counts and the vandalism score from a single tokenization of the texts
+    (TokenizedEdits, VandalismScorer.score_tokens), so no DataFrame is built except
+    the one the classifier may need for its feature names. The latency of the last
+    calls is kept, see latency.
+    """
+
+    def __init__(self, scorer, model, features=None, window: int = 10_000) -> None:
+        """
+        Parameters:
+            scorer: fitted VandalismScorer.
+            model: fitted classifier taking the features in the order of features.
+            features: names of the model's features, FEATURES by default.
+            window: number of calls whose latency is kept.
+        """
+        self.scorer = scorer
+        self.model = model
+        self.features = list(features or FEATURES)
+        self.latencies = deque(maxlen=window)  # seconds per call
+        self._computed = {
+            "account_age": _account_age,
+            "comment_empty": comment_empty,
+            "is_IP": is_IP,
+        }
+
+    @classmethod
+    def from_pipeline(cls, pipeline, **kwargs) -> "ScoringService":
+        """
+        Build the service from a fitted Pipeline of a VandalismScorer ("scorer"), a
+        feature selector with a features attribute ("select") and a classifier
+        ("model"), as trained in models/final_votingmethod.ipynb.
+        """
+        steps = pipeline.named_steps
+        return cls(steps["scorer"], steps["model"], steps["select"].features, **kwargs)
+
+    def save(self, path: str) -> None:
+        """
+        Save the service to the directory path: the scorer with VandalismScorer.save
+        (in path/scorer), and the model and the features with joblib (in
+        path/model.joblib).
+        """
+        os.makedirs(path, exist_ok=True)
+        self.scorer.save(os.path.join(path, "scorer"))
+        joblib.dump(
+            {"model": self.model, "features": self.features},
+            os.path.join(path, "model.joblib"),
+        )
+
+    @classmethod
+    def load(cls, path: str, mmap_mode="r", **kwargs) -> "ScoringService":
+        """
+        Load a service saved with save, once, before scoring. The scorer's arrays are
+        memory-mapped with mmap_mode (see VandalismScorer.load), so that the workers
+        of a scoring server share them.
+        """
+        scorer = VandalismScorer.load(os.path.join(path, "scorer"), mmap_mode=mmap_mode)
+        saved = joblib.load(os.path.join(path, "model.joblib"))
+        return cls(scorer, saved["model"], saved["features"], **kwargs)
+
+    def feature_matrix(self, records, features=None) -> np.ndarray:
+        """
+        Return the float array of shape (len(records), len(features)) of the edits in
+        records, with the values preprocessor and VandalismScorer.transform give them.
+        features defaults to the model's; the texts are only tokenized if a word
+        count or the vandalism score is among them.
+        """
+        features = self.features if features is None else features
+        rows = [
+            {field: record.get(field) for field in RECORD_FIELDS} for record in records
+        ]
+        # The texts are tokenized once, for the word counts and the vandalism score
+        if TEXT_FEATURES.intersection(features):
+            tokens = TokenizedEdits(
+                [row["added_lines"] for row in rows],
+                [row["deleted_lines"] for row in rows],
+                [_read(int, row["EditID"], row, "EditID") for row in rows],
+            )
+        X = np.empty((len(records), len(features)), dtype=np.float64)
+        for j, name in enumerate(features):
+            if name == "vandalism_score":
+                X[:, j] = self.scorer.score_tokens(tokens)
+            elif name == "word_count_added":
+                X[:, j] = tokens.word_count_added
+            elif name == "word_count_deleted":
+                X[:, j] = tokens.word_count_deleted
+            elif name in self._computed:
+                X[:, j] = [_read(self._computed[name], row, row, name) for row in rows]
+            else:
+                X[:, j] = [
+                    _read(_number, record.get(name), record, name) for record in records
+                ]
+        return X
+
+    def _score_records(self, records) -> list:
+        """
+        Score a list of edits, returning for each a dictionary with the EditID, the
+        vandalism_score (None if the model does not use it), the model's probability
+        of vandalism (None if the model only votes) and its prediction. Edits whose
+        lines are "BAD REQUEST" are not scored and get an error instead.
+        """
+        results = [{"EditID": record.get("EditID")} for record in records]
+        valid = [
+            i
+            for i, record in enumerate(records)
+            if "BAD REQUEST"
+            not in (record.get("added_lines"), record.get("deleted_lines"))
+        ]
+        for i in sorted(set(range(len(records))) - set(valid)):
+            results[i]["error"] = "BAD REQUEST"
+
+        if valid:
+            X = self.feature_matrix([records[i] for i in valid])
+            if hasattr(self.model, "feature_names_in_"):
+                X_model = pd.DataFrame(X, columns=self.features)
+            else:
+                X_model = X
+            with stage("service.model", len(valid)):
+                if hasattr(self.model, "predict_proba"):
+                    proba = self.model.predict_proba(X_model)
+                    classes = self.model.classes_
+                    probability = proba[:, list(classes).index(True)]
+                    prediction = classes[proba.argmax(axis=1)]
+                else:
+                    probability = [None] * len(valid)
+                    prediction = self.model.predict(X_model)
+            if "vandalism_score" in self.features:
+                scores = X[:, self.features.index("vandalism_score")]
+            else:
+                scores = [None] * len(valid)
+            for i, s, p, y in zip(valid, scores, probability, prediction):
+                results[i]["vandalism_score"] = None if s is None else float(s)
+                results[i]["probability"] = None if p is None else float(p)
+                results[i]["isvandalism"] = bool(y)
+        return results
+
+
+def make_server(service: ScoringMixin, host: str = "127.0.0.1", port: int = 8000):
+    """
+    Return an HTTP server around service: POST /score with a JSON edit or list of
+    edits returns the JSON results of service.score (or an error with status 400 if
+    the body or an edit cannot be read), GET /latency returns service.latency().
+    Start it with serve_forever().
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/score":
+                return self._reply(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                records = json.loads(self.rfile.read(length))
+                if not isinstance(records, (dict, list)):
+                    raise ValueError("Expected an edit or a list of edits")
+                results = service.score(records)
+            except ValueError as e:
+                return self._reply(400, {"error": str(e)})
+            self._reply(200, results)
+
+        def do_GET(self):
+            if self.path != "/latency":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, service.latency())
+
+        def _reply(self, status, response):
+            body = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def _account_age(row) -> int:
+    """
+    account_age, with a missing registration time counting as malformed (1 day), and
+    a ValueError naming the timestamp it cannot read.
+    """
+    value = row["user_reg_time"]
+    if value is None or value != value:
+        return 1
+    if len(str(value)) <= 10:  # a Unix timestamp for account_age, see there
+        _read(int, value, row, "user_reg_time")
+        _read(int, row["current_timestamp"], row, "current_timestamp")
+    return account_age(row)
+
+
+def _read(parse, value, record, name):
+    """parse(value), raising a ValueError naming the field and the edit if it fails."""
+    try:
+        return parse(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(
+            f"Edit {record.get('EditID')!r}: cannot read {name} ({e})"
+        ) from None
+
+
+def _number(value) -> float:
+    """Feature value as a float: booleans as 0 and 1, missing values as NaN."""
+    if value is None:
+        return math.nan
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "false"):
+            return float(lowered == "true")
+        return float(value) if lowered else math.nan
+    return float(value)
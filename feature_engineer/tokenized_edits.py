@@ -0,0 +1,212 @@
+import re
+
+import numpy as np
+import scipy.sparse
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+from .instrumentation import stage
+
+# Runs of word characters: the words of word_count, and, when at least two
+# characters long, the tokens of CountVectorizer's default token_pattern
+_WORD = re.compile(r"\w+")
+
+# Vectorizers whose tokens TokenizedEdits can count, with the parameters it
+# reproduces (n_features and dtype are taken from the vectorizer)
+_SUPPORTED = [
+    CountVectorizer(),
+    HashingVectorizer(alternate_sign=False, norm=None),
+]
+
+
+class TokenizedEdits:
+    """
+    Tokens of the "added_lines" and "deleted_lines" texts of edits, computed in a
+    single pass and shared by word_count and VandalismScorer.
+
+    Every text is lowercased and split once into runs of word characters. Their
+    number gives the word counts of word_count, and the runs of at least two
+    characters, which are the tokens of CountVectorizer's default analyzer, are
+    stored as CSR count matrices over the vocabulary of the texts. VandalismScorer
+    derives its matrices of words added and deleted from them, see counts.
+
+    Rows can be selected by EditID, so that the texts of a dataset are tokenized
+    once and the tokens reused on its subsets (train/test splits, cross-validation
+    folds), see select.
+    """
+
+    def __init__(self, added_lines, deleted_lines, edit_ids=None) -> None:
+        """
+        Parameters:
+            added_lines, deleted_lines: sequences of texts of the same length. None
+                and NaN are missing texts: no tokens, and one word ("nan") for
+                word_count, which counts the words of str(text).
+            edit_ids: optional sequence of the EditIDs of the edits, needed by select.
+        """
+        with stage("tokenize", len(added_lines)):
+            vocabulary = {}
+            added, self.word_count_added = _tokenize(added_lines, vocabulary)
+            deleted, self.word_count_deleted = _tokenize(deleted_lines, vocabulary)
+            self.tokens = np.array(list(vocabulary), dtype=object)  # column -> token
+            self.added = _csr(*added, len(vocabulary))
+            self.deleted = _csr(*deleted, len(vocabulary))
+        self.edit_ids = None
+        if edit_ids is not None:
+            self.edit_ids = np.asarray(edit_ids, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, X) -> "TokenizedEdits":
+        """Tokens of the "added_lines" and "deleted_lines" columns of X, by "EditID"."""
+        edit_ids = X["EditID"] if "EditID" in X else None
+        return cls(X["added_lines"], X["deleted_lines"], edit_ids)
+
+    @staticmethod
+    def supports(vectorizer) -> bool:
+        """
+        Whether counts can stand for vectorizer's transform: a CountVectorizer or a
+        HashingVectorizer with the parameters VandalismScorer gives them.
+        """
+        params = vectorizer.get_params()
+        for default in _SUPPORTED:
+            if type(vectorizer) is type(default) and all(
+                params[name] == value
+                for name, value in default.get_params().items()
+                if name not in ("n_features", "dtype")
+            ):
+                return True
+        return False
+
+    def select(self, edit_ids) -> "TokenizedEdits":
+        """
+        Return the tokens of the edits with the given EditIDs, in that order (of the
+        first one if an EditID was tokenized several times). Raises a KeyError if
+        some EditIDs were not tokenized.
+        """
+        if self.edit_ids is None:
+            raise ValueError("The edits were tokenized without their EditIDs")
+        edit_ids = np.asarray(edit_ids, dtype=np.int64)
+        if np.array_equal(edit_ids, self.edit_ids):
+            return self
+        order = np.argsort(self.edit_ids, kind="stable")
+        sorted_ids = self.edit_ids[order]
+        pos = np.searchsorted(sorted_ids, edit_ids)
+        found = pos < len(sorted_ids)
+        found[found] = sorted_ids[pos[found]] == edit_ids[found]
+        if not found.all():
+            raise KeyError(f"EditIDs not tokenized: {edit_ids[~found][:5].tolist()}")
+        rows = order[pos]
+
+        selected = TokenizedEdits.__new__(TokenizedEdits)
+        selected.tokens = self.tokens
+        selected.added = self.added[rows]
+        selected.deleted = self.deleted[rows]
+        selected.word_count_added = self.word_count_added[rows]
+        selected.word_count_deleted = self.word_count_deleted[rows]
+        selected.edit_ids = edit_ids
+        return selected
+
+    def word_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """The pair (added_count, deleted_count) of word_count, as integer arrays."""
+        return self.word_count_added, self.word_count_deleted
+
+    def counts(self, vectorizer, fit: bool = False):
+        """
+        Return the pair of sparse matrices (X_counts_added, X_counts_deleted) that
+        vectorizer.transform gives for the added and deleted texts. vectorizer must
+        be supported (see supports). If fit is True, a CountVectorizer's vocabulary
+        is first set to the tokens of these edits, as vectorizer.fit on their added
+        and deleted texts would.
+        """
+        if not self.supports(vectorizer):
+            raise ValueError(f"Unsupported vectorizer: {vectorizer!r}")
+        dtype = vectorizer.dtype
+        if isinstance(vectorizer, HashingVectorizer):
+            n_columns = vectorizer.n_features
+            columns = np.array(
+                [_hash_column(token, n_columns) for token in self.tokens],
+                dtype=np.intp,
+            )
+        else:
+            if fit:
+                used = np.union1d(self.added.indices, self.deleted.indices)
+                vectorizer.vocabulary_ = {
+                    token: column
+                    for column, token in enumerate(sorted(self.tokens[used]))
+                }
+                vectorizer.fixed_vocabulary_ = False
+            vocabulary = vectorizer.vocabulary_
+            n_columns = len(vocabulary)
+            if hasattr(vocabulary, "lookup"):  # a MappedVocabulary
+                columns = vocabulary.lookup(self.tokens)
+            else:
+                columns = np.array(
+                    [vocabulary.get(token, -1) for token in self.tokens], dtype=np.intp
+                )
+        return (
+            _project(self.added, columns, n_columns, dtype),
+            _project(self.deleted, columns, n_columns, dtype),
+        )
+
+
+def _tokenize(texts, vocabulary):
+    """
+    Token columns and row pointers of texts, adding new tokens to vocabulary, and
+    the word_count of each text.
+    """
+    indices, indptr, word_counts = [], [0], []
+    for text in texts:
+        if text is None or text != text:
+            word_counts.append(1)  # str(nan) is "nan"
+            indptr.append(len(indices))
+            continue
+        text = str(text)
+        words = _WORD.findall(text.lower())
+        # Lowercasing keeps the runs of word characters of ASCII texts, not
+        # necessarily of the others
+        word_counts.append(len(words) if text.isascii() else len(_WORD.findall(text)))
+        indices.extend(
+            vocabulary.setdefault(word, len(vocabulary))
+            for word in words
+            if len(word) > 1
+        )
+        indptr.append(len(indices))
+    return (indices, indptr), np.array(word_counts, dtype=np.int64)
+
+
+def _csr(indices, indptr, n_columns):
+    """Count matrix of the rows of token columns given by indices and indptr."""
+    matrix = scipy.sparse.csr_matrix(
+        (
+            np.ones(len(indices), dtype=np.int64),
+            np.array(indices, dtype=np.int32),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(indptr) - 1, n_columns),
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+
+def _project(matrix, columns, n_columns, dtype):
+    """
+    matrix with its column j moved to columns[j] (summing the columns moved to the
+    same one), and dropped where columns[j] is -1.
+    """
+    new_columns = columns[matrix.indices]
+    keep = new_columns >= 0
+    kept = np.concatenate([[0], np.cumsum(keep)])
+    projected = scipy.sparse.csr_matrix(
+        (matrix.data[keep].astype(dtype), new_columns[keep], kept[matrix.indptr]),
+        shape=(matrix.shape[0], n_columns),
+    )
+    projected.sum_duplicates()
+    return projected
+
+
+def _hash_column(token, n_features):
+    """Column of token in a HashingVectorizer with n_features columns."""
+    h = murmurhash3_32(token, seed=0)
+    if h == -(2**31):
+        # As in HashingVectorizer, where abs(-2**31) is undefined
+        return (2**31 - 1 - (n_features - 1)) % n_features
+    return abs(h) % n_features
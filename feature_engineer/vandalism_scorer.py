@@ -1,13 +1,19 @@
 import re
-from collections import defaultdict
 from typing import Iterable, Set
 from sklearn.base import BaseEstimator, TransformerMixin, _fit_context
 import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
 from sklearn.model_selection import StratifiedKFold
 from sklearn.naive_bayes import MultinomialNB
 
+from .edit_id_index import EditIDIndex
+from .fold_nb import FoldNB
+from .instrumentation import stage, staged
+from .scorer_artifact import MappedVocabulary, load_arrays, save_arrays
+from .tokenized_edits import TokenizedEdits
+from .vectorizer_cache import VectorizerCache
+
 
 
 
@@ -24,35 +30,67 @@ class VandalismScorer(TransformerMixin, BaseEstimator):
 
     # This is a dictionary allowing to define the type of parameters.
     # It is used to validate parameters within the `_fit_context` decorator.
-    _parameter_constraints = {"smoothing": [int], "n_splits": [int], "fit_prior": [bool], "random_state": [int]}
+    _parameter_constraints = {
+        "smoothing": [int], "n_splits": [int], "fit_prior": [bool], "random_state": [int],
+        "n_jobs": [int, None], "vectorizer_cache": [VectorizerCache, None],
+        "n_hash_features": [int, None],
+    }
 
-    def __init__(self, smoothing: int = 1, n_splits: int = 4, random_state = 42, fit_prior=False) -> None:
+    def __init__(self, smoothing: int = 1, n_splits: int = 4, random_state = 42,
+                 fit_prior=False, n_jobs=None, vectorizer_cache=None,
+                 n_hash_features=None) -> None:
         """
         Initialize the scorer with Laplace smoothing parameter.
+        n_jobs is the number of threads deriving the log probabilities of the
+        (n_splits + 1) classifiers (None means 1, -1 means all processors).
+        vectorizer_cache is an optional VectorizerCache. If given, the fitted vectorizer
+        and the matrix of net words added are stored on disk and reused by later fits
+        on the same training texts.
+        n_hash_features switches on feature hashing: words are mapped to n_hash_features
+        columns by a HashingVectorizer instead of a learned CountVectorizer vocabulary,
+        which keeps the model size fixed however many words are seen.
         """
         self.smoothing = smoothing
+        self.n_jobs = n_jobs
+        self.vectorizer_cache = vectorizer_cache
         self.n_splits = n_splits
         self.random_state = random_state
-        self.vectorizer_ = CountVectorizer()
+        self.n_hash_features = n_hash_features
+        if n_hash_features is None:
+            self.vectorizer_ = CountVectorizer()
+        else:
+            # Same tokenization as CountVectorizer, with raw non-negative counts as
+            # needed by MultinomialNB
+            self.vectorizer_ = HashingVectorizer(
+                n_features=n_hash_features, alternate_sign=False, norm=None, dtype=np.int64
+            )
         self.fit_prior = fit_prior
         self.nb_classifiers_split = [MultinomialNB(fit_prior=fit_prior) for _ in range(n_splits)] #n_splits classifiers to be trained on all-but-one-split of training data
         self.nb_classifier_total = MultinomialNB(fit_prior=fit_prior) # classifier to be trained on all of the training data
         self.nb_classifiers = self.nb_classifiers_split + [self.nb_classifier_total]
-        self.EditID_to_classifier_index = defaultdict(lambda: n_splits) # defaultdict mapping EditIDs to the classifier trained on subset that doesn't contain this Edit. default value is thet index of nb_classifier_total in nb_classifiers
+        # maps EditIDs to the classifier trained on subset that doesn't contain this
+        # Edit. default value is the index of nb_classifier_total in nb_classifiers
+        self.EditID_to_classifier_index = EditIDIndex([], [], default=n_splits)
         self.cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state) # the splits used for training the classifiers in nb_classifiers_split
 
     @_fit_context(prefer_skip_nested_validation=True)
+    @staged("scorer.fit")
     def fit(
-        self, X, labels
+        self, X, labels, tokens=None
     ):
         """
         Initializes and trains (n_splits + 1) MultinomialNB classifiers on (X, labels).
         n_splits of the MultinomialNB classifiers are trained on all-but-one split of X, which is 
         split using StratifiedKFold. The remaining MultinomialNB classifier is trained on all of X.
+        All of them are fitted together by a FoldNB, from the word counts of each split,
+        in one pass over X.
 
         Parameters:
             X: dataset of WP Edits. Must have the columns "added_lines", "deleted_lines" and "EditID"
             labels: Iterable of bools associated to each WP Edit. A value of True indicates vandalism.
+            tokens: optional TokenizedEdits of these edits (or of a superset of them,
+                selected by EditID), e.g. the ones preprocessor used for the word
+                counts. Tokenized here if not given.
 
         Returns:
             self
@@ -66,45 +104,131 @@ class VandalismScorer(TransformerMixin, BaseEstimator):
         self.X_train_ = X.replace(np.nan, '').reset_index(drop=True)
         self.labels_ = labels
 
-        self.vectorizer_.fit(pd.concat([self.X_train_['added_lines'], self.X_train_['deleted_lines']], axis=0)) # build vocabulary from all of the training data
-        # X_counts_added = pd.DataFrame.sparse.from_spmatrix(self.vectorizer_.transform(X_transformed['added_lines']), columns=self.vectorizer_.vocabulary_)
-        # X_counts_deleted = pd.DataFrame.sparse.from_spmatrix(self.vectorizer_.transform(X_transformed['deleted_lines']), columns=self.vectorizer_.vocabulary_)   
-        # X_counts_diff = (X_counts_added - X_counts_deleted).clip(lower=0)
-        # not used anymore
-
-        # For memory efficiency, we'll work directly with scipy sparse matrices
-        # instead of creating intermediate pandas sparse DataFrames.
-        X_counts_added = self.vectorizer_.transform(self.X_train_['added_lines'])
-        X_counts_deleted = self.vectorizer_.transform(self.X_train_['deleted_lines'])
+        cached = None
+        if self.vectorizer_cache is not None:
+            cache_key = self.vectorizer_cache.key(self.vectorizer_, self.X_train_)
+            cached = self.vectorizer_cache.get(cache_key)
 
-        # Subtract matrices to get net words added.
-        # If result has negative values, those are net words deleted. 
-        # We remove net words deleted by clipping at 0.
-        # .maximum(0) is an efficient way to do this with sparse matrices.
-        X_counts_diff = (X_counts_added - X_counts_deleted).maximum(0)
-        # Compress the sparse matrix by removing zeros.
-        X_counts_diff.eliminate_zeros()
+        if cached is not None:
+            # Same training texts as a previous fit: skip tokenization entirely
+            self.vectorizer_, X_counts_diff = cached
+        else:
+            # X_counts_added = pd.DataFrame.sparse.from_spmatrix(self.vectorizer_.transform(X_transformed['added_lines']), columns=self.vectorizer_.vocabulary_)
+            # X_counts_deleted = pd.DataFrame.sparse.from_spmatrix(self.vectorizer_.transform(X_transformed['deleted_lines']), columns=self.vectorizer_.vocabulary_)
+            # X_counts_diff = (X_counts_added - X_counts_deleted).clip(lower=0)
+            # not used anymore
 
-        # Train nb_classifier_total on all of X_train_
-        self.nb_classifier_total.fit(X_counts_diff, self.labels_)
+            # For memory efficiency, we'll work directly with scipy sparse matrices
+            # instead of creating intermediate pandas sparse DataFrames.
+            # Net words deleted are removed by clipping at 0, see _counts_diff.
+            # fit=True builds the vocabulary from all of the training data (no-op when
+            # hashing), from the same tokenization pass as the counts.
+            X_counts_diff = self._counts_diff(self.X_train_, tokens, fit=True)
+            if self.vectorizer_cache is not None:
+                self.vectorizer_cache.put(cache_key, self.vectorizer_, X_counts_diff)
 
+        edit_ids = self.X_train_['EditID'].to_numpy()
+        folds = np.empty(len(self.X_train_), dtype=np.intp)
+        target_edit_ids, target_folds = [], []
         for i, (train_idx, target_idx) in enumerate(self.cv.split(self.X_train_, self.labels_)):
-            Xt = X_counts_diff[train_idx]
-            yt = self.labels_.iloc[train_idx]
-
-            Xp = X_counts_diff[target_idx]
-            yp = self.labels_.iloc[target_idx]
-
-            for idx in target_idx:
-                # dictionary from EditIDs in Xp to i, the index of the nb_classifier_splits to be used to compute vandalism_score for Xp
-                self.EditID_to_classifier_index[self.X_train_.iat[idx, self.X_train_.columns.get_loc('EditID')]] = i
-            
-            # Train nb_classifiers_split[i] on Xt, yt
-            self.nb_classifiers_split[i].fit(Xt, yt)
+            # EditIDs in the target split are mapped to i, the index of the
+            # nb_classifiers_split to be used to compute their vandalism_score
+            target_edit_ids.append(edit_ids[target_idx])
+            target_folds.append(np.full(len(target_idx), i))
+            folds[target_idx] = i
+
+        # nb_classifiers_split[i] is trained on all splits but i and nb_classifier_total
+        # on all of X_train_: their word counts are derived from those of each split,
+        # computed in a single pass over X_counts_diff.
+        self.nb_ = FoldNB(self.n_splits, fit_prior=self.fit_prior, n_jobs=self.n_jobs)
+        self.nb_.fit(X_counts_diff, self.labels_, folds)
+        self._set_classifiers()
+        # Next fold of each class (in the order of nb_.classes_) in the round robin of
+        # partial_fit
+        self.fold_offsets_ = np.zeros(len(self.nb_.classes_), dtype=np.intp)
+
+        self.EditID_to_classifier_index = EditIDIndex(
+            np.concatenate(target_edit_ids), np.concatenate(target_folds),
+            default=self.n_splits,
+        )
         return self
     
+    @_fit_context(prefer_skip_nested_validation=True)
+    @staged("scorer.partial_fit")
+    def partial_fit(
+        self, X, labels
+    ):
+        """
+        Incrementally train the scorer on new edits, at a cost proportional to the
+        number of new edits. Calls fit if the scorer is not fitted yet.
+
+        Each new edit is assigned to one of the n_splits folds (stratified round robin,
+        in an order shuffled with random_state, continued from one call to the next)
+        and added to every classifier except the one of its fold, so that its
+        vandalism_score stays out-of-fold. nb_classifier_total is updated with all of
+        the new edits.
+
+        The vocabulary is not updated: words not seen during fit are ignored, unless
+        n_hash_features is set. In hashing mode nb_classifier_total ends up identical
+        to the one of a full fit on all of the edits.
+        X_train_ and labels_ keep holding only the data passed to fit.
+
+        Edits are learned once: a ValueError is raised, and the scorer left unchanged,
+        if an EditID of X was already passed to fit or partial_fit, or appears twice
+        in X. Counting an edit again would give it a second fold, and the classifier
+        of its first fold, which scores it, would have learned it.
+
+        Parameters:
+            X: dataset of new WP Edits. Must have the columns "added_lines",
+                "deleted_lines" and "EditID"
+            labels: Iterable of bools associated to each WP Edit. A value of True indicates vandalism.
+
+        Returns:
+            self
+        """
+        if not hasattr(self, 'X_train_'):
+            if hasattr(self, 'nb_'):
+                raise ValueError(
+                    "A scorer loaded with VandalismScorer.load can score edits but not "
+                    "be trained further"
+                )
+            return self.fit(X, labels)
+
+        X_new = X.replace(np.nan, '').reset_index(drop=True)
+        edit_ids = X_new['EditID'].to_numpy()
+        known = self.EditID_to_classifier_index.contains(edit_ids)
+        unique_ids, counts = np.unique(edit_ids, return_counts=True)
+        if known.any() or (counts > 1).any():
+            repeated = np.union1d(edit_ids[known], unique_ids[counts > 1])
+            raise ValueError(
+                f"partial_fit only learns new edits, got {len(repeated)} EditIDs "
+                f"already learned or repeated, e.g. {repeated[:5].tolist()}"
+            )
+        labels = pd.Series(np.asarray(labels))
+        X_counts_diff = self._counts_diff(X_new)
+
+        # Stratified round robin: within each class, shuffled rows are dealt to the
+        # folds in turn, starting at the fold after the last one dealt by the previous
+        # calls (fold_offsets_), so that small batches spread over all the folds too
+        folds = np.zeros(len(X_new), dtype=np.intp)
+        fold_offsets = self.fold_offsets_.copy()
+        rng = np.random.RandomState(self.random_state)
+        for k, label in enumerate(self.nb_.classes_):
+            rows = rng.permutation(np.flatnonzero(labels == label))
+            folds[rows] = (fold_offsets[k] + np.arange(len(rows))) % self.n_splits
+            fold_offsets[k] = (fold_offsets[k] + len(rows)) % self.n_splits
+
+        # Updates nb_classifiers in place, see _set_classifiers. Raises for labels not
+        # seen by fit
+        self.nb_.partial_fit(X_counts_diff, labels, folds)
+        self.fold_offsets_ = fold_offsets
+
+        self.EditID_to_classifier_index.update(edit_ids, folds)
+        return self
+
+    @staged("scorer.transform")
     def transform(
-        self, X
+        self, X, tokens=None
     ) -> pd.DataFrame:
         """
         Compute vandalism scores for new edits based on
@@ -112,7 +236,8 @@ class VandalismScorer(TransformerMixin, BaseEstimator):
 
         Parameters:
             X: dataset of WP Edits, shape (n_samples, n_features). Must have the columns "added_lines", "deleted_lines" and "EditID".
-            n_splits: number of splits to use for training Naive Bayes.
+            tokens: optional TokenizedEdits of these edits (or of a superset of them),
+                as in fit.
 
         Returns:
             X_transformed: dataset of WP Edits augmented with pred_proba output from Naive Bayes, shape (n_samples, n_features+1). Adds a column called "vandalism_score".
@@ -121,17 +246,180 @@ class VandalismScorer(TransformerMixin, BaseEstimator):
         X_transformed.reset_index(drop=True, inplace=True) # Reset index to positional index to allow accessing the scipy.spmatrix by index
         X_transformed.reset_index(inplace=True) # Store the positional index in a separate column
 
-        X_counts_added = self.vectorizer_.transform(X_transformed['added_lines'])
-        X_counts_deleted = self.vectorizer_.transform(X_transformed['deleted_lines'])
+        X_counts_diff = self._counts_diff(X_transformed, tokens)
 
-        # Subtract matrices and clip at 0 (we only care about added words).
-        # .maximum(0) is an efficient way to do this with sparse matrices.
-        X_counts_diff = (X_counts_added - X_counts_deleted).maximum(0)
-        X_counts_diff.eliminate_zeros()
-        
-        # initializes classifier_index to self.n_splits if EditID not seen during fit(). Otherwise use EditID_to_classifier_index[EditID]
-        X_transformed['classifier_index'] = X_transformed[['EditID']].map(lambda x: self.EditID_to_classifier_index[x])
+        X_transformed['classifier_index'] = self._classifier_index(X_transformed)
+
+        X_transformed['vandalism_score'] = self._score(
+            X_counts_diff, X_transformed['classifier_index'].to_numpy()
+        )
 
-        X_transformed['vandalism_score'] = X_transformed[['index', 'classifier_index']].apply(lambda x: self.nb_classifiers[x['classifier_index']].predict_proba(X_counts_diff[x['index']])[:, self.nb_classifiers[x['classifier_index']].classes_].item(), axis=1)
+        return X_transformed.drop(['added_lines', 'deleted_lines', 'classifier_index', 'index', 'EditID'], axis=1)
+
+    def score_edits(self, added_lines, deleted_lines, edit_ids) -> np.ndarray:
+        """
+        Compute the vandalism scores of edits given as plain sequences rather than a
+        DataFrame, with the same values as the "vandalism_score" column of transform.
+        Meant for scoring a few edits at a time (see ScoringService), where the
+        DataFrame copies of transform dominate.
+
+        Parameters:
+            added_lines, deleted_lines: sequences of strings, None or NaN counting as
+                empty text.
+            edit_ids: sequence of integer EditIDs, of the same length.
+
+        Returns:
+            np.ndarray of shape (n_edits,) with the probability of vandalism of each
+                edit.
+        """
+        return self.score_tokens(TokenizedEdits(added_lines, deleted_lines, edit_ids))
+
+    def score_tokens(self, tokens) -> np.ndarray:
+        """
+        score_edits for edits already tokenized, e.g. by a ScoringService that also
+        takes their word counts from tokens.
 
-        return X_transformed.drop(['added_lines', 'deleted_lines', 'classifier_index', 'index', 'EditID'], axis=1)
\ No newline at end of file
+        Parameters:
+            tokens: TokenizedEdits of the edits, with their EditIDs.
+
+        Returns:
+            np.ndarray of shape (n_edits,) with the probability of vandalism of each
+                edit.
+        """
+        classifier_index = self.EditID_to_classifier_index.lookup(tokens.edit_ids)
+        return self._score(self._counts_diff(None, tokens), classifier_index)
+
+    def save(self, path: str) -> None:
+        """
+        Save what scoring needs, as flat arrays in the directory path (replacing a
+        scorer saved there before, see scorer_artifact.save_arrays): the vocabulary,
+        the log probabilities and class priors of the classifiers, and the EditID index.
+        Unlike a pickle of the scorer, the training data (X_train_, labels_) and the
+        word counts are left out, and the vocabulary is stored as arrays instead of a
+        dictionary, see load.
+
+        Parameters:
+            path: directory to write.
+        """
+        meta = {
+            'smoothing': self.smoothing, 'n_splits': self.n_splits,
+            'random_state': self.random_state, 'fit_prior': self.fit_prior,
+            'n_hash_features': self.n_hash_features, 'alpha': self.nb_.alpha,
+            'classes': self.nb_.classes_.tolist(),
+        }
+        arrays = {
+            'weights': self.nb_.weights_,
+            'class_log_prior': self.nb_.class_log_prior_,
+            'edit_ids': self.EditID_to_classifier_index.edit_ids,
+            'classifier_indices': self.EditID_to_classifier_index.classifier_indices,
+        }
+        if self.n_hash_features is None:
+            vocabulary = self.vectorizer_.vocabulary_
+            if not isinstance(vocabulary, MappedVocabulary):
+                vocabulary = MappedVocabulary.from_dict(vocabulary)
+            arrays.update(vocabulary.arrays())
+        save_arrays(path, meta, arrays)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode='r') -> "VandalismScorer":
+        """
+        Load a scorer saved with save. Its arrays are memory-mapped (read-only) unless
+        mmap_mode is None, so loading takes milliseconds and processes scoring with the
+        same saved scorer share one copy of it in the page cache. The loaded scorer can
+        transform and score edits, but not fit or partial_fit.
+
+        Parameters:
+            path: directory written by save.
+            mmap_mode: passed on to np.load; None reads the arrays into memory.
+
+        Returns:
+            the loaded VandalismScorer
+        """
+        meta, arrays = load_arrays(path, mmap_mode=mmap_mode)
+        scorer = cls(
+            smoothing=meta['smoothing'], n_splits=meta['n_splits'],
+            random_state=meta['random_state'], fit_prior=meta['fit_prior'],
+            n_hash_features=meta['n_hash_features'],
+        )
+        if meta['n_hash_features'] is None:
+            scorer.vectorizer_.vocabulary_ = MappedVocabulary(
+                arrays['token_hashes'], arrays['token_columns'],
+                arrays['token_offsets'], arrays['token_bytes'],
+            )
+            scorer.vectorizer_.fixed_vocabulary_ = False
+
+        scorer.nb_ = FoldNB(
+            meta['n_splits'], alpha=meta['alpha'], fit_prior=meta['fit_prior']
+        )
+        scorer.nb_.classes_ = np.array(meta['classes'])
+        scorer.nb_.weights_ = arrays['weights']
+        scorer.nb_.class_log_prior_ = arrays['class_log_prior']
+        scorer._set_classifiers()
+        scorer.EditID_to_classifier_index = EditIDIndex.from_arrays(
+            arrays['edit_ids'], arrays['classifier_indices'], default=meta['n_splits']
+        )
+        return scorer
+
+    def _counts_diff(self, X, tokens=None, fit=False):
+        """
+        Vectorize the "added_lines" and "deleted_lines" columns of X and return the
+        sparse matrix of net words added (added minus deleted, clipped at 0).
+        If fit is True, the vectorizer is first fitted on both columns.
+
+        Both columns are tokenized in a single pass with TokenizedEdits (instead of
+        once by vectorizer_.fit and once per vectorizer_.transform), unless tokens of
+        the rows of X are given: they are then selected by the EditIDs of X, or used
+        as they are if X is None.
+        """
+        if tokens is None:
+            tokens = TokenizedEdits(X['added_lines'], X['deleted_lines'])
+        elif X is not None and 'EditID' in X:
+            tokens = tokens.select(X['EditID'])
+        with stage("matrix diff", tokens.added.shape[0]):
+            X_counts_added, X_counts_deleted = tokens.counts(self.vectorizer_, fit=fit)
+
+            # Subtract matrices and clip at 0 (we only care about added words).
+            # .maximum(0) is an efficient way to do this with sparse matrices.
+            X_counts_diff = (X_counts_added - X_counts_deleted).maximum(0)
+            X_counts_diff.eliminate_zeros()
+            return X_counts_diff.tocsr()
+
+    def _classifier_index(self, X) -> np.ndarray:
+        """
+        Return, for each row of X, the index in nb_classifiers of the classifier used
+        to score it.
+        """
+        # classifier_index is self.n_splits if EditID not seen during fit(). Otherwise
+        # use EditID_to_classifier_index[EditID]
+        return self.EditID_to_classifier_index.lookup(X['EditID'].to_numpy())
+
+    def _score(self, X_counts_diff, classifier_index) -> np.ndarray:
+        """
+        Batched scoring engine. The joint log likelihoods of all rows under all
+        classifiers come from a single sparse product (see FoldNB.predict_proba),
+        instead of one predict_proba call per row. MultinomialNB scores every row
+        independently, so the output is identical to scoring the rows one at a time
+        with nb_classifiers.
+
+        Parameters:
+            X_counts_diff: sparse matrix of net words added, shape (n_samples, n_words).
+            classifier_index: integer array of shape (n_samples,) giving, for each row,
+                the index in nb_classifiers of the classifier used to score it.
+
+        Returns:
+            np.ndarray of shape (n_samples,) with the probability of vandalism of each
+                row.
+        """
+        with stage("scoring", X_counts_diff.shape[0]):
+            proba = self.nb_.predict_proba(X_counts_diff, classifier_index)
+            return proba[:, list(self.nb_.classes_).index(True)]
+
+    def _set_classifiers(self) -> None:
+        """
+        Set nb_classifiers (and nb_classifiers_split, nb_classifier_total) to
+        MultinomialNB views of the classifiers of nb_, which partial_fit updates in
+        place.
+        """
+        self.nb_classifiers = [self.nb_.classifier(i) for i in range(self.n_splits + 1)]
+        self.nb_classifiers_split = self.nb_classifiers[:-1]
+        self.nb_classifier_total = self.nb_classifiers[-1]
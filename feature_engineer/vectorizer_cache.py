@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import pandas as pd
+import scipy.sparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats.json is still replaced atomically, but the
+    fcntl = None  # counts of processes recording at the same time may be lost
+
+
+class VectorizerCache:
+    """
+    On-disk cache of fitted vectorizers and the sparse matrices of net words added
+    computed with them, keyed by a content hash of the training texts.
+
+    Used by VandalismScorer (see its vectorizer_cache parameter) so that repeated fits
+    on identical data skip tokenization entirely. Each entry is a subdirectory of
+    cache_dir. When the entries grow beyond max_bytes, the least recently used ones
+    are evicted. Hit and miss counts are stored in cache_dir as well, so they are
+    shared by every scorer (and every process) using the same directory.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2**30) -> None:
+        """
+        Parameters:
+            cache_dir: Directory holding the cache. Created if it does not exist.
+            max_bytes: Maximum total size of the cached entries, in bytes.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, vectorizer, X: pd.DataFrame) -> str:
+        """
+        Return the cache key of fitting vectorizer on the "added_lines" and
+        "deleted_lines" columns of X: a hash of the vectorizer's type and parameters
+        and of every text, in order.
+        """
+        hasher = hashlib.sha256()
+        params = sorted(vectorizer.get_params().items())
+        hasher.update(repr((type(vectorizer).__name__, params)).encode())
+        texts = X[["added_lines", "deleted_lines"]].astype(str)
+        hasher.update(pd.util.hash_pandas_object(texts, index=False).to_numpy())
+        return hasher.hexdigest()
+
+    def get(self, key: str):
+        """
+        Return the cached (vectorizer, X_counts_diff) pair for key,
+        or None if it is not in the cache.
+        """
+        entry = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry, "vectorizer.pkl"), "rb") as f:
+                vectorizer = pickle.load(f)
+            X_counts_diff = scipy.sparse.load_npz(
+                os.path.join(entry, "counts_diff.npz")
+            )
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            self._record("misses")
+            return None
+        os.utime(entry)  # mark as recently used
+        self._record("hits")
+        return vectorizer, X_counts_diff.tocsr()
+
+    def put(self, key: str, vectorizer, X_counts_diff) -> None:
+        """
+        Store the fitted vectorizer and X_counts_diff under key, then evict the least
+        recently used entries if the cache is larger than max_bytes.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = os.path.join(self.cache_dir, key)
+        # Write to a temporary directory first so that readers never see half an entry
+        tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with open(os.path.join(tmp, "vectorizer.pkl"), "wb") as f:
+                pickle.dump(vectorizer, f, protocol=pickle.HIGHEST_PROTOCOL)
+            scipy.sparse.save_npz(
+                os.path.join(tmp, "counts_diff.npz"), X_counts_diff, compressed=False
+            )
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    def stats(self) -> dict:
+        """
+        Return a dictionary with the number of cache hits and misses so far,
+        the number of entries and their total size in bytes.
+        """
+        entries = self._entries()
+        return {
+            **self._counts(),
+            "entries": len(entries),
+            "size_bytes": sum(size for _, _, size in entries),
+        }
+
+    def clear(self) -> None:
+        """Remove every entry and reset the hit and miss counts."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _entries(self) -> list:
+        """Return (path, last use time, size in bytes) for every entry."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(path, file)) for file in os.listdir(path)
+            )
+            entries.append((path, os.path.getmtime(path), size))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def _counts(self) -> dict:
+        try:
+            with open(os.path.join(self.cache_dir, "stats.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def _record(self, outcome: str) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Read, increment and rewrite the counts under an exclusive lock, so that no
+        # count of a concurrent scorer is lost, and replace stats.json in one step,
+        # so that it is never read half written
+        with open(os.path.join(self.cache_dir, ".stats.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # released when lock is closed
+            counts = self._counts()
+            counts[outcome] += 1
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(counts, f)
+                os.replace(tmp, os.path.join(self.cache_dir, "stats.json"))
+            except BaseException:
+                os.remove(tmp)
+                raise